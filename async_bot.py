@@ -0,0 +1,154 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Async facade rond AIBVBookingBot.
+
+Elke bot krijgt één eigen worker-thread met een command queue: alle Selenium-
+stappen lopen sequentieel op die thread, de event loop wacht er alleen op.
+Annuleren van een await (bv. via /stop) zet de stopvlag van de bot, zodat
+lopende waits en sleeps bij de volgende poll afbreken. `stop()` sluit daarnaast
+de browser vanuit een aparte thread, wat ook een hangende page load losmaakt.
+"""
+
+import asyncio
+import importlib
+import itertools
+import logging
+import queue
+import threading
+from concurrent.futures import Future
+from typing import TYPE_CHECKING, Any, Callable, Optional
+
+from config import Config
+
+if TYPE_CHECKING:
+    from selenium_controller import AIBVBookingBot
+
+log = logging.getLogger("AIBV-Async")
+
+_ids = itertools.count(1)
+
+
+def make_bot():
+    """Nieuwe controller: AIBVBookingBot, of wat BOT_FACTORY ("module:callable") teruggeeft."""
+    if Config.BOT_FACTORY:
+        module, _, attr = Config.BOT_FACTORY.partition(":")
+        return getattr(importlib.import_module(module), attr or "make_bot")()
+    # selenium pas laden bij de eerste run, niet bij het opstarten van de runner
+    from selenium_controller import AIBVBookingBot
+    return AIBVBookingBot()
+
+
+class AsyncBookingBot:
+    def __init__(self, bot: Optional["AIBVBookingBot"] = None, name: Optional[str] = None):
+        self.bot = bot if bot is not None else make_bot()
+        self._queue: "queue.Queue[Optional[tuple]]" = queue.Queue()
+        self._closed = False
+        self._thread = threading.Thread(
+            target=self._worker, name=name or f"aibv-bot-{next(_ids)}", daemon=True
+        )
+        self._thread.start()
+
+    # ---------------- Worker ----------------
+    def _worker(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            fut, fn, args, kwargs = item
+            if not fut.set_running_or_notify_cancel():
+                continue
+            try:
+                fut.set_result(fn(*args, **kwargs))
+            except BaseException as e:  # ook RunCancelled doorgeven
+                fut.set_exception(e)
+
+    async def call(self, fn: Callable[..., Any], *args, **kwargs) -> Any:
+        """Voer fn uit op de worker-thread van deze bot en wacht er annuleerbaar op."""
+        if self._closed:
+            raise RuntimeError("Bot is al afgesloten")
+        fut: Future = Future()
+        self._queue.put((fut, fn, args, kwargs))
+        try:
+            return await asyncio.wrap_future(fut)
+        except asyncio.CancelledError:
+            # Niet gestart → weg uit de queue; wel gestart → stopvlag breekt de wait af
+            fut.cancel()
+            self.bot.request_stop()
+            raise
+
+    # ---------------- Awaitable stappen ----------------
+    @property
+    def driver(self):
+        return self.bot.driver
+
+    def set_notifier(self, fn: Callable[[str], None]):
+        self.bot.set_notifier(fn)
+
+    def set_settings_listener(self, fn: Callable[[dict], None]):
+        self.bot.set_settings_listener(fn)
+
+    # Flow-stappen lopen via bot.supervised: een vastgelopen driver wordt hersteld
+    # en de stap opnieuw geprobeerd.
+    async def setup_driver(self):
+        return await self.call(self.bot.supervised, self.bot.setup_driver)
+
+    async def login(self):
+        return await self.call(self.bot.supervised, self.bot.login)
+
+    async def select_vehicle(self, plate: str, first_reg_date_str: str):
+        return await self.call(self.bot.supervised, self.bot.select_vehicle, plate, first_reg_date_str)
+
+    async def select_station(self):
+        return await self.call(self.bot.supervised, self.bot.select_station)
+
+    async def monitor_and_book(self):
+        return await self.call(self.bot.monitor_and_book)
+
+    async def find_first_slot_in_window(self):
+        return await self.call(self.bot.find_first_slot_in_window)
+
+    async def refresh(self):
+        return await self.call(self.bot.supervised, self.bot.refresh)
+
+    async def wait_dom_idle(self, timeout=20):
+        return await self.call(self.bot.wait_dom_idle, timeout)
+
+    async def page_info(self):
+        """(url, titel) van de huidige pagina, best effort."""
+        def _info():
+            d = self.bot.driver
+            if not d:
+                return "", ""
+            return d.current_url or "", d.title or ""
+        return await self.call(_info)
+
+    # ---------------- Stop / opruimen ----------------
+    async def stop(self):
+        """
+        Stop de run onmiddellijk: stopvlag zetten en de browser sluiten vanuit een
+        aparte thread (de worker-thread kan nog in een WebDriver-call hangen).
+        """
+        self.bot.request_stop()
+        try:
+            await asyncio.to_thread(self.bot.close)
+        except Exception:
+            pass
+
+    async def close(self):
+        """Browser sluiten en de worker-thread beëindigen."""
+        if self._closed:
+            return
+        self._closed = True
+        self.bot.request_stop()
+        try:
+            await asyncio.to_thread(self.bot.close)
+        except Exception:
+            pass
+        self.bot.recorder.close()
+        run_id = getattr(self.bot, "run_id", None)
+        if run_id:
+            from throttle import budget
+            budget.forget(run_id)
+        self._queue.put(None)
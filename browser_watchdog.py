@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Watchdog voor langlopende monitor-runs.
+
+Houdt per bot bij hoeveel refreshes er gebeurd zijn, hoeveel RAM de browser
+(chromedriver + Chrome-procesboom) inneemt en hoe vaak WebDriver-calls recent
+faalden. Boven de drempels geeft `check()` een reden terug; de controller
+recyclet dan de driver en herstelt zijn positie (login, voertuig, station).
+"""
+
+import time
+import logging
+from collections import deque
+from typing import Deque, Optional, Tuple
+
+from config import Config
+import proctools
+
+log = logging.getLogger("AIBV-Watchdog")
+
+
+class BrowserWatchdog:
+    def __init__(self,
+                 max_rss_mb: Optional[int] = None,
+                 max_refreshes: Optional[int] = None,
+                 max_error_rate: Optional[float] = None,
+                 error_window: int = 20,
+                 rss_every: int = 10):
+        self.max_rss_mb = Config.WATCHDOG_MAX_RSS_MB if max_rss_mb is None else max_rss_mb
+        self.max_refreshes = Config.WATCHDOG_MAX_REFRESHES if max_refreshes is None else max_refreshes
+        self.max_error_rate = Config.WATCHDOG_MAX_ERROR_RATE if max_error_rate is None else max_error_rate
+        self.rss_every = max(1, rss_every)
+
+        self.refreshes = 0          # sinds laatste recycle
+        self.total_refreshes = 0
+        self.recycles = 0
+        self.last_rss_mb = 0
+        self.peak_rss_mb = 0
+        self._outcomes: Deque[bool] = deque(maxlen=error_window)  # True = fout
+        self._rss_samples: Deque[Tuple[float, int]] = deque(maxlen=120)
+
+    # ---------------- Registratie ----------------
+    def record_refresh(self):
+        self.refreshes += 1
+        self.total_refreshes += 1
+
+    def record_ok(self):
+        self._outcomes.append(False)
+
+    def record_error(self):
+        self._outcomes.append(True)
+
+    @property
+    def error_rate(self) -> float:
+        if not self._outcomes:
+            return 0.0
+        return sum(self._outcomes) / len(self._outcomes)
+
+    def sample_rss(self, driver) -> int:
+        """Meet de RSS (MB) van de chromedriver-procesboom van deze driver."""
+        if getattr(driver, "shared", False):
+            # tab in een gedeelde browser: de boom is van alle runs samen
+            return self.last_rss_mb
+        try:
+            pid = driver.service.process.pid
+        except Exception:
+            return self.last_rss_mb
+        rss_mb = proctools.tree_rss_bytes(pid) // (1024 * 1024)
+        if rss_mb:
+            self.last_rss_mb = rss_mb
+            self.peak_rss_mb = max(self.peak_rss_mb, rss_mb)
+            self._rss_samples.append((time.time(), rss_mb))
+        return rss_mb
+
+    # ---------------- Beslissing ----------------
+    def check(self, driver) -> Optional[str]:
+        """Reden om de browser te recyclen, of None."""
+        if self.max_refreshes and self.refreshes >= self.max_refreshes:
+            return f"{self.refreshes} refreshes"
+        if (self.max_error_rate and len(self._outcomes) == self._outcomes.maxlen
+                and self.error_rate >= self.max_error_rate):
+            return f"foutratio {self.error_rate:.0%}"
+        if self.max_rss_mb and self.refreshes % self.rss_every == 0:
+            rss_mb = self.sample_rss(driver)
+            if rss_mb > self.max_rss_mb:
+                return f"browser RSS {rss_mb} MB > {self.max_rss_mb} MB"
+        return None
+
+    def mark_recycled(self):
+        self.recycles += 1
+        self.refreshes = 0
+        self._outcomes.clear()
+
+    # ---------------- Rapportage ----------------
+    def rss_trend_mb_per_hour(self) -> float:
+        if len(self._rss_samples) < 2:
+            return 0.0
+        (t0, r0), (t1, r1) = self._rss_samples[0], self._rss_samples[-1]
+        hours = (t1 - t0) / 3600.0
+        return (r1 - r0) / hours if hours > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"recycles={self.recycles} refreshes={self.total_refreshes} "
+            f"RSS={self.last_rss_mb} MB (piek {self.peak_rss_mb} MB, "
+            f"trend {self.rss_trend_mb_per_hour():+.0f} MB/u) foutratio={self.error_rate:.0%}"
+        )
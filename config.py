@@ -2,7 +2,11 @@ import os
 from datetime import datetime, timedelta
 from dotenv import load_dotenv
 
-load_dotenv()
+# Enkel een lokale .env naast deze module laden (geen zoektocht door de mappen);
+# op Heroku komen de variabelen uit de config vars.
+_ENV_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".env")
+if os.path.exists(_ENV_FILE):
+    load_dotenv(_ENV_FILE)
 
 # ---------------- Telegram ----------------
 TELEGRAM_TOKEN = os.environ.get("TELEGRAM_TOKEN", "")
@@ -12,8 +16,21 @@ TELEGRAM_CHAT_IDS = [
     if cid.strip()
 ]
 
+# ---------------- Telegram front-end ----------------
+# "polling" (standaard) of "webhook" (vereist WEBHOOK_URL en een web-dyno)
+TELEGRAM_MODE = os.environ.get("TELEGRAM_MODE", "polling").strip().lower()
+WEBHOOK_URL = os.environ.get("WEBHOOK_URL", "").strip()  # publieke basis-URL
+WEBHOOK_PATH = os.environ.get("WEBHOOK_PATH", "telegram")
+WEBHOOK_SECRET = os.environ.get("WEBHOOK_SECRET", "").strip()  # leeg = willekeurig per start
+WEBHOOK_LISTEN = os.environ.get("WEBHOOK_LISTEN", "0.0.0.0")
+WEBHOOK_PORT = int(os.environ.get("PORT", os.environ.get("WEBHOOK_PORT", "8443")))  # Heroku zet PORT
+CONCURRENT_UPDATES = int(os.environ.get("CONCURRENT_UPDATES", "16"))  # 1 = sequentieel
+TELEGRAM_API_URL = os.environ.get("TELEGRAM_API_URL", "").strip()  # leeg = api.telegram.org
+
 # ---------------- AIBV ----------------
-LOGIN_URL = "https://planning.aibv.be/Reservaties/Login.aspx"
+# overschrijfbaar voor de replay-server (replay_bench.py)
+AIBV_BASE_URL = os.environ.get("AIBV_BASE_URL", "https://planning.aibv.be").rstrip("/")
+LOGIN_URL = f"{AIBV_BASE_URL}/Reservaties/Login.aspx"
 AIBV_USERNAME = os.environ.get("AIBV_USERNAME", "")
 AIBV_PASSWORD = os.environ.get("AIBV_PASSWORD", "")
 
@@ -43,6 +60,89 @@ POSTBACK_TIMEOUT = 20
 # Aantal gewenste werkdagen (venster) waarbinnen een slot moet vallen
 DESIRED_BUSINESS_DAYS = int(os.environ.get("DESIRED_BUSINESS_DAYS", "3"))
 
+# ---------------- Watchdog (browser recyclen) ----------------
+WATCHDOG_MAX_RSS_MB = int(os.environ.get("WATCHDOG_MAX_RSS_MB", "1200"))  # 0 = uit
+WATCHDOG_MAX_REFRESHES = int(os.environ.get("WATCHDOG_MAX_REFRESHES", "1500"))  # 0 = uit
+WATCHDOG_MAX_ERROR_RATE = float(os.environ.get("WATCHDOG_MAX_ERROR_RATE", "0.5"))  # 0 = uit
+
+# ---------------- Browser ----------------
+# "dedicated": elke run een eigen Chrome-procesboom
+# "shared": één Chrome per proces, elke run een eigen browser context + tab
+BROWSER_MODE = os.environ.get("BROWSER_MODE", "dedicated").strip().lower()
+SHARED_BROWSER_MAX_TABS = int(os.environ.get("SHARED_BROWSER_MAX_TABS", "10"))  # daarboven: eigen browser
+CHROME_EXTRA_ARGS = os.environ.get("CHROME_EXTRA_ARGS", "").split()  # extra Chrome-vlaggen
+
+# ---------------- Supervisie WebDriver-calls ----------------
+PAGE_LOAD_TIMEOUT = int(os.environ.get("PAGE_LOAD_TIMEOUT", "60"))
+# Harde deadline per WebDriver-commando (moet ruim boven PAGE_LOAD_TIMEOUT liggen)
+COMMAND_TIMEOUT = int(os.environ.get("COMMAND_TIMEOUT", "90"))
+DRIVER_MAX_RECOVERIES = int(os.environ.get("DRIVER_MAX_RECOVERIES", "5"))
+
+# ---------------- Adaptieve timeouts & circuit breaker ----------------
+ADAPTIVE_TIMEOUTS = os.environ.get("ADAPTIVE_TIMEOUTS", "true").lower() == "true"
+ADAPTIVE_TIMEOUT_FACTOR = float(os.environ.get("ADAPTIVE_TIMEOUT_FACTOR", "3.0"))  # timeout = p99 × factor
+ADAPTIVE_TIMEOUT_MIN = float(os.environ.get("ADAPTIVE_TIMEOUT_MIN", "5"))
+ADAPTIVE_TIMEOUT_MAX = float(os.environ.get("ADAPTIVE_TIMEOUT_MAX", "120"))
+BREAKER_ERROR_RATE = float(os.environ.get("BREAKER_ERROR_RATE", "0.5"))  # 0 = uit
+BREAKER_MIN_EVENTS = int(os.environ.get("BREAKER_MIN_EVENTS", "10"))
+BREAKER_WINDOW = float(os.environ.get("BREAKER_WINDOW", "60"))  # seconden
+BREAKER_BACKOFF = float(os.environ.get("BREAKER_BACKOFF", "30"))
+BREAKER_BACKOFF_MAX = float(os.environ.get("BREAKER_BACKOFF_MAX", "600"))
+
+# ---------------- Persistente runs ----------------
+RUN_STORE_PATH = os.environ.get("RUN_STORE_PATH", "runs.db")
+RESUME_STAGGER_SECONDS = int(os.environ.get("RESUME_STAGGER_SECONDS", "20"))
+
+# ---------------- Coördinatie over meerdere dyno's ----------------
+# Leeg = uit (één worker). Lokaal: sqlite:///leases.db, productie: redis://…
+LEASE_STORE_URL = os.environ.get("LEASE_STORE_URL", "").strip()
+LEASE_TTL = int(os.environ.get("LEASE_TTL", "30"))  # seconden zonder heartbeat → overname
+LEASE_HEARTBEAT = int(os.environ.get("LEASE_HEARTBEAT", "10"))
+WORKER_CAPACITY = int(os.environ.get("WORKER_CAPACITY", "5"))  # max. runs per worker
+
+# ---------------- Profielen & hot standby ----------------
+# ASP.NET-sessies verlopen standaard na 20 min → ruim daaronder verversen
+STANDBY_KEEPALIVE_SECONDS = int(os.environ.get("STANDBY_KEEPALIVE_SECONDS", "300"))
+STANDBY_MAX_SESSIONS = int(os.environ.get("STANDBY_MAX_SESSIONS", "3"))  # 0 = standby uit
+
+# ---------------- Request-budget tegenover AIBV ----------------
+THROTTLE_RATE = float(os.environ.get("THROTTLE_RATE", "1.0"))  # requests per seconde (hele proces)
+THROTTLE_BURST = int(os.environ.get("THROTTLE_BURST", "5"))
+THROTTLE_CLUSTER_URL = os.environ.get("THROTTLE_CLUSTER_URL", "").strip()  # redis://… = cluster-breed
+
+# ---------------- Flight recorder (diagnose bij fouten) ----------------
+FLIGHT_RECORDER_FRAMES = int(os.environ.get("FLIGHT_RECORDER_FRAMES", "10"))  # 0 = uit
+FLIGHT_RECORDER_MAX_MB = int(os.environ.get("FLIGHT_RECORDER_MAX_MB", "5"))
+FLIGHT_RECORDER_SAMPLE_EVERY = int(os.environ.get("FLIGHT_RECORDER_SAMPLE_EVERY", "3"))
+FLIGHT_RECORDER_SCREENSHOTS = os.environ.get("FLIGHT_RECORDER_SCREENSHOTS", "false").lower() == "true"
+FLIGHT_RECORDER_DIR = os.environ.get("FLIGHT_RECORDER_DIR", "flight_recordings")
+
+# ---------------- Record/replay (offline benchmarks) ----------------
+RECORD_CORPUS = os.environ.get("RECORD_CORPUS", "").strip()  # naam = deze run opnemen; leeg = uit
+REPLAY_CORPUS_DIR = os.environ.get("REPLAY_CORPUS_DIR", "replay_corpus")
+# te maskeren tekst (naam, adres …), gescheiden door komma's; verplicht bij RECORD_CORPUS
+RECORD_SCRUB = [s.strip() for s in os.environ.get("RECORD_SCRUB", "").split(",") if s.strip()]
+
+# ---------------- Opstart ----------------
+CHROMEDRIVER_CACHE_DIR = os.environ.get(
+    "CHROMEDRIVER_CACHE_DIR", os.path.join(os.path.expanduser("~"), ".cache", "aibv-chromedriver")
+)
+# stationcatalogus (metadata_cache.py) geldt zo lang als vers voor validatie vóór de browser start
+METADATA_TTL_HOURS = float(os.environ.get("METADATA_TTL_HOURS", "24"))
+
+# ---------------- Workers ----------------
+# "thread": Selenium in een worker-thread van het Telegram-proces
+# "process": elke run in een eigen subprocess (harde kill bij /stop, eigen limieten)
+WORKER_MODE = os.environ.get("WORKER_MODE", "thread").strip().lower()
+WORKER_MAX_RSS_MB = int(os.environ.get("WORKER_MAX_RSS_MB", "0"))  # 0 = geen limiet
+WORKER_MAX_CPU_SECONDS = int(os.environ.get("WORKER_MAX_CPU_SECONDS", "0"))  # 0 = geen limiet
+# "module:callable" die een controller teruggeeft i.p.v. AIBVBookingBot (bv. fake_controller:FakeBookingBot)
+BOT_FACTORY = os.environ.get("BOT_FACTORY", "").strip()
+
+# ---------------- Diagnose ----------------
+# elke N seconden een STATS-regel in de log (loop-lag, meldingen in de wachtrij, geheugen); 0 = uit
+RUNNER_STATS_SECONDS = float(os.environ.get("RUNNER_STATS_SECONDS", "0"))
+
 # ---------------- Helpers ----------------
 def get_tomorrow_week_monday_str():
     """Return de 'week value' string van maandag van de week van morgen."""
@@ -52,16 +152,20 @@ def get_tomorrow_week_monday_str():
     return monday.strftime("%d/%m/%Y")
 
 
-def is_within_n_business_days(dt: datetime, n: int) -> bool:
-    """Controleer of datetime dt binnen n werkdagen vanaf nu valt."""
-    now = datetime.now()
+def business_days_end(n: int) -> datetime:
+    """Tijdstip n werkdagen vanaf nu (einde van het venster)."""
     days = 0
-    current = now
+    current = datetime.now()
     while days < n:
         current += timedelta(days=1)
         if current.weekday() < 5:  # ma-vr
             days += 1
-    return dt <= current
+    return current
+
+
+def is_within_n_business_days(dt: datetime, n: int) -> bool:
+    """Controleer of datetime dt binnen n werkdagen vanaf nu valt."""
+    return dt <= business_days_end(n)
 
 
 # === Helpers voor doelweek op basis van venster ===
@@ -109,6 +213,15 @@ def get_target_window_week_value(n_business_days: int | None = None) -> str:
 class Config:
     TELEGRAM_TOKEN = TELEGRAM_TOKEN
     TELEGRAM_CHAT_IDS = TELEGRAM_CHAT_IDS
+    TELEGRAM_MODE = TELEGRAM_MODE
+    WEBHOOK_URL = WEBHOOK_URL
+    WEBHOOK_PATH = WEBHOOK_PATH
+    WEBHOOK_SECRET = WEBHOOK_SECRET
+    WEBHOOK_LISTEN = WEBHOOK_LISTEN
+    WEBHOOK_PORT = WEBHOOK_PORT
+    CONCURRENT_UPDATES = CONCURRENT_UPDATES
+    TELEGRAM_API_URL = TELEGRAM_API_URL
+    AIBV_BASE_URL = AIBV_BASE_URL
     LOGIN_URL = LOGIN_URL
     AIBV_USERNAME = AIBV_USERNAME
     AIBV_PASSWORD = AIBV_PASSWORD
@@ -120,17 +233,63 @@ class Config:
     MONITOR_MAX_SECONDS = MONITOR_MAX_SECONDS  # niet meer gebruikt door monitor_loop
     POSTBACK_TIMEOUT = POSTBACK_TIMEOUT
     DESIRED_BUSINESS_DAYS = DESIRED_BUSINESS_DAYS
+    WATCHDOG_MAX_RSS_MB = WATCHDOG_MAX_RSS_MB
+    WATCHDOG_MAX_REFRESHES = WATCHDOG_MAX_REFRESHES
+    WATCHDOG_MAX_ERROR_RATE = WATCHDOG_MAX_ERROR_RATE
+    BROWSER_MODE = BROWSER_MODE
+    SHARED_BROWSER_MAX_TABS = SHARED_BROWSER_MAX_TABS
+    CHROME_EXTRA_ARGS = CHROME_EXTRA_ARGS
+    PAGE_LOAD_TIMEOUT = PAGE_LOAD_TIMEOUT
+    COMMAND_TIMEOUT = COMMAND_TIMEOUT
+    DRIVER_MAX_RECOVERIES = DRIVER_MAX_RECOVERIES
+    ADAPTIVE_TIMEOUTS = ADAPTIVE_TIMEOUTS
+    ADAPTIVE_TIMEOUT_FACTOR = ADAPTIVE_TIMEOUT_FACTOR
+    ADAPTIVE_TIMEOUT_MIN = ADAPTIVE_TIMEOUT_MIN
+    ADAPTIVE_TIMEOUT_MAX = ADAPTIVE_TIMEOUT_MAX
+    BREAKER_ERROR_RATE = BREAKER_ERROR_RATE
+    BREAKER_MIN_EVENTS = BREAKER_MIN_EVENTS
+    BREAKER_WINDOW = BREAKER_WINDOW
+    BREAKER_BACKOFF = BREAKER_BACKOFF
+    BREAKER_BACKOFF_MAX = BREAKER_BACKOFF_MAX
+    RUN_STORE_PATH = RUN_STORE_PATH
+    RESUME_STAGGER_SECONDS = RESUME_STAGGER_SECONDS
+    LEASE_STORE_URL = LEASE_STORE_URL
+    LEASE_TTL = LEASE_TTL
+    LEASE_HEARTBEAT = LEASE_HEARTBEAT
+    WORKER_CAPACITY = WORKER_CAPACITY
+    STANDBY_KEEPALIVE_SECONDS = STANDBY_KEEPALIVE_SECONDS
+    STANDBY_MAX_SESSIONS = STANDBY_MAX_SESSIONS
+    THROTTLE_RATE = THROTTLE_RATE
+    THROTTLE_BURST = THROTTLE_BURST
+    THROTTLE_CLUSTER_URL = THROTTLE_CLUSTER_URL
+    FLIGHT_RECORDER_FRAMES = FLIGHT_RECORDER_FRAMES
+    FLIGHT_RECORDER_MAX_MB = FLIGHT_RECORDER_MAX_MB
+    FLIGHT_RECORDER_SAMPLE_EVERY = FLIGHT_RECORDER_SAMPLE_EVERY
+    FLIGHT_RECORDER_SCREENSHOTS = FLIGHT_RECORDER_SCREENSHOTS
+    FLIGHT_RECORDER_DIR = FLIGHT_RECORDER_DIR
+    RECORD_CORPUS = RECORD_CORPUS
+    REPLAY_CORPUS_DIR = REPLAY_CORPUS_DIR
+    RECORD_SCRUB = RECORD_SCRUB
+    CHROMEDRIVER_CACHE_DIR = CHROMEDRIVER_CACHE_DIR
+    METADATA_TTL_HOURS = METADATA_TTL_HOURS
+    WORKER_MODE = WORKER_MODE
+    WORKER_MAX_RSS_MB = WORKER_MAX_RSS_MB
+    WORKER_MAX_CPU_SECONDS = WORKER_MAX_CPU_SECONDS
+    BOT_FACTORY = BOT_FACTORY
+    RUNNER_STATS_SECONDS = RUNNER_STATS_SECONDS
     STOP_FLAG = False
 
     get_tomorrow_week_monday_str = staticmethod(get_tomorrow_week_monday_str)
+    business_days_end = staticmethod(business_days_end)
     is_within_n_business_days = staticmethod(is_within_n_business_days)
     get_week_value_for_date = staticmethod(get_week_value_for_date)
     get_target_window_week_value = staticmethod(get_target_window_week_value)
 
 
-# Debug output bij start
-print(
-    f"[CONFIG] TEST_MODE={Config.TEST_MODE} BOOKING_ENABLED={Config.BOOKING_ENABLED} "
-    f"STATION_ID={Config.STATION_ID} TELEGRAM_CHAT_IDS={Config.TELEGRAM_CHAT_IDS} "
-    f"DESIRED_BUSINESS_DAYS={Config.DESIRED_BUSINESS_DAYS}"
-)
+def config_summary() -> str:
+    """Korte samenvatting voor de logs bij het opstarten (niet meer bij import)."""
+    return (
+        f"[CONFIG] TEST_MODE={Config.TEST_MODE} BOOKING_ENABLED={Config.BOOKING_ENABLED} "
+        f"STATION_ID={Config.STATION_ID} TELEGRAM_CHAT_IDS={Config.TELEGRAM_CHAT_IDS} "
+        f"DESIRED_BUSINESS_DAYS={Config.DESIRED_BUSINESS_DAYS}"
+    )
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Coördinatie tussen meerdere workers (dyno's) via leases.
+
+- "frontend": precies één worker houdt deze lease en doet Telegram-polling.
+- "run:<id>":  elke run in het werkregister draait op precies één worker.
+
+Elke heartbeat verlengt een worker zijn leases, stopt runs waarvan hij de lease
+kwijt is (iemand anders nam over → nooit dubbel pollen/boeken), handelt
+stopverzoeken en nieuwe /set-instellingen af en claimt vrij werk tot zijn capaciteit vol is. Valt een
+worker weg, dan vervallen zijn leases na LEASE_TTL en neemt een andere worker
+de runs automatisch over.
+"""
+
+import asyncio
+import logging
+import os
+import socket
+from typing import Any, Awaitable, Callable, Dict, Optional, Set
+
+from config import Config
+from leases import LeaseStore
+
+log = logging.getLogger("AIBV-Coord")
+
+FRONTEND = "frontend"
+
+
+def default_worker_id() -> str:
+    return f"{os.environ.get('DYNO') or socket.gethostname()}:{os.getpid()}"
+
+
+class Coordinator:
+    def __init__(self,
+                 store: LeaseStore,
+                 start_run: Callable[[str, Dict[str, Any]], None],
+                 stop_run: Callable[[str, bool], Awaitable[None]],
+                 on_frontend: Callable[[bool], Awaitable[None]],
+                 on_settings: Optional[Callable[[str, Dict[str, Any]], None]] = None,
+                 worker_id: Optional[str] = None,
+                 capacity: Optional[int] = None,
+                 ttl: Optional[float] = None,
+                 heartbeat: Optional[float] = None):
+        self.store = store
+        self._start_run = start_run
+        self._stop_run = stop_run
+        self._on_frontend = on_frontend
+        self._on_settings = on_settings
+        self.worker_id = worker_id or default_worker_id()
+        self.capacity = capacity or Config.WORKER_CAPACITY
+        self.ttl = ttl or Config.LEASE_TTL
+        self.heartbeat = heartbeat or Config.LEASE_HEARTBEAT
+        self.is_frontend = False
+        self.held: Dict[str, Dict[str, Any]] = {}  # sleutel → payload van lokaal draaiende runs
+        self._handover: Set[str] = set()           # lokaal gestopt om door te geven, niet afgerond
+
+    async def _io(self, fn, *args):
+        # store-calls (sqlite/redis) zijn blocking → buiten de event loop
+        return await asyncio.to_thread(fn, *args)
+
+    # ---------------- API voor de runner ----------------
+    async def submit(self, key: str, payload: Dict[str, Any]):
+        """Zet een nieuwe run in het werkregister en probeer hem meteen zelf te claimen."""
+        await self._io(self.store.publish, key, payload)
+        await self._claim()
+
+    async def request_stop(self, key: str):
+        """Vraag de eigenaar (waar die ook draait) om de run te stoppen."""
+        await self._io(self.store.update, key, {"stop": True})
+        if key in self.held:
+            await self._stop_local(key)
+
+    async def update_settings(self, key: str, settings: Dict[str, Any]) -> bool:
+        """Nieuwe instellingen (/set) in het register; de eigenaar past ze toe bij zijn volgende heartbeat."""
+        # enkel het veld wijzigen: een gelijktijdig stopverzoek blijft staan
+        payload = await self._io(self.store.update, key, {"settings": settings})
+        if payload is None:
+            return False
+        if key in self.held:
+            self.held[key] = payload  # lokaal al toegepast door de runner
+        return True
+
+    async def finished(self, key: str):
+        """
+        Door de runner aangeroepen zodra een lokale run eindigt. Werd de run enkel
+        gestopt om hem door te geven (lease kwijt, shutdown), dan blijft hij in het
+        register staan zodat een andere worker hem overneemt.
+        """
+        if key in self._handover:
+            self._handover.discard(key)
+            return
+        await self.done(key)
+
+    async def done(self, key: str):
+        """Run is afgerond: uit het register en lease vrijgeven."""
+        self.held.pop(key, None)
+        await self._io(self.store.unpublish, key)
+        await self._io(self.store.release, key, self.worker_id)
+
+    async def work(self) -> Dict[str, Dict[str, Any]]:
+        return await self._io(self.store.work)
+
+    async def owner(self, key: str) -> Optional[str]:
+        return await self._io(self.store.owner, key)
+
+    # ---------------- Heartbeat ----------------
+    async def run(self, stop: asyncio.Event):
+        log.info("Coördinator actief als %s (capaciteit %d)", self.worker_id, self.capacity)
+        try:
+            while not stop.is_set():
+                try:
+                    await self.tick()
+                except Exception as e:
+                    log.warning("Heartbeat mislukt: %s", e)
+                try:
+                    await asyncio.wait_for(stop.wait(), timeout=self.heartbeat)
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            await self.shutdown()
+
+    async def tick(self):
+        await self._frontend()
+        await self._renew()
+        await self._claim()
+
+    async def _frontend(self):
+        if self.is_frontend:
+            ok = await self._io(self.store.renew, FRONTEND, self.worker_id, self.ttl)
+        else:
+            ok = await self._io(self.store.acquire, FRONTEND, self.worker_id, self.ttl)
+        if ok != self.is_frontend:
+            self.is_frontend = ok
+            log.info("Frontend-lease %s", "verkregen" if ok else "verloren")
+            await self._on_frontend(ok)
+
+    async def _renew(self):
+        work = await self.work()
+        for key in list(self.held):
+            if not await self._io(self.store.renew, key, self.worker_id, self.ttl):
+                # lease kwijt (bv. na een netwerkhapering) → iemand anders draait hem nu
+                log.warning("Lease %s verloren → lokale run stoppen", key)
+                self.held.pop(key, None)
+                await self._stop_local(key, handover=True)
+            elif work.get(key, {}).get("stop"):
+                await self._stop_local(key)
+                await self.done(key)
+            elif key in work and work[key].get("settings") != self.held[key].get("settings"):
+                self.held[key] = dict(self.held[key], settings=work[key].get("settings"))
+                if self._on_settings:
+                    self._on_settings(key, work[key].get("settings") or {})
+
+    async def _claim(self):
+        if len(self.held) >= self.capacity:
+            return
+        for key, payload in (await self.work()).items():
+            if len(self.held) >= self.capacity:
+                break
+            if key in self.held:
+                continue
+            if payload.get("stop"):
+                # stopverzoek voor een run zonder eigenaar → gewoon opruimen
+                if not await self.owner(key):
+                    await self._io(self.store.unpublish, key)
+                continue
+            # atomair: de lijst hierboven kan al verouderd zijn (run afgerond of gestopt)
+            payload = await self._io(self.store.claim, key, self.worker_id, self.ttl)
+            if payload:
+                # claims > 1 betekent: overgenomen van een andere (weggevallen) worker
+                self.held[key] = payload
+                log.info("Run %s geclaimd (%d/%d)", key, len(self.held), self.capacity)
+                self._start_run(key, payload)
+
+    async def _stop_local(self, key: str, handover: bool = False):
+        if handover:
+            self._handover.add(key)
+        try:
+            await self._stop_run(key, handover)
+        except Exception as e:
+            log.warning("Stoppen van %s mislukt: %s", key, e)
+
+    async def shutdown(self):
+        """Leases vrijgeven zodat andere workers meteen kunnen overnemen (bv. bij een deploy)."""
+        for key in list(self.held):
+            await self._stop_local(key, handover=True)
+            await self._io(self.store.release, key, self.worker_id)
+        self.held.clear()
+        if self.is_frontend:
+            self.is_frontend = False
+            await self._on_frontend(False)
+            await self._io(self.store.release, FRONTEND, self.worker_id)
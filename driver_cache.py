@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Offline resolutie van chromedriver.
+
+`ChromeDriverManager().install()` vraagt bij elke run online de juiste versie
+op. Hier gebeurt dat hoogstens één keer per Chrome-hoofdversie: het gevonden
+binary wordt gekopieerd naar CHROMEDRIVER_CACHE_DIR en in een index bewaard.
+Daarna is de resolutie volledig offline; de Chrome-versie zelf wordt gecachet
+op (pad, mtime) van het Chrome-binary, zodat ook `chrome --version` niet telkens
+opnieuw moet draaien.
+"""
+
+import json
+import logging
+import os
+import re
+import shutil
+import stat
+import subprocess
+import threading
+from typing import Optional
+
+from config import Config
+
+log = logging.getLogger("AIBV-DriverCache")
+
+_CHROME_CANDIDATES = ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome")
+
+_lock = threading.Lock()
+_resolved: Optional[str] = None  # memo per proces
+
+
+def _index_path() -> str:
+    return os.path.join(Config.CHROMEDRIVER_CACHE_DIR, "index.json")
+
+
+def _load_index() -> dict:
+    try:
+        with open(_index_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_index(index: dict):
+    os.makedirs(Config.CHROMEDRIVER_CACHE_DIR, exist_ok=True)
+    tmp = _index_path() + ".tmp"
+    with open(tmp, "w") as f:
+        json.dump(index, f, indent=2)
+    os.replace(tmp, _index_path())
+
+
+def chrome_binary() -> Optional[str]:
+    explicit = os.environ.get("GOOGLE_CHROME_BIN") or os.environ.get("CHROME_BIN")
+    if explicit:
+        return explicit
+    for name in _CHROME_CANDIDATES:
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def chrome_major_version(index: Optional[dict] = None) -> Optional[str]:
+    """Hoofdversie van de geïnstalleerde Chrome, gecachet op (pad, mtime)."""
+    binary = chrome_binary()
+    if not binary:
+        return None
+    try:
+        key = f"{os.path.realpath(binary)}:{int(os.stat(binary).st_mtime)}"
+    except OSError:
+        return None
+    index = _load_index() if index is None else index
+    cached = index.get("chrome", {}).get(key)
+    if cached:
+        return cached
+    try:
+        out = subprocess.run([binary, "--version"], capture_output=True, text=True, timeout=15).stdout
+    except (OSError, subprocess.SubprocessError):
+        return None
+    m = re.search(r"(\d+)\.\d+\.\d+", out or "")
+    if not m:
+        return None
+    index.setdefault("chrome", {})[key] = m.group(1)
+    _save_index(index)
+    return m.group(1)
+
+
+def resolve_chromedriver() -> str:
+    """
+    Pad naar een chromedriver die past bij de geïnstalleerde Chrome.
+    Enkel de eerste keer per Chrome-hoofdversie is er netwerk nodig.
+    """
+    global _resolved
+    with _lock:
+        if _resolved and os.path.exists(_resolved):
+            return _resolved
+
+        index = _load_index()
+        major = chrome_major_version(index) or "unknown"
+        cached = index.get("drivers", {}).get(major)
+        if cached and os.path.exists(cached):
+            _resolved = cached
+            return cached
+
+        # Eenmalig online ophalen en in onze eigen cache bewaren
+        log.info("chromedriver voor Chrome %s niet in cache → downloaden", major)
+        from webdriver_manager.chrome import ChromeDriverManager
+        downloaded = ChromeDriverManager().install()
+
+        os.makedirs(Config.CHROMEDRIVER_CACHE_DIR, exist_ok=True)
+        target = os.path.join(Config.CHROMEDRIVER_CACHE_DIR, f"chromedriver-{major}")
+        shutil.copy2(downloaded, target)
+        os.chmod(target, os.stat(target).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+
+        index.setdefault("drivers", {})[major] = target
+        _save_index(index)
+        _resolved = target
+        return target
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Supervisie van WebDriver-calls.
+
+Riskante commando's (page loads, refresh, click, quit) lopen met een harde
+deadline in een hulpthread. Loopt de deadline af, dan beschouwen we de driver
+als vastgelopen: de chromedriver/Chrome-procesboom wordt gekild en er volgt een
+DriverWedged, waarna de controller de run herstelt vanaf zijn laatste checkpoint.
+"""
+
+import time
+import logging
+import threading
+from collections import deque
+from typing import Any, Callable, Deque, Optional
+
+from config import Config
+import proctools
+
+log = logging.getLogger("AIBV-Supervisor")
+
+
+class RunCancelled(BaseException):
+    """
+    Wordt opgegooid zodra een run gestopt wordt terwijl er nog gewacht wordt.
+    Erft (zoals asyncio.CancelledError) van BaseException zodat de brede
+    `except Exception`-blokken in de flow een stop niet opslokken.
+    Staat hier (zonder selenium-imports) zodat de runner hem kan vangen
+    zonder selenium bij het opstarten te laden.
+    """
+
+
+class DriverWedged(Exception):
+    """Een WebDriver-commando reageerde niet binnen zijn deadline."""
+
+
+class DriverSupervisor:
+    def __init__(self, pid_func: Callable[[], Optional[int]], command_timeout: Optional[int] = None):
+        self._pid_func = pid_func
+        self.command_timeout = command_timeout or Config.COMMAND_TIMEOUT
+        self.wedged = 0
+        self.recoveries = 0
+        self._latencies: Deque[float] = deque(maxlen=50)
+
+    # ---------------- Deadlines ----------------
+    def call(self, what: str, fn: Callable[..., Any], *args, timeout: Optional[float] = None, **kwargs) -> Any:
+        """Voer fn uit met een harde deadline; bij overschrijding → kill + DriverWedged."""
+        timeout = timeout or self.command_timeout
+        box = {}
+        done = threading.Event()
+
+        def _run():
+            try:
+                box["result"] = fn(*args, **kwargs)
+            except BaseException as e:
+                box["error"] = e
+            finally:
+                done.set()
+
+        threading.Thread(target=_run, name=f"aibv-wd-{what}", daemon=True).start()
+        if not done.wait(timeout):
+            self.wedged += 1
+            log.error("WebDriver-commando '%s' hangt > %ss → browser killen", what, timeout)
+            self.kill_browser()
+            raise DriverWedged(f"WebDriver-commando '{what}' reageerde niet binnen {timeout:.0f}s")
+        if "error" in box:
+            raise box["error"]
+        return box.get("result")
+
+    def kill_browser(self) -> int:
+        """Kill chromedriver en de volledige Chrome-procesboom eronder."""
+        try:
+            pid = self._pid_func()
+        except Exception:
+            pid = None
+        if not pid:
+            return 0
+        return proctools.kill_tree(pid)
+
+    # ---------------- Herstel-statistiek ----------------
+    def record_recovery(self, started: float):
+        self.recoveries += 1
+        self._latencies.append(time.monotonic() - started)
+
+    @property
+    def last_latency(self) -> float:
+        return self._latencies[-1] if self._latencies else 0.0
+
+    @property
+    def avg_latency(self) -> float:
+        return sum(self._latencies) / len(self._latencies) if self._latencies else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"hangs={self.wedged} herstellingen={self.recoveries} "
+            f"hersteltijd laatste={self.last_latency:.1f}s gem={self.avg_latency:.1f}s"
+        )
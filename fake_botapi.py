@@ -0,0 +1,208 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Minimale nep-Bot-API voor lokale tests en harnassen (geen echte Telegram nodig).
+
+Start de bot met TELEGRAM_API_URL=http://127.0.0.1:<poort> en een willekeurige
+token. De nep-API beantwoordt getMe, getUpdates (long polling), setWebhook,
+deleteWebhook, sendMessage, sendDocument, sendChatAction, … en houdt bij wat de
+bot verstuurd heeft, met tijdstempel. Updates injecteer je met `inject()`
+(polling) of door ze zelf naar de webhook van de bot te POSTen.
+
+Optioneel simuleert `rtt` de netwerkvertraging per API-call.
+"""
+
+import asyncio
+import itertools
+import json
+import time
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import tornado.web
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+BOT_USER = {
+    "id": 123, "is_bot": True, "first_name": "AIBV Fake", "username": "aibv_fake_bot",
+    "can_join_groups": False, "can_read_all_group_messages": False, "supports_inline_queries": False,
+}
+
+# methodes die een Message teruggeven
+_MESSAGE_METHODS = {"sendMessage", "sendDocument", "sendPhoto", "editMessageText"}
+
+
+class FakeBotAPI:
+    def __init__(self, rtt: float = 0.0):
+        self.rtt = rtt
+        self.updates: List[Dict[str, Any]] = []
+        self.sent: List[Tuple[float, str, Dict[str, Any]]] = []  # (monotonic, methode, parameters)
+        self._by_chat: Dict[str, List[Tuple[float, str, Dict[str, Any]]]] = defaultdict(list)
+        self.calls: Counter = Counter()
+        self.webhook_url: Optional[str] = None
+        self.webhook_secret: Optional[str] = None
+        self.port: Optional[int] = None
+        self._update_ids = itertools.count(1)
+        self._message_ids = itertools.count(1)
+        self._new_update = asyncio.Event()
+        self._new_sent = asyncio.Event()
+        self._server: Optional[HTTPServer] = None
+
+    # ---------------- Server ----------------
+    async def start(self, port: int = 0, host: str = "127.0.0.1") -> int:
+        app = tornado.web.Application([(r"/bot([^/]+)/(\w+)", _Handler, {"api": self})])
+        sockets = bind_sockets(port, host)
+        self._server = HTTPServer(app)
+        self._server.add_sockets(sockets)
+        self.port = sockets[0].getsockname()[1]
+        return self.port
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    async def stop(self):
+        if self._server:
+            self._server.stop()
+            # openstaande long polls laten terugkeren in plaats van ze af te breken
+            self._new_update.set()
+            await asyncio.sleep(0.1)
+            await self._server.close_all_connections()
+
+    # ---------------- Updates ----------------
+    def command(self, chat_id: int, text: str) -> Dict[str, Any]:
+        """Bouw een Update met een commando zoals Telegram die zou sturen."""
+        uid = next(self._update_ids)
+        cmd = text.split()[0]
+        return {
+            "update_id": uid,
+            "message": {
+                "message_id": uid, "date": int(time.time()), "text": text,
+                "chat": {"id": chat_id, "type": "private", "first_name": "Test"},
+                "from": {"id": chat_id, "is_bot": False, "first_name": "Test"},
+                "entities": [{"type": "bot_command", "offset": 0, "length": len(cmd)}],
+            },
+        }
+
+    def inject(self, update: Dict[str, Any]):
+        """Update klaarzetten voor getUpdates (polling-modus)."""
+        self.updates.append(update)
+        self._new_update.set()
+
+    async def _get_updates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        offset = int(params.get("offset") or 0)
+        if offset:
+            self.updates = [u for u in self.updates if u["update_id"] >= offset]
+        if not self.updates:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), timeout=float(params.get("timeout") or 0))
+            except asyncio.TimeoutError:
+                pass
+        limit = int(params.get("limit") or 100)
+        return self.updates[:limit]
+
+    # ---------------- Verstuurd ----------------
+    def messages(self, chat_id: Optional[int] = None, after: float = 0.0,
+                 prefixes: Tuple[str, ...] = ()) -> List[Tuple[float, str, Dict[str, Any]]]:
+        """Verstuurde berichten (optioneel naar één chat, na `after`, met tekst die begint met een van `prefixes`)."""
+        source = self.sent if chat_id is None else self._by_chat.get(str(chat_id), [])
+        return [
+            m for m in source
+            if m[0] >= after and m[1] in _MESSAGE_METHODS
+            and (not prefixes or str(m[2].get("text") or m[2].get("caption") or "").startswith(prefixes))
+        ]
+
+    async def wait_message(self, chat_id: int, after: float, timeout: float = 10.0,
+                           prefixes: Tuple[str, ...] = ()) -> Optional[float]:
+        """Wacht op het eerste (passende) bericht naar chat_id na `after`; geeft het tijdstip (monotonic) of None."""
+        deadline = time.monotonic() + timeout
+        while True:
+            found = self.messages(chat_id, after, prefixes)
+            if found:
+                return found[0][0]
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            self._new_sent.clear()
+            try:
+                await asyncio.wait_for(self._new_sent.wait(), timeout=remaining)
+            except asyncio.TimeoutError:
+                return None
+
+    async def wait_call(self, method: str, timeout: float = 30.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while not self.calls[method]:
+            if time.monotonic() > deadline:
+                return False
+            await asyncio.sleep(0.02)
+        return True
+
+    # ---------------- Dispatch ----------------
+    async def handle(self, method: str, params: Dict[str, Any]) -> Any:
+        self.calls[method] += 1
+        if self.rtt:
+            await asyncio.sleep(self.rtt / 2)
+        if method == "getMe":
+            return BOT_USER
+        if method == "getUpdates":
+            return await self._get_updates(params)
+        if method == "setWebhook":
+            self.webhook_url = params.get("url")
+            self.webhook_secret = params.get("secret_token")
+            return True
+        if method == "deleteWebhook":
+            self.webhook_url = None
+            return True
+        if method == "getWebhookInfo":
+            return {"url": self.webhook_url or "", "has_custom_certificate": False, "pending_update_count": 0}
+
+        entry = (time.monotonic(), method, params)
+        self.sent.append(entry)
+        self._by_chat[str(params.get("chat_id"))].append(entry)
+        self._new_sent.set()
+        if method in _MESSAGE_METHODS:
+            return {
+                "message_id": next(self._message_ids), "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id") or 0), "type": "private"},
+                "from": BOT_USER, "text": params.get("text") or params.get("caption") or "",
+            }
+        return True
+
+
+class _Handler(tornado.web.RequestHandler):
+    def initialize(self, api: FakeBotAPI):
+        self.api = api
+
+    def _params(self) -> Dict[str, Any]:
+        params: Dict[str, Any] = {}
+        ctype = self.request.headers.get("Content-Type", "")
+        if "application/json" in ctype and self.request.body:
+            params.update(json.loads(self.request.body))
+        else:
+            for key in self.request.body_arguments:
+                params[key] = self.get_body_argument(key)
+            for key in self.request.query_arguments:
+                params[key] = self.get_query_argument(key)
+        # PTB stuurt complexe waarden als JSON-strings mee
+        for key, value in list(params.items()):
+            if isinstance(value, str) and value[:1] in "[{":
+                try:
+                    params[key] = json.loads(value)
+                except ValueError:
+                    pass
+        return params
+
+    async def _serve(self, token: str, method: str):
+        result = await self.api.handle(method, self._params())
+        if self.api.rtt:
+            await asyncio.sleep(self.api.rtt / 2)
+        self.set_header("Content-Type", "application/json")
+        self.write(json.dumps({"ok": True, "result": result}))
+
+    async def post(self, token: str, method: str):
+        await self._serve(token, method)
+
+    async def get(self, token: str, method: str):
+        await self._serve(token, method)
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Nep-controller voor loadtests: doet alsof hij AIBVBookingBot is, zonder Chrome.
+
+Activeren met BOT_FACTORY=fake_controller:FakeBookingBot. Elke stap (driver,
+login, voertuig, station) duurt FAKE_STEP_SECONDS; tijdens het monitoren volgt
+elke FAKE_REFRESH_SECONDS een "refresh" met een voortgangsmelding, net als de
+echte bot. Na FAKE_FIND_AFTER refreshes (0 = nooit) wordt een slot "gevonden".
+FAKE_FAIL_RATE laat een deel van de setup-stappen mislukken. Alle wachttijden
+krijgen ±20% jitter en breken af op request_stop(), zoals de echte waits.
+"""
+
+import logging
+import os
+import random
+import threading
+from typing import Callable, Optional
+
+from config import Config
+from driver_supervisor import RunCancelled
+from run_config import RunConfig
+
+log = logging.getLogger("AIBV-Fake")
+
+FAKE_STEP_SECONDS = float(os.environ.get("FAKE_STEP_SECONDS", "0.5"))
+FAKE_REFRESH_SECONDS = float(os.environ.get("FAKE_REFRESH_SECONDS", "2"))
+FAKE_FIND_AFTER = int(os.environ.get("FAKE_FIND_AFTER", "0"))
+FAKE_FAIL_RATE = float(os.environ.get("FAKE_FAIL_RATE", "0"))
+
+
+class _FakeWatchdog:
+    def __init__(self):
+        self.total_refreshes = 0
+        self.recycles = 0
+
+    def summary(self) -> str:
+        return f"nep, {self.total_refreshes} refreshes"
+
+
+class _FakeSupervisor:
+    recoveries = 0
+
+    def summary(self) -> str:
+        return "nep"
+
+
+class _FakeRecorder:
+    def close(self):
+        pass
+
+
+class FakeBookingBot:
+    def __init__(self):
+        self.driver = None  # geen browser → page_info geeft lege waarden
+        self.notify_func: Optional[Callable[[str], None]] = None
+        self.stop_event = threading.Event()
+        self.run_config = RunConfig()
+        self.watchdog = _FakeWatchdog()
+        self.supervisor = _FakeSupervisor()
+        self.recorder = _FakeRecorder()
+        self.step = "driver"
+
+    @property
+    def stations(self):
+        return self.run_config.stations
+
+    @stations.setter
+    def stations(self, value):
+        self.run_config.update(stations=value)
+
+    @property
+    def business_days(self):
+        return self.run_config.window
+
+    @business_days.setter
+    def business_days(self, value):
+        self.run_config.update(window=value)
+
+    # ---------------- Hulp ----------------
+    def set_notifier(self, fn: Callable[[str], None]):
+        self.notify_func = fn
+
+    def set_settings_listener(self, fn: Callable[[dict], None]):
+        pass  # de nepflow draait instellingen nooit zelf terug
+
+    def _notify(self, msg: str):
+        try:
+            if self.notify_func:
+                self.notify_func(msg)
+        except Exception:
+            pass
+
+    def request_stop(self):
+        self.stop_event.set()
+
+    @property
+    def stopped(self) -> bool:
+        return Config.STOP_FLAG or self.stop_event.is_set()
+
+    def _sleep(self, seconds: float):
+        if self.stop_event.wait(seconds * random.uniform(0.8, 1.2)) or Config.STOP_FLAG:
+            raise RunCancelled("Run gestopt")
+
+    def _step(self, name: str):
+        self.step = name
+        self._sleep(FAKE_STEP_SECONDS)
+        if FAKE_FAIL_RATE and random.random() < FAKE_FAIL_RATE:
+            raise RuntimeError(f"gesimuleerde fout in {name}")
+
+    def supervised(self, fn: Callable, *args, **kwargs):
+        return fn(*args, **kwargs)
+
+    # ---------------- Flow ----------------
+    def setup_driver(self):
+        self._step("driver")
+
+    def login(self):
+        self._step("login")
+
+    def select_vehicle(self, plate: str, first_reg_date_str: str):
+        self._step("voertuig")
+
+    def select_station(self):
+        self._step("station")
+
+    def back_to_start(self):
+        self._step("voertuig")
+
+    def refresh(self):
+        self.watchdog.total_refreshes += 1
+
+    def keep_alive(self):
+        self.refresh()
+
+    def wait_dom_idle(self, timeout=20):
+        return True
+
+    def find_first_slot_in_window(self):
+        return None
+
+    def monitor_and_book(self):
+        self.step = "monitor"
+        self._notify("🕑 Monitoren gestart…")
+        try:
+            while not self.stopped:
+                if FAKE_FIND_AFTER and self.watchdog.total_refreshes >= FAKE_FIND_AFTER:
+                    label = "ma 01/01 08:00"
+                    if self.run_config.booking:
+                        self._notify(f"✅ Bevestigd: {label}")
+                        return {"success": True, "slot": label}
+                    self._notify(f"🎯 Gevonden binnen venster: {label} — maar boeken staat uit, geen bevestiging.")
+                    return {"success": True, "slot": label, "booking_disabled": True}
+                self._notify("⏳ Nog geen slot binnen venster… blijf zoeken")
+                self.refresh()
+                self._sleep(FAKE_REFRESH_SECONDS)
+        except RunCancelled:
+            pass
+        return {"success": False, "stopped": True}
+
+    def dump_flight_recorder(self, label: str) -> Optional[str]:
+        return None
+
+    def close(self):
+        self.driver = None
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Flight recorder: de laatste N paginatoestanden van een run in een ring met vaste grootte.
+
+Per sample bewaren we URL, titel, stap en de gecomprimeerde DOM (zlib), optioneel
+met een verkleinde JPEG-screenshot via CDP. Enkel het ophalen van page_source
+gebeurt op de bot-thread (en enkel voor elke n-de sample); comprimeren en in
+de ring plaatsen doet een achtergrondthread. De ring is begrensd in aantal
+frames én in bytes, hoe lang de run ook duurt. Bij een fout schrijft `dump()`
+de ring als zip weg, die de runner als bijlage naar Telegram stuurt.
+"""
+
+import io
+import json
+import logging
+import os
+import queue
+import threading
+import time
+import zipfile
+import zlib
+from collections import deque
+from typing import Deque, Dict, Optional
+
+from config import Config
+
+log = logging.getLogger("AIBV-FlightRecorder")
+
+
+class _Frame:
+    __slots__ = ("ts", "step", "url", "title", "html_z", "shot")
+
+    def __init__(self, ts: float, step: str, url: str, title: str, html_z: bytes, shot: Optional[bytes]):
+        self.ts = ts
+        self.step = step
+        self.url = url
+        self.title = title
+        self.html_z = html_z
+        self.shot = shot
+
+    @property
+    def size(self) -> int:
+        return len(self.html_z) + len(self.shot or b"")
+
+
+class FlightRecorder:
+    def __init__(self,
+                 frames: Optional[int] = None,
+                 max_bytes: Optional[int] = None,
+                 sample_every: Optional[int] = None,
+                 screenshots: Optional[bool] = None):
+        self.frames = frames or Config.FLIGHT_RECORDER_FRAMES
+        self.max_bytes = max_bytes or Config.FLIGHT_RECORDER_MAX_MB * 1024 * 1024
+        self.sample_every = max(1, sample_every or Config.FLIGHT_RECORDER_SAMPLE_EVERY)
+        self.screenshots = Config.FLIGHT_RECORDER_SCREENSHOTS if screenshots is None else screenshots
+
+        self._ring: Deque[_Frame] = deque()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._calls = 0
+        self.dropped = 0
+        # klein: liever een sample laten vallen dan de monitor ophouden
+        self._pending: "queue.Queue[Optional[tuple]]" = queue.Queue(maxsize=4)
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------------- Capture ----------------
+    def maybe_capture(self, driver, step: str, force: bool = False):
+        """Neem (gesampled) een snapshot van de huidige pagina."""
+        if not Config.FLIGHT_RECORDER_FRAMES or driver is None:
+            return
+        self._calls += 1
+        if not force and self._calls % self.sample_every:
+            return
+        try:
+            html = driver.page_source or ""
+            url = driver.current_url or ""
+            title = driver.title or ""
+            shot = self._screenshot(driver) if self.screenshots else None
+        except Exception as e:
+            log.debug("Snapshot mislukt: %s", e)
+            return
+        item = (time.time(), step, url, title, html, shot)
+        if force:
+            # bij een fout synchroon, zodat de dump het laatste frame zeker bevat
+            self._store(*item)
+            return
+        self._ensure_thread()
+        try:
+            self._pending.put_nowait(item)
+        except queue.Full:
+            self.dropped += 1
+
+    def _screenshot(self, driver) -> Optional[bytes]:
+        """Verkleinde JPEG via CDP (geen Pillow nodig)."""
+        try:
+            import base64
+            w, h = driver.execute_script("return [window.innerWidth, window.innerHeight];")
+            data = driver.execute_cdp_cmd("Page.captureScreenshot", {
+                "format": "jpeg", "quality": 40,
+                "clip": {"x": 0, "y": 0, "width": w, "height": h, "scale": 0.5},
+            })
+            return base64.b64decode(data["data"])
+        except Exception:
+            return None
+
+    def _ensure_thread(self):
+        if self._thread and self._thread.is_alive():
+            return
+        self._thread = threading.Thread(target=self._compress_loop, name="aibv-flightrec", daemon=True)
+        self._thread.start()
+
+    def _compress_loop(self):
+        while True:
+            item = self._pending.get()
+            if item is None:
+                return
+            self._store(*item)
+
+    def _store(self, ts: float, step: str, url: str, title: str, html: str, shot: Optional[bytes]):
+        frame = _Frame(ts, step, url, title, zlib.compress(html.encode("utf-8", "replace"), 6), shot)
+        with self._lock:
+            self._ring.append(frame)
+            self._bytes += frame.size
+            # het nieuwste frame blijft altijd staan, ook als het alleen al te groot is
+            while len(self._ring) > 1 and (len(self._ring) > self.frames or self._bytes > self.max_bytes):
+                self._bytes -= self._ring.popleft().size
+
+    # ---------------- Uitlezen ----------------
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            return {"frames": len(self._ring), "bytes": self._bytes, "dropped": self.dropped}
+
+    def dump(self, directory: Optional[str] = None, name: str = "run") -> Optional[str]:
+        """Schrijf de ring als zip (html + jpg + index.json). Geeft het pad, of None als leeg."""
+        with self._lock:
+            frames = list(self._ring)
+        if not frames:
+            return None
+        directory = directory or Config.FLIGHT_RECORDER_DIR
+        os.makedirs(directory, exist_ok=True)
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        safe = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+        path = os.path.join(directory, f"{safe}-{stamp}.zip")
+
+        buf = io.BytesIO()
+        index = []
+        with zipfile.ZipFile(buf, "w", zipfile.ZIP_DEFLATED) as zf:
+            for i, f in enumerate(frames):
+                base = f"{i:02d}_{f.step}"
+                zf.writestr(f"{base}.html", zlib.decompress(f.html_z))
+                if f.shot:
+                    zf.writestr(f"{base}.jpg", f.shot)
+                index.append({
+                    "i": i, "ts": f.ts, "time": time.strftime("%H:%M:%S", time.localtime(f.ts)),
+                    "step": f.step, "url": f.url, "title": f.title, "screenshot": bool(f.shot),
+                })
+            zf.writestr("index.json", json.dumps(index, indent=2, ensure_ascii=False))
+        with open(path, "wb") as fh:
+            fh.write(buf.getvalue())
+        log.info("Flight recorder gedumpt: %s (%d frames)", path, len(frames))
+        return path
+
+    def close(self):
+        if self._thread and self._thread.is_alive():
+            try:
+                self._pending.put_nowait(None)
+            except queue.Full:
+                pass
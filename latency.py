@@ -0,0 +1,182 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Adaptieve timeouts en een circuit breaker op basis van de gemeten AIBV-latency.
+
+- LatencyTracker: rollende percentielen per pagina/actie (bv. "login:dom",
+  "voertuig:MainContent_grdVoertuigen", "refresh"). De timeout van een wait
+  wordt p99 × ADAPTIVE_TIMEOUT_FACTOR, begrensd tussen ADAPTIVE_TIMEOUT_MIN en
+  ADAPTIVE_TIMEOUT_MAX. Zolang er te weinig metingen zijn geldt de vaste
+  timeout uit de code. Een time-out telt zelf ook als meting, zodat een trage
+  site de timeouts vanzelf doet oplopen in plaats van een refresh-storm.
+- CircuitBreaker: procesbreed foutpercentage over een rollend venster. Boven
+  BREAKER_ERROR_RATE gaat hij open en wachten alle runs (in `_throttle`) met
+  exponentiële backoff. Daarna laat hij één proefrequest door (half-open);
+  lukt dat, dan gaan alle runs verder, anders volgt een langere pauze.
+"""
+
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from config import Config
+
+log = logging.getLogger("AIBV-Latency")
+
+_MIN_SAMPLES = 20
+
+
+def _percentile(sorted_values, p: float) -> float:
+    if not sorted_values:
+        return 0.0
+    k = min(len(sorted_values) - 1, max(0, int(round(p / 100.0 * (len(sorted_values) - 1)))))
+    return sorted_values[k]
+
+
+class LatencyTracker:
+    def __init__(self, factor: Optional[float] = None, min_timeout: Optional[float] = None,
+                 max_timeout: Optional[float] = None, samples: int = 200):
+        self.factor = factor or Config.ADAPTIVE_TIMEOUT_FACTOR
+        self.min_timeout = min_timeout or Config.ADAPTIVE_TIMEOUT_MIN
+        self.max_timeout = max_timeout or Config.ADAPTIVE_TIMEOUT_MAX
+        self._samples: Dict[str, Deque[float]] = defaultdict(lambda: deque(maxlen=samples))
+        self._lock = threading.Lock()
+
+    def record(self, key: str, seconds: float):
+        with self._lock:
+            self._samples[key].append(max(0.0, seconds))
+
+    def percentiles(self, key: str) -> Tuple[float, float, int]:
+        """(p50, p99, aantal metingen) voor deze sleutel."""
+        with self._lock:
+            values = sorted(self._samples.get(key, ()))
+        return _percentile(values, 50), _percentile(values, 99), len(values)
+
+    def timeout(self, key: str, default: float) -> float:
+        """Timeout voor deze wait: afgeleid van p99, of `default` zolang er te weinig metingen zijn."""
+        if not Config.ADAPTIVE_TIMEOUTS:
+            return default
+        _, p99, n = self.percentiles(key)
+        if n < _MIN_SAMPLES:
+            return default
+        return min(self.max_timeout, max(self.min_timeout, p99 * self.factor))
+
+    def summary(self, top: int = 3) -> str:
+        with self._lock:
+            keys = list(self._samples)
+        if not keys:
+            return "nog geen metingen"
+        rows = sorted(((k, *self.percentiles(k)) for k in keys), key=lambda r: r[2], reverse=True)
+        slowest = ", ".join(f"{k} p50={p50:.1f}s p99={p99:.1f}s" for k, p50, p99, _ in rows[:top])
+        return f"{len(keys)} acties; traagst: {slowest}"
+
+
+class CircuitBreaker:
+    CLOSED = "dicht"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, error_rate: Optional[float] = None, min_events: Optional[int] = None,
+                 window: Optional[float] = None, backoff: Optional[float] = None,
+                 backoff_max: Optional[float] = None):
+        self.error_rate = Config.BREAKER_ERROR_RATE if error_rate is None else error_rate
+        self.min_events = min_events or Config.BREAKER_MIN_EVENTS
+        self.window = window or Config.BREAKER_WINDOW
+        self.base_backoff = backoff or Config.BREAKER_BACKOFF
+        self.backoff_max = backoff_max or Config.BREAKER_BACKOFF_MAX
+
+        self.state = self.CLOSED
+        self.trips = 0
+        self.backoff = self.base_backoff
+        self.open_until = 0.0
+        self.paused_total = 0.0
+        self._events: Deque[Tuple[float, bool]] = deque()  # (tijd, fout?)
+        self._probe = False  # er loopt een proefrequest in half-open
+        self._probe_at = 0.0
+        self._cond = threading.Condition()
+
+    # ---------------- Registratie ----------------
+    def _rate(self, now: float) -> Tuple[float, int]:
+        while self._events and now - self._events[0][0] > self.window:
+            self._events.popleft()
+        n = len(self._events)
+        return (sum(1 for _, err in self._events if err) / n if n else 0.0), n
+
+    def record_success(self):
+        with self._cond:
+            self._events.append((time.monotonic(), False))
+            if self.state == self.HALF_OPEN:
+                log.info("Circuit breaker dicht: AIBV reageert weer")
+                self.state = self.CLOSED
+                self.backoff = self.base_backoff
+                self._probe = False
+                self._events.clear()
+                self._cond.notify_all()
+
+    def record_failure(self):
+        with self._cond:
+            now = time.monotonic()
+            self._events.append((now, True))
+            if self.state == self.HALF_OPEN:
+                self._trip(now, min(self.backoff_max, self.backoff * 2))
+                return
+            if self.state == self.CLOSED and self.error_rate:
+                rate, n = self._rate(now)
+                if n >= self.min_events and rate >= self.error_rate:
+                    self._trip(now, self.base_backoff)
+
+    def _trip(self, now: float, backoff: float):
+        self.state = self.OPEN
+        self.trips += 1
+        self.backoff = backoff
+        self.open_until = now + backoff
+        self._probe = False
+        self._events.clear()
+        log.warning("Circuit breaker open: alle runs pauzeren %.0fs (trip %d)", backoff, self.trips)
+        self._cond.notify_all()
+
+    # ---------------- Wachten ----------------
+    def wait(self, cancelled: Optional[Callable[[], bool]] = None) -> Optional[float]:
+        """
+        Blokkeer zolang de breaker open is. Geeft de wachttijd terug, of None als
+        `cancelled()` intussen True werd. In half-open mag er één request door.
+        """
+        start = time.monotonic()
+        with self._cond:
+            while True:
+                if cancelled and cancelled():
+                    return None
+                now = time.monotonic()
+                if self.state == self.OPEN and now >= self.open_until:
+                    self.state = self.HALF_OPEN
+                    log.info("Circuit breaker half-open: proefrequest")
+                if self.state == self.CLOSED:
+                    break
+                # proef zonder uitkomst (bv. run gestopt) → na een commando-deadline een nieuwe
+                if self.state == self.HALF_OPEN and (
+                        not self._probe or now - self._probe_at > Config.COMMAND_TIMEOUT):
+                    self._probe, self._probe_at = True, now
+                    break
+                timeout = self.open_until - now if self.state == self.OPEN else 1.0
+                self._cond.wait(timeout=min(max(timeout, 0.05), 1.0))
+        waited = time.monotonic() - start
+        if waited > 0.05:
+            with self._cond:
+                self.paused_total += waited
+        return waited
+
+    def summary(self) -> str:
+        with self._cond:
+            rate, n = self._rate(time.monotonic())
+            extra = f", nog {max(0.0, self.open_until - time.monotonic()):.0f}s" if self.state == self.OPEN else ""
+            return (
+                f"{self.state}{extra}, foutratio {rate:.0%} over {n} events, "
+                f"{self.trips} trips, gepauzeerd {self.paused_total:.0f}s"
+            )
+
+
+tracker = LatencyTracker()
+breaker = CircuitBreaker()
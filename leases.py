@@ -0,0 +1,292 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lease store voor het verdelen van werk over meerdere workers/dyno's.
+
+Een lease is (sleutel → eigenaar, vervaltijd). Zolang een worker zijn lease
+vernieuwt (heartbeat) blijft het werk bij hem; valt de heartbeat weg, dan
+vervalt de lease en kan een andere worker hem overnemen.
+
+Naast leases houdt de store een werkregister bij (sleutel → payload) met alle
+runs die ergens moeten draaien; workers claimen daaruit werk zonder lease.
+
+Claimen (lease nemen + eigenaar/claims in de payload) en velden in een payload
+wijzigen gebeuren elk in één atomaire stap, zodat een afgeronde run niet opnieuw
+start en een stopverzoek niet overschreven wordt.
+
+Backends:
+  sqlite:///pad/naar/leases.db   (lokaal, meerdere processen op één machine)
+  redis://host:6379/0            (productie, vereist het pakket `redis`)
+"""
+
+import json
+import sqlite3
+from abc import ABC, abstractmethod
+import threading
+import time
+from typing import Any, Dict, Optional
+
+
+class LeaseStore(ABC):
+    """Interface; zie SQLiteLeaseStore en RedisLeaseStore."""
+
+    # ---------------- Leases ----------------
+    @abstractmethod
+    def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        """Neem de lease als die vrij of verlopen is (of al van owner is)."""
+        ...
+
+    @abstractmethod
+    def renew(self, key: str, owner: str, ttl: float) -> bool:
+        """Verleng de lease; False als owner hem niet (meer) heeft."""
+        ...
+
+    @abstractmethod
+    def release(self, key: str, owner: str):
+        ...
+
+    @abstractmethod
+    def owner(self, key: str) -> Optional[str]:
+        ...
+
+    # ---------------- Werkregister ----------------
+    @abstractmethod
+    def publish(self, key: str, payload: Dict[str, Any]):
+        ...
+
+    @abstractmethod
+    def unpublish(self, key: str):
+        ...
+
+    @abstractmethod
+    def work(self) -> Dict[str, Dict[str, Any]]:
+        ...
+
+    @abstractmethod
+    def update(self, key: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """Velden in de payload zetten; None (en niets gewijzigd) als het werk niet meer bestaat."""
+        ...
+
+    @abstractmethod
+    def claim(self, key: str, owner: str, ttl: float) -> Optional[Dict[str, Any]]:
+        """
+        Lease nemen, maar enkel als het werk nog gepubliceerd is en niet gestopt
+        moet worden; owner en claims staan dan meteen in de payload. Geeft de
+        nieuwe payload terug, of None.
+        """
+        ...
+
+    def close(self):
+        pass
+
+
+class SQLiteLeaseStore(LeaseStore):
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS leases (
+                key        TEXT PRIMARY KEY,
+                owner      TEXT NOT NULL,
+                expires_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS work (
+                key     TEXT PRIMARY KEY,
+                payload TEXT NOT NULL
+            );
+            """
+        )
+
+    def _exec(self, sql: str, args: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._db.execute(sql, args)
+
+    _ACQUIRE = (
+        "INSERT INTO leases (key, owner, expires_at) VALUES (?, ?, ?)"
+        " ON CONFLICT(key) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at"
+        " WHERE leases.expires_at < ? OR leases.owner = excluded.owner"
+    )
+
+    def _atomic(self, fn):
+        # lezen + schrijven in één write-transactie (ook tegen andere processen)
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            try:
+                result = fn()
+            except BaseException:
+                self._db.execute("ROLLBACK")
+                raise
+            self._db.execute("COMMIT")
+            return result
+
+    def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        now = time.time()
+        return self._exec(self._ACQUIRE, (key, owner, now + ttl, now)).rowcount == 1
+
+    def renew(self, key: str, owner: str, ttl: float) -> bool:
+        cur = self._exec(
+            "UPDATE leases SET expires_at = ? WHERE key = ? AND owner = ? AND expires_at >= ?",
+            (time.time() + ttl, key, owner, time.time()),
+        )
+        return cur.rowcount == 1
+
+    def release(self, key: str, owner: str):
+        self._exec("DELETE FROM leases WHERE key = ? AND owner = ?", (key, owner))
+
+    def owner(self, key: str) -> Optional[str]:
+        row = self._exec(
+            "SELECT owner FROM leases WHERE key = ? AND expires_at >= ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def publish(self, key: str, payload: Dict[str, Any]):
+        self._exec(
+            "INSERT INTO work (key, payload) VALUES (?, ?)"
+            " ON CONFLICT(key) DO UPDATE SET payload = excluded.payload",
+            (key, json.dumps(payload)),
+        )
+
+    def unpublish(self, key: str):
+        self._exec("DELETE FROM work WHERE key = ?", (key,))
+
+    def work(self) -> Dict[str, Dict[str, Any]]:
+        rows = self._exec("SELECT key, payload FROM work").fetchall()
+        return {k: json.loads(p) for k, p in rows}
+
+    def _payload(self, key: str) -> Optional[Dict[str, Any]]:
+        row = self._db.execute("SELECT payload FROM work WHERE key = ?", (key,)).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def _store(self, key: str, payload: Dict[str, Any]):
+        self._db.execute("UPDATE work SET payload = ? WHERE key = ?", (json.dumps(payload), key))
+
+    def update(self, key: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        def _update():
+            payload = self._payload(key)
+            if payload is None:
+                return None
+            payload.update(fields)
+            self._store(key, payload)
+            return payload
+        return self._atomic(_update)
+
+    def claim(self, key: str, owner: str, ttl: float) -> Optional[Dict[str, Any]]:
+        def _claim():
+            payload = self._payload(key)
+            if payload is None or payload.get("stop"):
+                return None
+            now = time.time()
+            if self._db.execute(self._ACQUIRE, (key, owner, now + ttl, now)).rowcount != 1:
+                return None
+            payload.update(claims=int(payload.get("claims", 0)) + 1, owner=owner)
+            self._store(key, payload)
+            return payload
+        return self._atomic(_claim)
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+class RedisLeaseStore(LeaseStore):
+    # Vergelijk-en-wijzig moet atomair: enkel de eigenaar mag verlengen/vrijgeven
+    _RENEW = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('pexpire', KEYS[1], ARGV[2]) else return 0 end"
+    _RELEASE = "if redis.call('get', KEYS[1]) == ARGV[1] then return redis.call('del', KEYS[1]) else return 0 end"
+    # KEYS: werkregister, lease · ARGV: werksleutel, velden (JSON)
+    _UPDATE = """
+        local raw = redis.call('hget', KEYS[1], ARGV[1])
+        if not raw then return false end
+        local payload = cjson.decode(raw)
+        for k, v in pairs(cjson.decode(ARGV[2])) do payload[k] = v end
+        raw = cjson.encode(payload)
+        redis.call('hset', KEYS[1], ARGV[1], raw)
+        return raw
+    """
+    # KEYS: werkregister, lease · ARGV: werksleutel, eigenaar, ttl (ms)
+    _CLAIM = """
+        local raw = redis.call('hget', KEYS[1], ARGV[1])
+        if not raw then return false end
+        local payload = cjson.decode(raw)
+        if payload['stop'] then return false end
+        if not redis.call('set', KEYS[2], ARGV[2], 'NX', 'PX', ARGV[3]) then
+            if redis.call('get', KEYS[2]) ~= ARGV[2] then return false end
+            redis.call('pexpire', KEYS[2], ARGV[3])
+        end
+        payload['claims'] = (tonumber(payload['claims']) or 0) + 1
+        payload['owner'] = ARGV[2]
+        raw = cjson.encode(payload)
+        redis.call('hset', KEYS[1], ARGV[1], raw)
+        return raw
+    """
+
+    def __init__(self, url: str, prefix: str = "aibv:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("LEASE_STORE_URL=redis://… vereist het pakket 'redis' (pip install redis)")
+        self._r = redis.Redis.from_url(url, decode_responses=True)
+        self._prefix = prefix
+        self._renew = self._r.register_script(self._RENEW)
+        self._release = self._r.register_script(self._RELEASE)
+        self._update = self._r.register_script(self._UPDATE)
+        self._claim = self._r.register_script(self._CLAIM)
+
+    def _k(self, key: str) -> str:
+        return f"{self._prefix}lease:{key}"
+
+    @property
+    def _work_key(self) -> str:
+        return f"{self._prefix}work"
+
+    def acquire(self, key: str, owner: str, ttl: float) -> bool:
+        ms = int(ttl * 1000)
+        if self._r.set(self._k(key), owner, nx=True, px=ms):
+            return True
+        return bool(self._renew(keys=[self._k(key)], args=[owner, ms]))
+
+    def renew(self, key: str, owner: str, ttl: float) -> bool:
+        return bool(self._renew(keys=[self._k(key)], args=[owner, int(ttl * 1000)]))
+
+    def release(self, key: str, owner: str):
+        self._release(keys=[self._k(key)], args=[owner])
+
+    def owner(self, key: str) -> Optional[str]:
+        return self._r.get(self._k(key))
+
+    def publish(self, key: str, payload: Dict[str, Any]):
+        self._r.hset(self._work_key, key, json.dumps(payload))
+
+    def unpublish(self, key: str):
+        self._r.hdel(self._work_key, key)
+
+    def work(self) -> Dict[str, Dict[str, Any]]:
+        return {k: json.loads(v) for k, v in self._r.hgetall(self._work_key).items()}
+
+    def update(self, key: str, fields: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        raw = self._update(keys=[self._work_key, self._k(key)], args=[key, json.dumps(fields)])
+        return json.loads(raw) if raw else None
+
+    def claim(self, key: str, owner: str, ttl: float) -> Optional[Dict[str, Any]]:
+        raw = self._claim(keys=[self._work_key, self._k(key)], args=[key, owner, int(ttl * 1000)])
+        return json.loads(raw) if raw else None
+
+    def close(self):
+        try:
+            self._r.close()
+        except Exception:
+            pass
+
+
+def open_lease_store(url: str) -> LeaseStore:
+    """Kies de backend op basis van de URL (sqlite:///… of redis://…)."""
+    if url.startswith(("redis://", "rediss://")):
+        return RedisLeaseStore(url)
+    if url.startswith("sqlite:///"):
+        return SQLiteLeaseStore(url[len("sqlite:///"):])
+    if url.startswith("file:"):
+        return SQLiteLeaseStore(url[len("file:"):])
+    raise ValueError(f"Onbekende LEASE_STORE_URL: {url}")
@@ -0,0 +1,248 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Loadtest van telegram_runner.py: veel chats tegelijk tegen een nep-Bot-API.
+
+De runner draait als subprocess met BOT_FACTORY=fake_controller:FakeBookingBot
+(geen Chrome) tegen fake_botapi.py. Elke virtuele chat stuurt in een lus
+commando's volgens een mix (bv. book=1,status=3,stop=1) met exponentiële
+denktijd, en meet de tijd tot het antwoord:
+
+    /status → "Status: …"            /stop → "⏹️ Stopverzoek …"
+    /book   → "🕑 Monitor gestart" (of een weigering/fout); dit omvat de
+              nep-setup van FAKE_STEP_SECONDS × 4
+
+Per interval volgt een regel met de latency, de meldingen die de runner nog
+moet versturen (notify_pending, uit de STATS-regel van de runner), loop-lag,
+aantal lopende runs en het geheugen van de runner (incl. kindprocessen).
+
+    python load_harness.py --chats 50 --duration 120 --mix book=1,status=3,stop=1 --rtt 0.05
+
+Met --json schrijf je alle intervallen en de samenvatting weg om versies te vergelijken.
+"""
+
+import argparse
+import asyncio
+import json
+import random
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+import proctools
+from fake_botapi import FakeBotAPI
+from webhook_harness import BotProcess, _pct
+
+FIRST_CHAT = 2001
+
+# commando → (tekst, verwachte begin(nen) van het antwoord)
+COMMANDS: Dict[str, Tuple[str, Tuple[str, ...]]] = {
+    "book": ("/book LOAD-{chat}|01/02/2015", ("🕑 Monitor", "⏳ Er draait al", "❌", "⚠️")),
+    "status": ("/status", ("Status:",)),
+    "stop": ("/stop", ("⏹️ Stopverzoek",)),
+    "whoami": ("/whoami", ("Jouw chat ID",)),
+    "set": ("/set refresh 20", ("⚙️", "Geen lopende run")),
+}
+
+
+def _parse_mix(spec: str) -> List[Tuple[str, float]]:
+    mix = []
+    for part in spec.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in COMMANDS:
+            raise ValueError(f"onbekend commando in mix: {name} (kies uit {', '.join(COMMANDS)})")
+        mix.append((name, float(weight or 1)))
+    return mix
+
+
+class Load:
+    def __init__(self, args, api: FakeBotAPI, bot: BotProcess):
+        self.args = args
+        self.api = api
+        self.bot = bot
+        self.mix = _parse_mix(args.mix)
+        self.samples: List[Tuple[float, str, Optional[float]]] = []  # (klaar op, commando, latency of None)
+        self.rows: List[Dict] = []
+        self.stats: Dict = {}
+        self._log_pos = 0
+        self._stop = asyncio.Event()
+
+    # ---------------- Virtuele chats ----------------
+    async def chat(self, chat_id: int):
+        names, weights = zip(*self.mix)
+        await asyncio.sleep(random.uniform(0, self.args.think))  # niet allemaal tegelijk beginnen
+        while not self._stop.is_set():
+            name = random.choices(names, weights)[0]
+            text, prefixes = COMMANDS[name]
+            t0 = time.monotonic()
+            await self.bot.deliver(self.api.command(chat_id, text.format(chat=chat_id)))
+            at = await self.api.wait_message(chat_id, t0, timeout=self.args.reply_timeout, prefixes=prefixes)
+            self.samples.append((time.monotonic(), name, None if at is None else at - t0))
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=random.expovariate(1.0 / self.args.think))
+            except asyncio.TimeoutError:
+                pass
+
+    # ---------------- Meten ----------------
+    def _read_stats(self):
+        """Laatste STATS-regel uit de log van de runner."""
+        try:
+            with open(self.bot.log_path, encoding="utf-8", errors="replace") as f:
+                f.seek(self._log_pos)
+                chunk = f.read()
+                self._log_pos = f.tell()
+        except OSError:
+            return
+        for line in chunk.splitlines():
+            if " STATS " in line:
+                try:
+                    self.stats = json.loads(line.split(" STATS ", 1)[1])
+                except ValueError:
+                    pass
+
+    def _rss_mb(self) -> float:
+        pids = [self.bot.proc.pid] + proctools.descendants(self.bot.proc.pid)
+        return sum(proctools.rss_bytes(p) for p in pids) / (1024 * 1024)
+
+    async def report(self, started: float):
+        last, sent_before = started, 0
+        print(f"{'t':>5} {'cmds':>5} {'kwijt':>5} {'p50':>8} {'p95':>8} {'p99':>8} "
+              f"{'runs':>4} {'backlog':>7} {'verstuurd':>9} {'lag':>7} {'RSS':>7}")
+        while not self._stop.is_set():
+            try:
+                await asyncio.wait_for(self._stop.wait(), timeout=self.args.interval)
+            except asyncio.TimeoutError:
+                pass
+            now = time.monotonic()
+            window = [s for s in self.samples if last <= s[0] < now]
+            lat = [s[2] for s in window if s[2] is not None]
+            self._read_stats()
+            sent = len(self.api.sent)
+            row = {
+                "t": round(now - started, 1), "cmds": len(window), "lost": len(window) - len(lat),
+                "p50": _pct(lat, 50), "p95": _pct(lat, 95), "p99": _pct(lat, 99),
+                "runs": self.stats.get("runs", 0), "notify_pending": self.stats.get("notify_pending", 0),
+                "api_calls": sent - sent_before, "loop_lag_ms": self.stats.get("loop_lag_ms", 0.0),
+                "rss_mb": round(self._rss_mb(), 1), "runner": dict(self.stats),
+            }
+            self.rows.append(row)
+            last, sent_before = now, sent
+            print(f"{row['t']:>5.0f} {row['cmds']:>5} {row['lost']:>5} {row['p50'] * 1000:>6.0f}ms "
+                  f"{row['p95'] * 1000:>6.0f}ms {row['p99'] * 1000:>6.0f}ms {row['runs']:>4} "
+                  f"{row['notify_pending']:>7} {row['api_calls']:>9} {row['loop_lag_ms']:>5.0f}ms "
+                  f"{row['rss_mb']:>5.0f}MB", flush=True)
+
+    def summary(self) -> Dict:
+        per: Dict[str, List[Optional[float]]] = defaultdict(list)
+        for _, name, lat in self.samples:
+            per[name].append(lat)
+        commands = {}
+        for name, values in sorted(per.items()):
+            ok = [v for v in values if v is not None]
+            commands[name] = {
+                "n": len(values), "lost": len(values) - len(ok),
+                "p50": _pct(ok, 50), "p95": _pct(ok, 95), "p99": _pct(ok, 99), "max": max(ok or [float("nan")]),
+            }
+        rss = [r["rss_mb"] for r in self.rows]
+        minutes = (self.rows[-1]["t"] - self.rows[0]["t"]) / 60 if len(self.rows) > 1 else 0
+        return {
+            "chats": self.args.chats, "duration": self.args.duration, "mix": self.args.mix, "rtt": self.args.rtt,
+            "commands": commands,
+            "max_notify_pending": max((r["notify_pending"] for r in self.rows), default=0),
+            "max_loop_lag_ms": max((r["loop_lag_ms"] for r in self.rows), default=0.0),
+            "rss_start_mb": rss[0] if rss else 0, "rss_end_mb": rss[-1] if rss else 0,
+            "rss_max_mb": max(rss, default=0),
+            "rss_growth_mb_per_min": round((rss[-1] - rss[0]) / minutes, 2) if minutes else 0.0,
+            "runner": self.stats,
+            "intervals": self.rows,
+        }
+
+    async def run(self) -> Dict:
+        started = time.monotonic()
+        chats = [asyncio.create_task(self.chat(FIRST_CHAT + i)) for i in range(self.args.chats)]
+        reporter = asyncio.create_task(self.report(started))
+        await asyncio.sleep(self.args.duration)
+        self._stop.set()
+        await asyncio.gather(*chats, return_exceptions=True)
+        await reporter
+        return self.summary()
+
+
+def _print_summary(s: Dict):
+    print(f"\n{'commando':<8} {'n':>5} {'kwijt':>5} {'p50':>8} {'p95':>8} {'p99':>8} {'max':>8}")
+    for name, c in s["commands"].items():
+        print(f"{name:<8} {c['n']:>5} {c['lost']:>5} {c['p50'] * 1000:>6.0f}ms {c['p95'] * 1000:>6.0f}ms "
+              f"{c['p99'] * 1000:>6.0f}ms {c['max'] * 1000:>6.0f}ms")
+    print(
+        f"\nmax backlog meldingen: {s['max_notify_pending']}  max loop-lag: {s['max_loop_lag_ms']:.0f}ms  "
+        f"RSS: {s['rss_start_mb']:.0f} → {s['rss_end_mb']:.0f} MB (max {s['rss_max_mb']:.0f}, "
+        f"{s['rss_growth_mb_per_min']:+.1f} MB/min)"
+    )
+
+
+async def main_async(args) -> Dict:
+    api = FakeBotAPI(rtt=args.rtt)
+    await api.start()
+    chat_ids = ",".join(str(FIRST_CHAT + i) for i in range(args.chats))
+    with tempfile.TemporaryDirectory(prefix="aibv-load-") as workdir:
+        bot = BotProcess(args.telegram_mode, "telegram_runner.py", api, workdir, env={
+            "TELEGRAM_CHAT_IDS": chat_ids,
+            "BOT_FACTORY": "fake_controller:FakeBookingBot",
+            "RUNNER_STATS_SECONDS": str(args.interval),
+            "WORKER_MODE": args.worker_mode,
+            "CONCURRENT_UPDATES": str(args.concurrent_updates),
+            "FAKE_STEP_SECONDS": str(args.step_seconds),
+            "FAKE_REFRESH_SECONDS": str(args.refresh_seconds),
+            "FAKE_FIND_AFTER": str(args.find_after),
+            "FAKE_FAIL_RATE": str(args.fail_rate),
+        })
+        bot.start()
+        try:
+            if not await bot.ready():
+                with open(bot.log_path, encoding="utf-8", errors="replace") as f:
+                    sys.stderr.write(f.read()[-4000:])
+                raise SystemExit("runner niet gestart")
+            await asyncio.sleep(1.0)
+            return await Load(args, api, bot).run()
+        finally:
+            await bot.stop()
+            await api.stop()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Loadtest telegram_runner tegen een nep-Bot-API en nep-controller")
+    ap.add_argument("--chats", type=int, default=50)
+    ap.add_argument("--duration", type=float, default=60, help="seconden")
+    ap.add_argument("--mix", default="book=1,status=3,stop=1", help="gewichten per commando (book, status, stop, set, whoami)")
+    ap.add_argument("--think", type=float, default=3.0, help="gemiddelde denktijd per chat tussen commando's (s)")
+    ap.add_argument("--interval", type=float, default=5.0, help="rapporteer elke N seconden")
+    ap.add_argument("--reply-timeout", type=float, default=30.0)
+    ap.add_argument("--rtt", type=float, default=0.05, help="gesimuleerde round-trip per Bot API-call (s)")
+    ap.add_argument("--telegram-mode", choices=["polling", "webhook"], default="polling")
+    ap.add_argument("--worker-mode", choices=["thread", "process"], default="thread")
+    ap.add_argument("--concurrent-updates", type=int, default=16)
+    ap.add_argument("--step-seconds", type=float, default=0.5, help="duur van elke nep-setupstap")
+    ap.add_argument("--refresh-seconds", type=float, default=2.0, help="nep-refresh (met melding) tijdens monitoren")
+    ap.add_argument("--find-after", type=int, default=0, help="slot 'vinden' na N refreshes (0 = nooit)")
+    ap.add_argument("--fail-rate", type=float, default=0.0, help="kans dat een setupstap mislukt")
+    ap.add_argument("--json", help="intervallen en samenvatting als JSON wegschrijven")
+    args = ap.parse_args()
+    try:
+        _parse_mix(args.mix)
+    except ValueError as e:
+        ap.error(str(e))
+
+    summary = asyncio.run(main_async(args))
+    _print_summary(summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2, default=str)
+    sys.exit(1 if any(c["lost"] for c in summary["commands"].values()) else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Cache van AIBV-metadata: de stationcatalogus en gekende voertuigen.
+
+- Stations (value, naam, producten): elke run die de stationkeuze passeert
+  leest de dropdown in één WebDriver-call en werkt de catalogus op de
+  achtergrond bij (de run wacht er niet op). Zolang de catalogus jonger is dan
+  METADATA_TTL_HOURS controleert de runner stations in /book, /profile, /set en
+  de batch al vóór er een browser start: een tikfout faalt in milliseconden
+  in plaats van na een volledige login. Is hij ouder, dan wordt niets geweigerd.
+- Voertuigen: per (plaat, eerste inschrijving) de rij in MainContent_grdVoertuigen
+  (postback-doel en label). Staat die rij al op de pagina, dan klikt
+  select_vehicle ze meteen aan in plaats van opnieuw te zoeken.
+
+Er is geen aparte crawler: verversen kost een volledige login tegen het
+request-budget, dus de catalogus ververst mee met echte runs.
+"""
+
+import difflib
+import json
+import logging
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from config import Config
+
+log = logging.getLogger("AIBV-Metadata")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS stations (
+    value      TEXT PRIMARY KEY,
+    name       TEXT NOT NULL,
+    products   TEXT NOT NULL DEFAULT '[]',
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS vehicles (
+    plate          TEXT NOT NULL,
+    first_reg_date TEXT NOT NULL,
+    row_id         TEXT NOT NULL,
+    label          TEXT,
+    updated_at     REAL NOT NULL,
+    PRIMARY KEY (plate, first_reg_date)
+);
+"""
+
+
+def normalize_plate(plate: str) -> str:
+    return "".join(ch for ch in (plate or "").upper() if ch.isalnum())
+
+
+class MetadataCache:
+    def __init__(self, path: Optional[str] = None, ttl_hours: Optional[float] = None):
+        self.path = path or Config.RUN_STORE_PATH
+        self.ttl = (Config.METADATA_TTL_HOURS if ttl_hours is None else ttl_hours) * 3600
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def _exec(self, sql: str, args: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._db.execute(sql, args)
+
+    def _background(self, fn, *args):
+        """Schrijven buiten het kritieke pad van de run; fouten enkel loggen."""
+        def _run():
+            try:
+                fn(*args)
+            except Exception as e:
+                log.warning("Metadata bijwerken mislukt: %s", e)
+        threading.Thread(target=_run, name="aibv-metadata", daemon=True).start()
+
+    # ---------------- Stations ----------------
+    def save_stations(self, options: Sequence[Tuple[str, str]]):
+        """Volledige dropdown (value, naam) → catalogus; verdwenen stations vallen weg."""
+        options = [(str(v).strip(), str(n).strip()) for v, n in options if str(v).strip()]
+        if not options:
+            return
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN")
+            try:
+                self._db.executemany(
+                    "INSERT INTO stations (value, name, updated_at) VALUES (?, ?, ?)"
+                    " ON CONFLICT(value) DO UPDATE SET name = excluded.name, updated_at = excluded.updated_at",
+                    [(v, n, now) for v, n in options],
+                )
+                self._db.execute("DELETE FROM stations WHERE updated_at < ?", (now,))
+                self._db.execute("COMMIT")
+            except Exception:
+                self._db.execute("ROLLBACK")
+                raise
+
+    def save_products(self, value: str, products: Sequence[str]):
+        self._exec("UPDATE stations SET products = ? WHERE value = ?",
+                   (json.dumps([str(p) for p in products if str(p).strip()]), str(value)))
+
+    def remember_stations(self, options: Sequence[Tuple[str, str]]):
+        self._background(self.save_stations, list(options))
+
+    def remember_products(self, value: str, products: Sequence[str]):
+        self._background(self.save_products, value, list(products))
+
+    def age(self) -> Optional[float]:
+        """Seconden sinds de laatste verversing van de catalogus (None = leeg)."""
+        row = self._exec("SELECT MAX(updated_at) AS t FROM stations").fetchone()
+        return time.time() - row["t"] if row and row["t"] else None
+
+    def is_fresh(self) -> bool:
+        age = self.age()
+        return age is not None and age <= self.ttl
+
+    def stations(self) -> Dict[str, Dict[str, Any]]:
+        rows = self._exec("SELECT * FROM stations ORDER BY name").fetchall()
+        return {r["value"]: {"name": r["name"], "products": json.loads(r["products"] or "[]")} for r in rows}
+
+    def check_stations(self, values: Sequence[Any]) -> List[str]:
+        """Fouten voor onbekende stations (met suggesties); leeg als alles klopt of de catalogus niet vers is."""
+        if not self.is_fresh():
+            return []
+        catalog = self.stations()
+        # suggesties op value (tikfout in het ID) én op naam (bv. "gent" i.p.v. het ID)
+        candidates = {value: value for value in catalog}
+        candidates.update({info["name"].lower(): value for value, info in catalog.items()})
+        errors = []
+        for value in (str(v).strip() for v in values):
+            if value in catalog:
+                continue
+            close = difflib.get_close_matches(value.lower(), list(candidates), n=3, cutoff=0.5)
+            suggested = list(dict.fromkeys(candidates[c] for c in close))
+            hint = ", ".join(f"{v} ({catalog[v]['name']})" for v in suggested)
+            errors.append(f"station '{value}' bestaat niet" + (f" — bedoel je {hint}?" if hint else ""))
+        return errors
+
+    def station_label(self, value: str) -> str:
+        row = self._exec("SELECT name FROM stations WHERE value = ?", (str(value),)).fetchone()
+        return f"{value} ({row['name']})" if row else str(value)
+
+    # ---------------- Voertuigen ----------------
+    def vehicle(self, plate: str, first_reg_date: str) -> Optional[Dict[str, Any]]:
+        row = self._exec(
+            "SELECT * FROM vehicles WHERE plate = ? AND first_reg_date = ?",
+            (normalize_plate(plate), first_reg_date),
+        ).fetchone()
+        return dict(row) if row else None
+
+    def save_vehicle(self, plate: str, first_reg_date: str, row_id: str, label: str = ""):
+        self._exec(
+            "INSERT INTO vehicles (plate, first_reg_date, row_id, label, updated_at) VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT(plate, first_reg_date) DO UPDATE SET row_id = excluded.row_id,"
+            " label = excluded.label, updated_at = excluded.updated_at",
+            (normalize_plate(plate), first_reg_date, row_id, label, time.time()),
+        )
+
+    def remember_vehicle(self, plate: str, first_reg_date: str, row_id: str, label: str = ""):
+        self._background(self.save_vehicle, plate, first_reg_date, row_id, label)
+
+    def forget_vehicle(self, plate: str, first_reg_date: str):
+        self._exec("DELETE FROM vehicles WHERE plate = ? AND first_reg_date = ?",
+                   (normalize_plate(plate), first_reg_date))
+
+    # ---------------- Rapportage ----------------
+    def summary(self) -> str:
+        n_stations = self._exec("SELECT COUNT(*) AS n FROM stations").fetchone()["n"]
+        n_vehicles = self._exec("SELECT COUNT(*) AS n FROM vehicles").fetchone()["n"]
+        age = self.age()
+        when = f"{age / 3600:.1f}u oud{'' if self.is_fresh() else ', verlopen'}" if age is not None else "nog leeg"
+        return f"{n_stations} stations ({when}), {n_vehicles} voertuigen"
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+_cache: Optional[MetadataCache] = None
+_cache_lock = threading.Lock()
+
+
+def cache() -> MetadataCache:
+    """Gedeelde cache van dit proces (pas bij het eerste gebruik geopend)."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = MetadataCache()
+        return _cache
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Kleine helpers rond procesbomen (Chrome + chromedriver + worker).
+Werkt via /proc (Linux/Heroku); op andere platformen geven ze lege resultaten.
+"""
+
+import os
+import signal
+from typing import Dict, List
+
+
+def _ppid_map() -> Dict[int, int]:
+    """pid → ppid voor alle processen die we kunnen lezen."""
+    result: Dict[int, int] = {}
+    try:
+        entries = os.listdir("/proc")
+    except OSError:
+        return result
+    for name in entries:
+        if not name.isdigit():
+            continue
+        try:
+            with open(f"/proc/{name}/stat", "rb") as f:
+                stat = f.read().decode(errors="replace")
+            # comm kan spaties/haakjes bevatten → splitsen na de laatste ')'
+            fields = stat[stat.rindex(")") + 2:].split()
+            result[int(name)] = int(fields[1])
+        except (OSError, ValueError, IndexError):
+            continue
+    return result
+
+
+def descendants(pid: int) -> List[int]:
+    """Alle (klein)kinderen van pid, breadth-first."""
+    children: Dict[int, List[int]] = {}
+    for child, parent in _ppid_map().items():
+        children.setdefault(parent, []).append(child)
+    out: List[int] = []
+    todo = list(children.get(pid, []))
+    while todo:
+        p = todo.pop(0)
+        out.append(p)
+        todo.extend(children.get(p, []))
+    return out
+
+
+def rss_bytes(pid: int) -> int:
+    """Resident set size van één proces (0 als onbekend)."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def tree_rss_bytes(pid: int, include_self: bool = True) -> int:
+    """Som van de RSS van pid en al zijn nakomelingen."""
+    pids = ([pid] if include_self else []) + descendants(pid)
+    return sum(rss_bytes(p) for p in pids)
+
+
+def kill_tree(pid: int, include_self: bool = True, sig: int = signal.SIGKILL) -> int:
+    """Kill pid en al zijn nakomelingen (kinderen eerst). Geeft het aantal gesignaleerde processen."""
+    pids = descendants(pid)[::-1] + ([pid] if include_self else [])
+    killed = 0
+    for p in pids:
+        try:
+            os.kill(p, sig)
+            killed += 1
+        except (ProcessLookupError, PermissionError):
+            continue
+    return killed
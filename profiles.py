@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Bewaarde voertuigprofielen per chat (in dezelfde SQLite-database als de runs).
+
+Een profiel bundelt nummerplaat, eerste inschrijving, stations en venster,
+zodat `/book <profiel>` volstaat. Met `standby` aan houdt de runner voor dat
+profiel een ingelogde sessie klaar op de kalender (zie standby.py).
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS profiles (
+    chat_id        INTEGER NOT NULL,
+    name           TEXT    NOT NULL,
+    plate          TEXT    NOT NULL,
+    first_reg_date TEXT    NOT NULL,
+    stations       TEXT    NOT NULL DEFAULT '[]',
+    window         INTEGER NOT NULL,
+    standby        INTEGER NOT NULL DEFAULT 0,
+    updated_at     REAL    NOT NULL,
+    PRIMARY KEY (chat_id, name)
+);
+"""
+
+
+def normalize_name(name: str) -> str:
+    return (name or "").strip().lower()
+
+
+class ProfileStore:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.RUN_STORE_PATH
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+
+    def _exec(self, sql: str, args: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._db.execute(sql, args)
+
+    # ---------------- Schrijven ----------------
+    def save(self, chat_id: int, name: str, plate: str, first_reg_date: str,
+             stations: List[Any], window: int):
+        """Nieuw profiel of bestaand overschrijven (de standby-stand blijft behouden)."""
+        self._exec(
+            "INSERT INTO profiles (chat_id, name, plate, first_reg_date, stations, window, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?)"
+            " ON CONFLICT(chat_id, name) DO UPDATE SET plate = excluded.plate,"
+            " first_reg_date = excluded.first_reg_date, stations = excluded.stations,"
+            " window = excluded.window, updated_at = excluded.updated_at",
+            (chat_id, normalize_name(name), plate, first_reg_date,
+             json.dumps([str(s) for s in stations]), int(window), time.time()),
+        )
+
+    def delete(self, chat_id: int, name: str) -> bool:
+        cur = self._exec("DELETE FROM profiles WHERE chat_id = ? AND name = ?", (chat_id, normalize_name(name)))
+        return cur.rowcount > 0
+
+    def set_standby(self, chat_id: int, name: str, on: bool) -> bool:
+        cur = self._exec(
+            "UPDATE profiles SET standby = ?, updated_at = ? WHERE chat_id = ? AND name = ?",
+            (1 if on else 0, time.time(), chat_id, normalize_name(name)),
+        )
+        return cur.rowcount > 0
+
+    # ---------------- Lezen ----------------
+    def get(self, chat_id: int, name: str) -> Optional[Dict[str, Any]]:
+        row = self._exec(
+            "SELECT * FROM profiles WHERE chat_id = ? AND name = ?", (chat_id, normalize_name(name))
+        ).fetchone()
+        return _row(row) if row else None
+
+    def list(self, chat_id: int) -> List[Dict[str, Any]]:
+        rows = self._exec("SELECT * FROM profiles WHERE chat_id = ? ORDER BY name", (chat_id,)).fetchall()
+        return [_row(r) for r in rows]
+
+    def standby(self) -> List[Dict[str, Any]]:
+        rows = self._exec("SELECT * FROM profiles WHERE standby = 1 ORDER BY updated_at").fetchall()
+        return [_row(r) for r in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _row(row: sqlite3.Row) -> Dict[str, Any]:
+    d = dict(row)
+    d["standby"] = bool(d.get("standby"))
+    try:
+        d["stations"] = json.loads(d.get("stations") or "[]")
+    except ValueError:
+        d["stations"] = []
+    return d
@@ -0,0 +1,267 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Offline benchmark van selenium_controller.py tegen een opgenomen corpus.
+
+Start replay_server.py in een thread, wijst de controller ernaartoe
+(AIBV_BASE_URL, placeholders uit het corpus als login en voertuig) en doorloopt
+per run de echte flow: driver, login, voertuig, station en `--refreshes`
+monitor-iteraties (slots lezen + refresh, zonder te klikken of te boeken).
+Per stap worden de duur en het aantal WebDriver-commando's gemeten; elke run
+start met een nieuwe Chrome en een lege metadata-cache, zodat runs
+vergelijkbaar zijn. Andere hosts dan de replay-server zijn onbereikbaar.
+
+Het resultaat (mediaan over `--runs`) wordt vergeleken met baseline.json in de
+corpusversie. Meer commando's dan de baseline, een stap die meer dan
+`--tolerance` trager is, een stap die faalt of een request dat niet in het
+corpus staat, geeft exit code 1.
+
+    python replay_bench.py naam[@v2] --runs 3 --refreshes 5
+    python replay_bench.py naam --save-baseline      # huidige meting als baseline
+"""
+
+import argparse
+import json
+import logging
+import os
+import statistics
+import sys
+import tempfile
+import time
+from collections import Counter, defaultdict
+from typing import Any, Callable, Dict, List, Optional
+
+from config import Config
+import replay_corpus
+from replay_server import ReplayServer
+
+log = logging.getLogger("AIBV-ReplayBench")
+
+STEPS = ("driver", "login", "voertuig", "station", "monitor")
+MIN_SLOWDOWN = 0.25  # seconden; kleinere verschillen zijn ruis
+
+
+class _CommandCounter:
+    """Telt elk WebDriver-commando (WebDriver.execute) per stap van de benchmark."""
+
+    def __init__(self):
+        self.step = "driver"
+        self.counts: Dict[str, Counter] = defaultdict(Counter)
+        self._original: Optional[Callable] = None
+
+    def install(self):
+        from selenium.webdriver.remote.webdriver import WebDriver
+        self._original = original = WebDriver.execute
+        counter = self
+
+        def execute(driver, driver_command, params=None):
+            counter.counts[counter.step][driver_command] += 1
+            return original(driver, driver_command, params)
+
+        WebDriver.execute = execute
+
+    def uninstall(self):
+        if self._original:
+            from selenium.webdriver.remote.webdriver import WebDriver
+            WebDriver.execute = self._original
+
+
+def _configure(server: ReplayServer, workdir: str, headed: bool):
+    """Config vóór het importeren van de controller (throttle en breaker lezen ze bij import)."""
+    Config.AIBV_BASE_URL = server.url
+    Config.LOGIN_URL = server.url + server.corpus.manifest["login_path"]
+    inputs = server.corpus.manifest["inputs"]
+    Config.AIBV_USERNAME = inputs["username"]
+    Config.AIBV_PASSWORD = inputs["password"]
+    Config.RECORD_CORPUS = ""
+    Config.BROWSER_MODE = "dedicated"
+    Config.TEST_MODE = headed
+    Config.RUN_STORE_PATH = os.path.join(workdir, "runs.db")
+    # geen budget, breaker of geleerde timeouts: die hangen af van eerdere runs, niet van de code
+    Config.THROTTLE_RATE = 1000.0
+    Config.THROTTLE_BURST = 1000
+    Config.THROTTLE_CLUSTER_URL = ""
+    Config.BREAKER_ERROR_RATE = 0
+    Config.ADAPTIVE_TIMEOUTS = False
+    Config.FLIGHT_RECORDER_DIR = os.path.join(workdir, "flight_recordings")
+    Config.CHROME_EXTRA_ARGS = list(Config.CHROME_EXTRA_ARGS) + [
+        "--host-resolver-rules=MAP * ~NOTFOUND, EXCLUDE 127.0.0.1",
+    ]
+
+
+def _run_once(i: int, server: ReplayServer, counter: _CommandCounter, refreshes: int, workdir: str) -> Dict[str, Any]:
+    from selenium_controller import AIBVBookingBot
+    import metadata_cache
+
+    inputs = server.corpus.manifest["inputs"]
+    server.reset()
+    # lege cache per run: anders neemt run 2 de snelweg voor het gekende voertuig
+    metadata_cache._cache = metadata_cache.MetadataCache(os.path.join(workdir, f"metadata-{i}.db"))
+    counter.counts.clear()
+
+    bot = AIBVBookingBot()
+    if inputs.get("station"):
+        bot.run_config.update(stations=[inputs["station"]])
+
+    def _monitor():
+        bot.step = "monitor"
+        for _ in range(refreshes):
+            bot.find_first_slot_in_window()
+            bot.refresh()
+
+    flow = {
+        "driver": bot.setup_driver,
+        "login": bot.login,
+        "voertuig": lambda: bot.select_vehicle(inputs.get("plate", ""), inputs.get("first_reg_date", "")),
+        "station": bot.select_station,
+        "monitor": _monitor,
+    }
+    seconds: Dict[str, float] = {}
+    error = None
+    try:
+        for step in STEPS:
+            counter.step = step
+            started = time.perf_counter()
+            try:
+                flow[step]()
+            except Exception as e:
+                error = f"{step}: {type(e).__name__}: {e}"
+                break
+            seconds[step] = time.perf_counter() - started
+    finally:
+        counter.step = "close"
+        bot.close()
+    return {
+        "seconds": seconds,
+        "commands": {s: sum(counter.counts[s].values()) for s in seconds},
+        "by_command": {s: dict(counter.counts[s]) for s in seconds},
+        "misses": list(server.misses),
+        "error": error,
+    }
+
+
+def _summarize(runs: List[Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+    steps = {}
+    for step in STEPS:
+        done = [r for r in runs if step in r["seconds"]]
+        if len(done) < len(runs):
+            continue
+        steps[step] = {
+            "seconds": round(statistics.median(r["seconds"][step] for r in done), 3),
+            "min": round(min(r["seconds"][step] for r in done), 3),
+            "commands": int(statistics.median(r["commands"][step] for r in done)),
+            "by_command": done[0]["by_command"][step],
+        }
+    return steps
+
+
+def _compare(steps: Dict[str, Dict[str, Any]], baseline: Optional[Dict[str, Any]], tolerance: float) -> List[str]:
+    regressions = []
+    base_steps = (baseline or {}).get("steps", {})
+    print(f"\n{'stap':<9} {'tijd':>8} {'baseline':>9} {'Δ':>6}   {'cmds':>5} {'baseline':>8} {'Δ':>5}")
+    totals = {"seconds": 0.0, "commands": 0, "b_seconds": 0.0, "b_commands": 0}
+    for step in STEPS:
+        cur, base = steps.get(step), base_steps.get(step)
+        if not cur:
+            print(f"{step:<9} {'—':>8}")
+            continue
+        totals["seconds"] += cur["seconds"]
+        totals["commands"] += cur["commands"]
+        flags = ""
+        if base:
+            totals["b_seconds"] += base["seconds"]
+            totals["b_commands"] += base["commands"]
+            dt = (cur["seconds"] - base["seconds"]) / base["seconds"] * 100 if base["seconds"] else 0.0
+            dc = cur["commands"] - base["commands"]
+            if dc > 0:
+                regressions.append(f"{step}: {dc} WebDriver-commando's meer ({base['commands']} → {cur['commands']})")
+                flags += " ⚠️ cmds"
+            if cur["seconds"] > base["seconds"] * (1 + tolerance) and cur["seconds"] - base["seconds"] > MIN_SLOWDOWN:
+                regressions.append(f"{step}: {dt:+.0f}% trager ({base['seconds']:.2f}s → {cur['seconds']:.2f}s)")
+                flags += " ⚠️ tijd"
+            print(f"{step:<9} {cur['seconds']:>7.2f}s {base['seconds']:>8.2f}s {dt:>+5.0f}%   "
+                  f"{cur['commands']:>5} {base['commands']:>8} {dc:>+5}{flags}")
+        else:
+            print(f"{step:<9} {cur['seconds']:>7.2f}s {'—':>9} {'':>6}   {cur['commands']:>5} {'—':>8}")
+    b = f"{totals['b_seconds']:>8.2f}s" if base_steps else f"{'—':>9}"
+    bc = f"{totals['b_commands']:>8}" if base_steps else f"{'—':>8}"
+    print(f"{'totaal':<9} {totals['seconds']:>7.2f}s {b} {'':>6}   {totals['commands']:>5} {bc}")
+    return regressions
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark de controller offline tegen een opgenomen AIBV-corpus")
+    ap.add_argument("corpus", help="naam of naam@vN (in REPLAY_CORPUS_DIR)")
+    ap.add_argument("--runs", type=int, default=3)
+    ap.add_argument("--refreshes", type=int, help="monitor-iteraties per run (standaard die van de baseline, anders 5)")
+    ap.add_argument("--pace", type=float, default=0.0, help="wacht pace × de opgenomen serverduur per antwoord")
+    ap.add_argument("--tolerance", type=float, default=0.25, help="toegestane vertraging per stap (fractie)")
+    ap.add_argument("--save-baseline", action="store_true", help="deze meting als baseline van de corpusversie bewaren")
+    ap.add_argument("--headed", action="store_true", help="Chrome zichtbaar (TEST_MODE)")
+    ap.add_argument("--json", help="runs en samenvatting als JSON wegschrijven")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.WARNING, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    corpus = replay_corpus.load(args.corpus)
+    baseline = None
+    if os.path.exists(corpus.baseline_path):
+        with open(corpus.baseline_path, encoding="utf-8") as fh:
+            baseline = json.load(fh)
+    refreshes = args.refreshes if args.refreshes is not None else (baseline or {}).get("refreshes", 5)
+    if baseline and baseline.get("refreshes") != refreshes:
+        print(f"⚠️ baseline gemeten met --refreshes {baseline.get('refreshes')}: monitor niet vergelijkbaar")
+        baseline = dict(baseline, steps={k: v for k, v in baseline["steps"].items() if k != "monitor"})
+
+    server = ReplayServer(corpus, pace=args.pace)
+    server.start()
+    counter = _CommandCounter()
+    runs: List[Dict[str, Any]] = []
+    with tempfile.TemporaryDirectory(prefix="aibv-replay-") as workdir:
+        _configure(server, workdir, args.headed)
+        counter.install()
+        try:
+            for i in range(args.runs):
+                run = _run_once(i, server, counter, refreshes, workdir)
+                runs.append(run)
+                took = sum(run["seconds"].values())
+                print(f"run {i + 1}/{args.runs}: {took:.2f}s, {sum(run['commands'].values())} commando's"
+                      + (f", FOUT {run['error']}" if run["error"] else "")
+                      + (f", {len(run['misses'])} niet in corpus" if run["misses"] else ""), flush=True)
+        finally:
+            counter.uninstall()
+            server.stop()
+
+    steps = _summarize(runs)
+    print(f"corpus {corpus.label} ({len(corpus.exchanges)} uitwisselingen, opgenomen {corpus.manifest['recorded_at']}), "
+          f"{args.runs} runs, {refreshes} refreshes" + ("" if baseline else " — nog geen baseline"))
+    regressions = _compare(steps, baseline, args.tolerance)
+    errors = sorted({r["error"] for r in runs if r["error"]})
+    misses = sorted({m for r in runs for m in r["misses"]})
+    for line in errors:
+        print(f"❌ {line}")
+    if misses:
+        print(f"❌ niet in het corpus: {', '.join(misses[:10])}" + (" …" if len(misses) > 10 else ""))
+    for line in regressions:
+        print(f"⚠️ {line}")
+
+    result = {
+        "corpus": corpus.label, "saved_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "runs": args.runs, "refreshes": refreshes, "steps": steps,
+    }
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as fh:
+            json.dump(dict(result, all_runs=runs, regressions=regressions, errors=errors, misses=misses), fh, indent=2)
+    if args.save_baseline:
+        if errors or misses:
+            print("Baseline niet bewaard: de meting had fouten.")
+        else:
+            with open(corpus.baseline_path, "w", encoding="utf-8") as fh:
+                json.dump(result, fh, indent=2)
+            print(f"Baseline bewaard: {corpus.baseline_path}")
+            regressions = []
+    sys.exit(1 if errors or misses or regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Record/replay-corpus van echte AIBV-paginatoestanden, voor offline benchmarks.
+
+Opnemen: met RECORD_CORPUS=<naam> zet launch_chrome de performance-log van
+Chrome aan. Opnemen vereist RECORD_SCRUB (naam, adres … van de klant) en een
+eigen browser: met BROWSER_MODE=shared weigert recorder() te starten, want de
+performance-log zou ook de tabs van andere runs bevatten. Per proces neemt
+enkel de eerste run op. Na elke wait_dom_idle haalt CorpusRecorder
+de netwerkevents op en bewaart hij elke pagina, postback (ook UpdatePanel-
+deltas) en redirect van planning.aibv.be met de body. Scripts en stylesheets
+worden één keer per URL bewaard, afbeeldingen niet. Bij close() wordt alles
+gemaskeerd en weggeschreven naar REPLAY_CORPUS_DIR/<naam>/v<N>/:
+
+    manifest.json    formaat, invoer (placeholders), uitwisselingen in volgorde
+    bodies/…         gemaskeerde HTML/deltas, assets/… scripts en stylesheets
+
+Maskeren gebeurt pas bij het wegschrijven, zodat ook pagina's van vóór de
+voertuigkeuze de nummerplaat kwijt zijn: login en wachtwoord, de nummerplaat
+(ook zonder streepjes) en de datum van eerste inschrijving krijgen vaste
+placeholders; andere nummerplaten, e-mailadressen, gsm-nummers, VIN's en de
+termen uit RECORD_SCRUB worden vervangen; __VIEWSTATE en __EVENTVALIDATION
+worden leeggemaakt (ze kunnen alles van het formulier bevatten). Base64-bodies
+worden eerst als UTF-8 gedecodeerd en net zo gemaskeerd; lukt dat niet, dan
+wordt de body niet bewaard. Request-bodies, cookies en headers worden nooit
+bewaard. Staat na het maskeren nog
+een van de ruwe waarden in het corpus, dan wordt er niets weggeschreven.
+
+replay_server.py serveert een corpus terug, replay_bench.py meet er de
+controller tegen.
+"""
+
+import base64
+import json
+import logging
+import os
+import re
+import shutil
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, List, Optional, Pattern, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+from config import Config
+
+log = logging.getLogger("AIBV-Corpus")
+
+FORMAT = 1
+MAX_DOCUMENTS = 300  # opnemen stopt daarna (een monitor-run refresht eindeloos)
+
+# vaste waarden in het corpus; replay_bench.py logt en zoekt ermee in
+PLACEHOLDERS = {
+    "username": "GEBRUIKER",
+    "password": "WACHTWOORD",
+    "plate": "1-AAA-000",
+    "first_reg_date": "01/01/2000",
+}
+OTHER_PLATE = "9-ZZZ-999"
+SCRUBBED = "GESCHRAPT"
+
+_DOCUMENT_TYPES = {"Document", "XHR", "Fetch"}
+_ASSET_TYPES = {"Script", "Stylesheet"}
+_EXTENSIONS = {"html": ".html", "javascript": ".js", "css": ".css", "json": ".json", "plain": ".txt"}
+
+# persoonsgegevens die niet per run gekend zijn (enkel op pagina's en deltas, niet op assets)
+_PII: List[Tuple[Pattern, str]] = [
+    (re.compile(r"[\w.+-]+@[\w-]+(?:\.[\w-]+)+"), "persoon@example.invalid"),
+    (re.compile(r"(?:\+32|0032|\b0)[\s./]?4\d{2}(?:[\s./]?\d{2}){3}\b"), "0400 00 00 00"),
+    (re.compile(r"\b(?=[A-HJ-NPR-Z0-9]*\d)(?=[A-HJ-NPR-Z0-9]*[A-HJ-NPR-Z])[A-HJ-NPR-Z0-9]{17}\b"), "VIN00000000000000"),
+    (re.compile(r"(?<![\w-])[1-9][-\s]?[A-Z]{3}[-\s]?\d{3}\b"), OTHER_PLATE),
+    (re.compile(r"(?<![\w-])[A-Z]{3}[-\s]?\d{3}\b"), OTHER_PLATE),
+]
+# placeholders zelf niet opnieuw vervangen (de eigen nummerplaat valt ook onder het platenpatroon)
+_KEEP = set(PLACEHOLDERS.values())
+_HIDDEN_STATE = re.compile(r'(<input\b[^>]*\bname="__(?:VIEWSTATE|EVENTVALIDATION)"[^>]*\bvalue=")[^"]*')
+_DELTA_HIDDEN = {"__VIEWSTATE", "__EVENTVALIDATION"}
+
+
+_claimed = False  # één recorder per proces
+
+
+def recorder() -> Optional["CorpusRecorder"]:
+    """Recorder voor RECORD_CORPUS, of None (uit, of dit proces neemt al op)."""
+    global _claimed
+    if not Config.RECORD_CORPUS:
+        return None
+    if Config.BROWSER_MODE == "shared":
+        raise RuntimeError("RECORD_CORPUS werkt niet met BROWSER_MODE=shared (gebruik dedicated)")
+    if not Config.RECORD_SCRUB:
+        raise RuntimeError("RECORD_CORPUS vereist RECORD_SCRUB met naam en adres van de klant")
+    if _claimed:
+        log.warning("Corpus '%s' wordt al opgenomen in dit proces: deze run niet", Config.RECORD_CORPUS)
+        return None
+    _claimed = True
+    return CorpusRecorder(Config.RECORD_CORPUS)
+
+
+def postback_target(fields: Dict[str, str]) -> str:
+    """Wat een POST triggert: __EVENTTARGET, of bij een async postback de knop achter de ScriptManager."""
+    target = fields.get("__EVENTTARGET") or ""
+    if not target:
+        for name, value in fields.items():
+            if name.endswith("ScriptManager1") or "$ScriptManager" in name:
+                target = value.partition("|")[2]
+                break
+    return target
+
+
+def _loose(value: str, separators: str) -> Pattern:
+    """Waarde als patroon waarin tussen elk teken optioneel een scheidingsteken mag staan."""
+    chars = [c for c in value if c.isalnum()]
+    return re.compile(f"[{re.escape(separators)}]?".join(re.escape(c) for c in chars), re.I)
+
+
+def _path(url: str) -> str:
+    parts = urlsplit(url)
+    return parts.path + (f"?{parts.query}" if parts.query else "")
+
+
+class Scrubber:
+    """Vervangt gekende geheimen en persoonsgegevens door placeholders (in die volgorde)."""
+
+    def __init__(self, origin: str):
+        host = urlsplit(origin).netloc
+        self._origins = [f"https://{host}", f"http://{host}", f"//{host}"] if host else []
+        self._secrets: List[Tuple[Pattern, str]] = []
+        self.raw: List[str] = []  # ter controle na het maskeren
+
+    def add(self, value: Optional[str], placeholder: str, loose: str = ""):
+        value = (value or "").strip()
+        if not value:
+            return
+        pattern = _loose(value, loose) if loose else re.compile(re.escape(value), re.I)
+        self._secrets.append((pattern, placeholder))
+        self.raw.append(value)
+        if loose:
+            self.raw.append("".join(c for c in value if c.isalnum()))
+
+    def text(self, text: str, pii: bool = True) -> str:
+        for origin in self._origins:
+            text = text.replace(origin, "")
+        for pattern, placeholder in self._secrets:
+            text = pattern.sub(placeholder, text)
+        if pii:
+            for pattern, placeholder in _PII:
+                text = pattern.sub(lambda m, p=placeholder: m.group(0) if m.group(0) in _KEEP else p, text)
+        return text
+
+    def document(self, text: str) -> str:
+        """HTML of UpdatePanel-delta van AIBV."""
+        if re.match(r"\d+\|", text):
+            delta = _map_delta(text, self._delta_part)
+            if delta is not None:
+                return delta
+        return _HIDDEN_STATE.sub(r"\g<1>", self.text(text))
+
+    def _delta_part(self, kind: str, ident: str, content: str) -> str:
+        if kind == "hiddenField" and ident in _DELTA_HIDDEN:
+            return ""
+        return _HIDDEN_STATE.sub(r"\g<1>", self.text(content))
+
+    def leaks(self, text: str) -> List[str]:
+        low = text.lower()
+        return [v for v in self.raw if len(v) >= 6 and v.lower() in low]
+
+
+def _map_delta(text: str, fn: Callable[[str, str, str], str]) -> Optional[str]:
+    """
+    MS AJAX-delta (`lengte|type|id|inhoud|` …) herschrijven: de lengtes moeten
+    na het maskeren kloppen, anders weigert de client-side PageRequestManager.
+    None als de tekst geen geldige delta is.
+    """
+    out, i = [], 0
+    try:
+        while i < len(text):
+            j = text.index("|", i)
+            length = int(text[i:j])
+            k = text.index("|", j + 1)
+            kind = text[j + 1:k]
+            m = text.index("|", k + 1)
+            ident = text[k + 1:m]
+            content = text[m + 1:m + 1 + length]
+            if text[m + 1 + length:m + 2 + length] != "|":
+                return None
+            new = fn(kind, ident, content)
+            out.append(f"{len(new)}|{kind}|{ident}|{new}|")
+            i = m + 2 + length
+    except ValueError:
+        return None
+    return "".join(out)
+
+
+def _extension(content_type: str) -> str:
+    for key, ext in _EXTENSIONS.items():
+        if key in content_type:
+            return ext
+    return ".bin"
+
+
+class CorpusRecorder:
+    def __init__(self, name: str, login_url: Optional[str] = None):
+        self.name = "".join(c if c.isalnum() or c in "-_" else "_" for c in name)
+        parts = urlsplit(login_url or Config.LOGIN_URL)
+        self.origin = f"{parts.scheme}://{parts.netloc}"
+        self.login_path = parts.path
+        self.inputs: Dict[str, Any] = {k: PLACEHOLDERS[k] for k in ("username", "password")}
+        self.exchanges: List[Dict[str, Any]] = []
+        self.assets: Dict[str, Dict[str, Any]] = {}
+        self.path: Optional[str] = None  # versiemap, gekozen bij de eerste save()
+        self._vehicle: Optional[Tuple[str, str]] = None
+        self._pending: Dict[str, Dict[str, Any]] = {}
+        self._full = False
+
+    # ---------------- Opnemen ----------------
+    def add_vehicle(self, plate: str, first_reg_date: str):
+        self._vehicle = (plate, first_reg_date)
+        self.inputs.update(plate=PLACEHOLDERS["plate"], first_reg_date=PLACEHOLDERS["first_reg_date"])
+
+    def add_station(self, station: str):
+        self.inputs["station"] = str(station)
+
+    def collect(self, driver, step: str):
+        """Netwerkevents sinds de vorige oproep verwerken (één get_log + een body per response)."""
+        if driver is None or self._full:
+            return
+        try:
+            entries = driver.get_log("performance")
+        except Exception as e:
+            log.debug("Performance-log niet beschikbaar: %s", e)
+            return
+        for entry in entries:
+            try:
+                message = json.loads(entry["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+            self._event(driver, step, message.get("method"), message.get("params") or {})
+
+    def _event(self, driver, step: str, method: str, params: Dict[str, Any]):
+        rid = params.get("requestId")
+        if method == "Network.requestWillBeSent":
+            request = params.get("request") or {}
+            if not request.get("url", "").startswith(self.origin):
+                return
+            redirect = params.get("redirectResponse")
+            if redirect and rid in self._pending:
+                headers = {k.lower(): v for k, v in (redirect.get("headers") or {}).items()}
+                hop = self._pending.pop(rid)
+                hop.update(status=redirect.get("status", 302), location=headers.get("location"),
+                           content_type="", elapsed=params.get("timestamp", hop["started"]) - hop["started"])
+                self._add(hop, None)
+            post = request.get("postData")
+            if post is None and request.get("hasPostData"):
+                try:
+                    post = driver.execute_cdp_cmd("Network.getRequestPostData", {"requestId": rid}).get("postData")
+                except Exception:
+                    post = ""
+            fields = {k: v[0] for k, v in parse_qs(post or "", keep_blank_values=True).items()}
+            self._pending[rid] = {
+                "step": step, "type": params.get("type", "Other"), "method": request.get("method", "GET"),
+                "url": request["url"], "target": postback_target(fields), "started": params.get("timestamp", 0.0),
+            }
+        elif method == "Network.responseReceived" and rid in self._pending:
+            response = params.get("response") or {}
+            self._pending[rid].update(
+                type=params.get("type", self._pending[rid]["type"]),
+                status=response.get("status", 200), content_type=response.get("mimeType", ""),
+            )
+        elif method == "Network.loadingFinished" and rid in self._pending:
+            hop = self._pending.pop(rid)
+            if "status" not in hop or hop["type"] not in _DOCUMENT_TYPES | _ASSET_TYPES:
+                return
+            hop["elapsed"] = params.get("timestamp", hop["started"]) - hop["started"]
+            try:
+                data = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": rid})
+            except Exception as e:
+                log.debug("Body van %s niet beschikbaar: %s", hop["url"], e)
+                return
+            if data.get("base64Encoded"):
+                body: Any = base64.b64decode(data.get("body") or "")
+            else:
+                body = data.get("body") or ""
+            self._add(hop, body)
+        elif method == "Network.loadingFailed":
+            self._pending.pop(rid, None)
+
+    def _add(self, hop: Dict[str, Any], body: Any):
+        path = _path(hop["url"])
+        if hop["type"] in _ASSET_TYPES:
+            if hop["method"] == "GET" and path not in self.assets:
+                self.assets[path] = {"content_type": hop["content_type"], "body": body}
+            return
+        self.exchanges.append({
+            "step": hop["step"], "type": hop["type"], "method": hop["method"], "path": path,
+            "target": hop["target"], "status": hop["status"], "location": hop.get("location"),
+            "content_type": hop["content_type"], "elapsed": round(max(0.0, hop["elapsed"]), 3), "body": body,
+        })
+        if len(self.exchanges) >= MAX_DOCUMENTS and not self._full:
+            self._full = True
+            log.warning("Corpus '%s' vol (%d uitwisselingen): verder niet meer opnemen", self.name, MAX_DOCUMENTS)
+
+    # ---------------- Wegschrijven ----------------
+    def _scrubber(self) -> Scrubber:
+        s = Scrubber(self.origin)
+        s.add(Config.AIBV_USERNAME, PLACEHOLDERS["username"])
+        s.add(Config.AIBV_PASSWORD, PLACEHOLDERS["password"])
+        if self._vehicle:
+            s.add(self._vehicle[0], PLACEHOLDERS["plate"], loose="-. ")
+            s.add(self._vehicle[1], PLACEHOLDERS["first_reg_date"], loose="/.-")
+        for term in Config.RECORD_SCRUB:
+            s.add(term, SCRUBBED)
+        return s
+
+    def save(self, directory: Optional[str] = None) -> Optional[str]:
+        """Maskeer en schrijf het corpus weg (opnieuw oproepen overschrijft dezelfde versie)."""
+        if not self.exchanges:
+            return None
+        scrub = self._scrubber()
+        files: Dict[str, bytes] = {}
+        leaks: List[str] = []
+
+        def _store(folder: str, i: int, content_type: str, body: Any, document: bool) -> Optional[str]:
+            if body is None:
+                return None
+            if isinstance(body, bytes):
+                # base64-body: enkel als tekst te maskeren, anders niet bewaren
+                try:
+                    body = body.decode("utf-8")
+                except UnicodeDecodeError:
+                    log.debug("Binaire body (%s) niet bewaard", content_type)
+                    return None
+            text = scrub.document(body) if document else scrub.text(body, pii=False)
+            leaks.extend(scrub.leaks(text))
+            name = f"{folder}/{i:04d}{_extension(content_type)}"
+            files[name] = text.encode("utf-8")
+            return name
+
+        exchanges = []
+        for i, ex in enumerate(self.exchanges):
+            entry = {k: v for k, v in ex.items() if k != "body"}
+            entry["seq"] = i
+            entry["path"] = scrub.text(ex["path"])
+            entry["location"] = scrub.text(ex["location"]) if ex["location"] else None
+            entry["body"] = _store("bodies", i, ex["content_type"], ex["body"], True)
+            exchanges.append(entry)
+        assets = {}
+        for i, (path, asset) in enumerate(sorted(self.assets.items())):
+            assets[scrub.text(path)] = {
+                "content_type": asset["content_type"],
+                "body": _store("assets", i, asset["content_type"], asset["body"], False),
+            }
+        leaks.extend(v for v in scrub.leaks(json.dumps([exchanges, list(assets)])) if v not in leaks)
+        if leaks:
+            log.error("Corpus '%s' niet bewaard: %d gevoelige waarde(n) bleven na het maskeren staan", self.name, len(set(leaks)))
+            return None
+
+        if not self.path:
+            self.path = _reserve(os.path.join(directory or Config.REPLAY_CORPUS_DIR, self.name))
+        tmp = self.path + ".tmp"
+        shutil.rmtree(tmp, ignore_errors=True)
+        for name, data in files.items():
+            os.makedirs(os.path.join(tmp, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(tmp, name), "wb") as fh:
+                fh.write(data)
+        manifest = {
+            "format": FORMAT, "name": self.name, "version": int(os.path.basename(self.path)[1:]),
+            "recorded_at": time.strftime("%Y-%m-%dT%H:%M:%S"), "login_path": self.login_path,
+            "inputs": self.inputs, "steps": dict(Counter(e["step"] for e in exchanges)),
+            "exchanges": exchanges, "assets": assets,
+        }
+        with open(os.path.join(tmp, "manifest.json"), "w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, indent=1, ensure_ascii=False)
+        shutil.rmtree(self.path, ignore_errors=True)
+        os.replace(tmp, self.path)
+        log.info("Corpus bewaard: %s (%d uitwisselingen, %d assets)", self.path, len(exchanges), len(assets))
+        return self.path
+
+
+def _reserve(root: str) -> str:
+    """
+    Volgende versiemap kiezen. Een verborgen `.v<N>` (O_EXCL) legt het nummer
+    vast, zodat workers die tegelijk opnemen nooit dezelfde versie krijgen.
+    """
+    os.makedirs(root, exist_ok=True)
+    taken = [int(m.group(1)) for m in (re.fullmatch(r"\.?v(\d+)(?:\.tmp)?", d) for d in os.listdir(root)) if m]
+    number = max(taken, default=0) + 1
+    while True:
+        try:
+            os.close(os.open(os.path.join(root, f".v{number}"), os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return os.path.join(root, f"v{number}")
+        except FileExistsError:
+            number += 1
+
+
+# ---------------- Inlezen ----------------
+def versions(name: str, directory: Optional[str] = None) -> List[int]:
+    root = os.path.join(directory or Config.REPLAY_CORPUS_DIR, name)
+    try:
+        return sorted(int(d[1:]) for d in os.listdir(root) if re.fullmatch(r"v\d+", d))
+    except FileNotFoundError:
+        return []
+
+
+class Corpus:
+    def __init__(self, path: str):
+        self.path = path
+        with open(os.path.join(path, "manifest.json"), encoding="utf-8") as fh:
+            self.manifest = json.load(fh)
+        if self.manifest.get("format") != FORMAT:
+            raise ValueError(f"{path}: corpusformaat {self.manifest.get('format')} wordt niet ondersteund (verwacht {FORMAT})")
+        self.exchanges: List[Dict[str, Any]] = self.manifest["exchanges"]
+        self.assets: Dict[str, Dict[str, Any]] = self.manifest["assets"]
+        self.label = f"{self.manifest['name']}@v{self.manifest['version']}"
+
+    def body(self, name: Optional[str]) -> bytes:
+        if not name:
+            return b""
+        with open(os.path.join(self.path, name), "rb") as fh:
+            return fh.read()
+
+    @property
+    def baseline_path(self) -> str:
+        return os.path.join(self.path, "baseline.json")
+
+
+def load(spec: str, directory: Optional[str] = None) -> Corpus:
+    """`naam` (laatste versie) of `naam@v3`."""
+    name, _, version = spec.partition("@")
+    if version:
+        number = int(version.lstrip("v"))
+    else:
+        available = versions(name, directory)
+        if not available:
+            raise FileNotFoundError(f"geen corpus '{name}' in {directory or Config.REPLAY_CORPUS_DIR}")
+        number = available[-1]
+    return Corpus(os.path.join(directory or Config.REPLAY_CORPUS_DIR, name, f"v{number}"))
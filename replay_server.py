@@ -0,0 +1,169 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lokale replay-server: serveert een opgenomen corpus (replay_corpus.py) terug als planning.aibv.be.
+
+Assets worden op pad bediend. Pagina's en postbacks worden in opnamevolgorde
+teruggegeven per (methode, pad, postback-doel): de n-de POST op
+Login.aspx met doel ddlStations krijgt het n-de opgenomen antwoord daarop.
+Is die reeks op (bv. meer refreshes dan opgenomen), dan blijft het laatste
+antwoord terugkomen. Zonder passend doel valt de server terug op methode en
+pad; wat dan nog niet in het corpus staat krijgt een 404 en komt in `misses`.
+Met `pace` > 0 wacht elk antwoord pace × de opgenomen duur.
+
+    python replay_server.py naam[@v2] --port 8080   # zelf rondklikken in een browser
+
+replay_bench.py start de server in een thread.
+"""
+
+import argparse
+import asyncio
+import logging
+import threading
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional, Tuple
+
+import tornado.web
+from tornado.httpserver import HTTPServer
+from tornado.netutil import bind_sockets
+
+import replay_corpus
+
+log = logging.getLogger("AIBV-Replay")
+
+
+class ReplayServer:
+    def __init__(self, corpus: replay_corpus.Corpus, pace: float = 0.0):
+        self.corpus = corpus
+        self.pace = pace
+        self.port: Optional[int] = None
+        self.hits: Counter = Counter()
+        self.misses: List[str] = []
+        self._by_key: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = defaultdict(list)
+        self._by_path: Dict[Tuple[str, str], List[Dict[str, Any]]] = defaultdict(list)
+        for ex in corpus.exchanges:
+            self._by_key[(ex["method"], ex["path"], ex["target"])].append(ex)
+            self._by_path[(ex["method"], ex["path"])].append(ex)
+        self._cursor: Counter = Counter()
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._server: Optional[HTTPServer] = None
+        self._thread: Optional[threading.Thread] = None
+
+    # ---------------- Matching ----------------
+    def reset(self):
+        """Terug naar het begin van het corpus (nieuwe sessie)."""
+        with self._lock:
+            self._cursor.clear()
+            self.hits.clear()
+            self.misses.clear()
+
+    def match(self, method: str, path: str, target: str) -> Optional[Dict[str, Any]]:
+        if method == "GET" and path in self.corpus.assets:
+            with self._lock:
+                self.hits["asset"] += 1
+            return dict(self.corpus.assets[path], status=200, location=None, elapsed=0.0)
+        with self._lock:
+            for key, index in (((method, path, target), self._by_key), ((method, path), self._by_path)):
+                series = index.get(key)
+                if series:
+                    n = self._cursor[key]
+                    self._cursor[key] += 1
+                    self.hits["page"] += 1
+                    return series[min(n, len(series) - 1)]
+            self.misses.append(f"{method} {path}" + (f" [{target}]" if target else ""))
+        return None
+
+    # ---------------- Server ----------------
+    def _app(self) -> tornado.web.Application:
+        return tornado.web.Application([(r"/.*", _Handler, {"server": self})])
+
+    async def _listen(self, port: int, host: str):
+        sockets = bind_sockets(port, host)
+        self._server = HTTPServer(self._app())
+        self._server.add_sockets(sockets)
+        self.port = sockets[0].getsockname()[1]
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def start(self, port: int = 0, host: str = "127.0.0.1") -> str:
+        """Start in een achtergrondthread (de controller zelf is synchroon); geeft de basis-URL."""
+        ready = threading.Event()
+
+        def _run():
+            self._loop = asyncio.new_event_loop()
+            asyncio.set_event_loop(self._loop)
+            self._loop.run_until_complete(self._listen(port, host))
+            ready.set()
+            self._loop.run_forever()
+
+        self._thread = threading.Thread(target=_run, name="aibv-replay", daemon=True)
+        self._thread.start()
+        if not ready.wait(10):
+            raise RuntimeError("replay-server niet gestart")
+        return self.url
+
+    def stop(self):
+        if self._loop and self._server:
+            self._loop.call_soon_threadsafe(self._server.stop)
+            self._loop.call_soon_threadsafe(self._loop.stop)
+        if self._thread:
+            self._thread.join(5)
+
+
+class _Handler(tornado.web.RequestHandler):
+    def initialize(self, server: ReplayServer):
+        self.server = server
+
+    async def get(self):
+        await self._serve()
+
+    async def post(self):
+        await self._serve()
+
+    async def head(self):
+        await self._serve()
+
+    async def _serve(self):
+        fields = {k: self.get_body_argument(k) for k in self.request.body_arguments}
+        method = "GET" if self.request.method == "HEAD" else self.request.method
+        hit = self.server.match(method, self.request.uri, replay_corpus.postback_target(fields))
+        if hit is None:
+            self.set_status(404)
+            self.finish("niet in het corpus")
+            return
+        if self.server.pace and hit.get("elapsed"):
+            await asyncio.sleep(self.server.pace * hit["elapsed"])
+        self.set_status(hit["status"])
+        if hit.get("content_type"):
+            self.set_header("Content-Type", hit["content_type"] + ("; charset=utf-8" if "text" in hit["content_type"] else ""))
+        if hit.get("location"):
+            self.set_header("Location", hit["location"])
+        self.finish(self.server.corpus.body(hit.get("body")))
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Serveer een opgenomen AIBV-corpus lokaal")
+    ap.add_argument("corpus", help="naam of naam@vN (in REPLAY_CORPUS_DIR)")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--pace", type=float, default=0.0, help="wacht pace × de opgenomen duur per antwoord")
+    args = ap.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
+
+    server = ReplayServer(replay_corpus.load(args.corpus), pace=args.pace)
+    loop = asyncio.new_event_loop()
+    loop.run_until_complete(server._listen(args.port, "127.0.0.1"))
+    log.info("Corpus %s op %s%s", server.corpus.label, server.url, server.corpus.manifest["login_path"])
+    try:
+        loop.run_forever()
+    except KeyboardInterrupt:
+        pass
+    if server.misses:
+        log.info("Niet in het corpus: %s", ", ".join(server.misses))
+
+
+if __name__ == "__main__":
+    main()
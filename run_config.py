@@ -0,0 +1,123 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Instellingen per run, live aan te passen zonder nieuwe browser of login.
+
+Een RunConfig start van de defaults in Config (of van een profiel) en hoort bij
+één run. `/set` past hem aan terwijl de run loopt; de monitor-lus van de
+controller leest hem bij elke iteratie en kiest bij andere stations opnieuw,
+binnen dezelfde sessie. `version` telt de wijzigingen.
+"""
+
+import threading
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+MIN_INTERVAL = 5  # seconden; sneller refreshen vindt niets extra en belast AIBV
+
+FIELDS = ("stations", "window", "interval", "booking")
+
+# /set-sleutels → veld
+_KEYS = {
+    "stations": "stations", "station": "stations",
+    "venster": "window", "window": "window", "werkdagen": "window",
+    "refresh": "interval", "interval": "interval",
+    "boeken": "booking", "booking": "booking",
+}
+_ON = {"on", "aan", "ja", "true", "1"}
+_OFF = {"off", "uit", "nee", "false", "0"}
+
+
+def _stations(value) -> List[str]:
+    items = value.split(",") if isinstance(value, str) else list(value)
+    stations = [str(s).strip() for s in items if str(s).strip()]
+    if not stations or not all(s.isdigit() for s in stations):
+        raise ValueError("stations zijn station-ID's gescheiden door komma's, bv. 8,12")
+    return stations
+
+
+def _window(value) -> int:
+    try:
+        window = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("venster is een aantal werkdagen, bv. 5")
+    if window < 1:
+        raise ValueError("venster moet minstens 1 werkdag zijn")
+    return window
+
+
+def _interval(value) -> int:
+    try:
+        interval = int(value)
+    except (TypeError, ValueError):
+        raise ValueError("refresh is een aantal seconden, bv. 20")
+    if interval < MIN_INTERVAL:
+        raise ValueError(f"refresh moet minstens {MIN_INTERVAL}s zijn")
+    return interval
+
+
+def _booking(value) -> bool:
+    if isinstance(value, bool):
+        return value
+    text = str(value).strip().lower()
+    if text in _ON:
+        return True
+    if text in _OFF:
+        return False
+    raise ValueError("boeken is on of off")
+
+
+_PARSERS = {"stations": _stations, "window": _window, "interval": _interval, "booking": _booking}
+
+
+class RunConfig:
+    def __init__(self, stations: Optional[List[Any]] = None, window: Optional[int] = None,
+                 interval: Optional[int] = None, booking: Optional[bool] = None):
+        self.stations = [str(s) for s in (stations or [Config.STATION_ID])]
+        self.window = int(window or Config.DESIRED_BUSINESS_DAYS)
+        self.interval = int(interval or Config.REFRESH_DELAY)
+        self.booking = Config.BOOKING_ENABLED if booking is None else bool(booking)
+        self.version = 0
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_dict(cls, data: Optional[Dict[str, Any]]) -> "RunConfig":
+        data = data or {}
+        return cls(*(data.get(k) for k in FIELDS))
+
+    def to_dict(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"stations": list(self.stations), "window": self.window,
+                    "interval": self.interval, "booking": self.booking}
+
+    def update(self, **changes: Any) -> Dict[str, Any]:
+        """Velden aanpassen (None = ongewijzigd); geeft de effectief gewijzigde velden terug."""
+        parsed = {k: _PARSERS[k](v) for k, v in changes.items() if v is not None}
+        with self._lock:
+            changed = {k: v for k, v in parsed.items() if getattr(self, k) != v}
+            for k, v in changed.items():
+                setattr(self, k, v)
+            if changed:
+                self.version += 1
+        return changed
+
+    def summary(self) -> str:
+        return (
+            f"stations {','.join(self.stations)} | venster {self.window} werkdagen | "
+            f"refresh elke {self.interval}s | boeken {'aan' if self.booking else 'uit'}"
+        )
+
+
+def parse_set_args(args: List[str]) -> Dict[str, Any]:
+    """`/set venster 5 refresh 20` → {"window": 5, "interval": 20}; ValueError bij ongeldige invoer."""
+    if not args or len(args) % 2:
+        raise ValueError("gebruik paren <instelling> <waarde>, bv. /set venster 5 refresh 20")
+    changes: Dict[str, Any] = {}
+    for key, value in zip(args[::2], args[1::2]):
+        field = _KEYS.get(key.lower())
+        if not field:
+            raise ValueError(f"onbekende instelling '{key}' (kies uit venster, refresh, stations, boeken)")
+        changes[field] = _PARSERS[field](value)
+    return changes
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Crash-veilige opslag van runs (SQLite met write-ahead logging).
+
+Elke /book-run krijgt een rij met chat, nummerplaat, eerste inschrijving,
+stations, venster, de volledige RunConfig (ook na /set), huidige stap en tellers. Runs met status 'running' zijn
+bij een herstart niet afgerond en worden door de runner hervat. Met
+LEASE_STORE_URL houdt het gedeelde werkregister de runs bij, niet deze store.
+"""
+
+import json
+import sqlite3
+import threading
+import time
+from typing import Any, Dict, List, Optional
+
+from config import Config
+
+RUNNING = "running"
+FINISHED = "finished"
+STOPPED = "stopped"
+FAILED = "failed"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    id             INTEGER PRIMARY KEY AUTOINCREMENT,
+    chat_id        INTEGER NOT NULL,
+    plate          TEXT    NOT NULL,
+    first_reg_date TEXT    NOT NULL,
+    stations       TEXT    NOT NULL DEFAULT '[]',
+    window         INTEGER NOT NULL,
+    settings       TEXT    NOT NULL DEFAULT '{}',
+    step           TEXT    NOT NULL DEFAULT 'driver',
+    status         TEXT    NOT NULL DEFAULT 'running',
+    detail         TEXT,
+    refreshes      INTEGER NOT NULL DEFAULT 0,
+    recycles       INTEGER NOT NULL DEFAULT 0,
+    recoveries     INTEGER NOT NULL DEFAULT 0,
+    resumes        INTEGER NOT NULL DEFAULT 0,
+    started_at     REAL    NOT NULL,
+    updated_at     REAL    NOT NULL
+);
+CREATE INDEX IF NOT EXISTS runs_status ON runs(status);
+"""
+
+_COUNTERS = ("refreshes", "recycles", "recoveries")
+
+
+class RunStore:
+    def __init__(self, path: Optional[str] = None):
+        self.path = path or Config.RUN_STORE_PATH
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(self.path, check_same_thread=False, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.executescript(_SCHEMA)
+        # stores van vóór /set hebben nog geen kolom settings
+        columns = {r["name"] for r in self._db.execute("PRAGMA table_info(runs)")}
+        if "settings" not in columns:
+            self._db.execute("ALTER TABLE runs ADD COLUMN settings TEXT NOT NULL DEFAULT '{}'")
+
+    def _exec(self, sql: str, args: tuple = ()) -> sqlite3.Cursor:
+        with self._lock:
+            return self._db.execute(sql, args)
+
+    # ---------------- Schrijven ----------------
+    def create(self, chat_id: int, plate: str, first_reg_date: str,
+               stations: List[Any], window: int, settings: Optional[Dict[str, Any]] = None) -> int:
+        now = time.time()
+        cur = self._exec(
+            "INSERT INTO runs (chat_id, plate, first_reg_date, stations, window, settings, started_at, updated_at)"
+            " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+            (chat_id, plate, first_reg_date, json.dumps([str(s) for s in stations]), int(window),
+             json.dumps(settings or {}), now, now),
+        )
+        return int(cur.lastrowid)
+
+    def set_settings(self, run_id: int, settings: Dict[str, Any]):
+        """Nieuwe RunConfig (na /set) bewaren, zodat een hervatte run ermee verdergaat."""
+        self._exec(
+            "UPDATE runs SET stations = ?, window = ?, settings = ?, updated_at = ? WHERE id = ?",
+            (json.dumps([str(s) for s in settings.get("stations") or []]), int(settings.get("window") or 0),
+             json.dumps(settings), time.time(), run_id),
+        )
+
+    def set_step(self, run_id: int, step: str):
+        self._exec("UPDATE runs SET step = ?, updated_at = ? WHERE id = ?", (step, time.time(), run_id))
+
+    def set_counters(self, run_id: int, **counters: int):
+        fields = {k: int(v) for k, v in counters.items() if k in _COUNTERS}
+        if not fields:
+            return
+        assignments = ", ".join(f"{k} = ?" for k in fields)
+        self._exec(
+            f"UPDATE runs SET {assignments}, updated_at = ? WHERE id = ?",
+            (*fields.values(), time.time(), run_id),
+        )
+
+    def mark_resumed(self, run_id: int):
+        self._exec("UPDATE runs SET resumes = resumes + 1, updated_at = ? WHERE id = ?", (time.time(), run_id))
+
+    def finish(self, run_id: int, status: str, detail: Optional[str] = None):
+        self._exec(
+            "UPDATE runs SET status = ?, detail = ?, updated_at = ? WHERE id = ? AND status = ?",
+            (status, detail, time.time(), run_id, RUNNING),
+        )
+
+    # ---------------- Lezen ----------------
+    def get(self, run_id: int) -> Optional[Dict[str, Any]]:
+        row = self._exec("SELECT * FROM runs WHERE id = ?", (run_id,)).fetchone()
+        return _row(row) if row else None
+
+    def unfinished(self) -> List[Dict[str, Any]]:
+        rows = self._exec("SELECT * FROM runs WHERE status = ? ORDER BY id", (RUNNING,)).fetchall()
+        return [_row(r) for r in rows]
+
+    def close(self):
+        with self._lock:
+            self._db.close()
+
+
+def _row(row: sqlite3.Row) -> Dict[str, Any]:
+    d = dict(row)
+    try:
+        d["stations"] = json.loads(d.get("stations") or "[]")
+    except ValueError:
+        d["stations"] = []
+    try:
+        d["settings"] = json.loads(d.get("settings") or "{}")
+    except ValueError:
+        d["settings"] = {}
+    return d
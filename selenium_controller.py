@@ -4,6 +4,7 @@
 import os
 import time
 import logging
+import threading
 from typing import Optional, Callable, List
 
 from selenium import webdriver
@@ -12,17 +13,109 @@ from selenium.webdriver.chrome.options import Options as ChromeOptions
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.support.ui import WebDriverWait, Select
 from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.remote.remote_connection import RemoteConnection
 from selenium.common.exceptions import (
     TimeoutException,
     NoSuchElementException,
     StaleElementReferenceException,
+    WebDriverException,
 )
 
 from config import Config
+import proctools
+from browser_watchdog import BrowserWatchdog
+from driver_supervisor import DriverSupervisor, DriverWedged, RunCancelled  # noqa: F401 (re-export)
+from throttle import budget
+from latency import tracker, breaker
+from flight_recorder import FlightRecorder
+import replay_corpus
+from run_config import RunConfig
+import metadata_cache
+from driver_cache import resolve_chromedriver
+from shared_browser import SharedBrowser
 
 log = logging.getLogger("AIBV-Selenium")
 
 
+def launch_chrome(on_start: Optional[Callable[[int], None]] = None) -> webdriver.Chrome:
+    """
+    Start een Chrome-driver voor Heroku (headless) of lokaal. `on_start` krijgt
+    de chromedriver-pid zodra die draait, nog vóór de sessie er is: hangt de
+    start, dan kan de supervisor die boom toch killen.
+    """
+    opts = ChromeOptions()
+
+    # Heroku/new headless (stabieler)
+    if Config.TEST_MODE:
+        opts.add_argument("--window-size=1366,900")
+    else:
+        opts.add_argument("--headless=new")
+        opts.add_argument("--window-size=1366,900")
+
+    # Stabiliteit flags
+    opts.add_argument("--no-sandbox")
+    opts.add_argument("--disable-dev-shm-usage")
+    opts.add_argument("--disable-gpu")
+    opts.add_argument("--disable-features=VizDisplayCompositor")
+    opts.add_argument("--disable-background-timer-throttling")
+    opts.add_argument("--disable-renderer-backgrounding")
+    # tabs van andere runs in de gedeelde browser staan "achter" → niet afremmen
+    opts.add_argument("--disable-backgrounding-occluded-windows")
+    for arg in Config.CHROME_EXTRA_ARGS:
+        opts.add_argument(arg)
+
+    # Geen password prompts
+    prefs = {
+        "credentials_enable_service": False,
+        "profile.password_manager_enabled": False,
+    }
+    opts.add_experimental_option("prefs", prefs)
+
+    # Corpus opnemen (replay_corpus.py): netwerkevents via de performance-log
+    if Config.RECORD_CORPUS:
+        opts.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+        opts.add_experimental_option("perfLoggingPrefs", {"enableNetwork": True, "enablePage": False})
+
+    # Heroku buildpacks variabelen (indien aanwezig)
+    chrome_bin = os.environ.get("GOOGLE_CHROME_BIN") or os.environ.get("CHROME_BIN")
+    driver_path = os.environ.get("CHROMEDRIVER_PATH")
+
+    if chrome_bin:
+        opts.binary_location = chrome_bin
+
+    if driver_path and os.path.exists(driver_path):
+        service = ChromeService(executable_path=driver_path)
+    else:
+        # Lokaal of fallback: eenmalig per Chrome-versie resolven, daarna offline
+        service = ChromeService(executable_path=resolve_chromedriver())
+    if on_start:
+        start = service.start
+
+        def _start():
+            start()
+            on_start(service.process.pid)
+        service.start = _start
+
+    # HTTP-timeout naar chromedriver als vangnet onder de supervisie-deadlines
+    RemoteConnection.set_timeout(Config.COMMAND_TIMEOUT)
+    driver = webdriver.Chrome(service=service, options=opts)
+    driver.set_page_load_timeout(Config.PAGE_LOAD_TIMEOUT)
+    return driver
+
+
+_shared: Optional[SharedBrowser] = None
+_shared_lock = threading.Lock()
+
+
+def shared_browser() -> SharedBrowser:
+    """De gedeelde browser van dit proces (BROWSER_MODE=shared), lui aangemaakt."""
+    global _shared
+    with _shared_lock:
+        if _shared is None:
+            _shared = SharedBrowser(launch_chrome)
+        return _shared
+
+
 class AIBVBookingBot:
     """
     End-to-end flow controller voor AIBV:
@@ -37,83 +130,223 @@ class AIBVBookingBot:
     def __init__(self):
         self.driver: Optional[webdriver.Chrome] = None
         self.notify_func: Optional[Callable[[str], None]] = None
+        self.settings_func: Optional[Callable[[dict], None]] = None
+        # Per-run stop (naast de globale Config.STOP_FLAG); onderbreekt waits en sleeps
+        self.stop_event = threading.Event()
+        # Positie in de flow, om na een browser-recycle te kunnen herstellen
+        self.logged_in = False
+        self.vehicle: Optional[tuple] = None
+        self.station_selected = False
+        # Wat deze run zoekt (standaard uit de config, per profiel of live via /set te wijzigen)
+        self.run_config = RunConfig()
+        self.watchdog = BrowserWatchdog()
+        self.supervisor = DriverSupervisor(self._driver_pid)
+        self.run_id = f"bot-{id(self):x}"  # sleutel voor de eerlijke verdeling van het request-budget
+        self.step = "driver"
+        self.recorder = FlightRecorder()
+        self.corpus = replay_corpus.recorder()
+        self._muted = False
+        self._page_load_timeout = Config.PAGE_LOAD_TIMEOUT
+        self._starting_pid: Optional[int] = None  # chromedriver van een lopende launch_chrome
+        self._breaker_trips = 0  # laatst gemelde trip van de circuit breaker
+
+    @property
+    def stations(self) -> List[str]:
+        return self.run_config.stations
+
+    @stations.setter
+    def stations(self, value: List[str]):
+        self.run_config.update(stations=value)
+
+    @property
+    def business_days(self) -> int:
+        return self.run_config.window
+
+    @business_days.setter
+    def business_days(self, value: int):
+        self.run_config.update(window=value)
 
     # ---------------- Driver ----------------
     def setup_driver(self):
-        """Maak een Chrome-driver klaar voor Heroku (headless) of lokaal."""
-        opts = ChromeOptions()
-
-        # Heroku/new headless (stabieler)
-        if Config.TEST_MODE:
-            opts.add_argument("--window-size=1366,900")
-        else:
-            opts.add_argument("--headless=new")
-            opts.add_argument("--window-size=1366,900")
-
-        # Stabiliteit flags
-        opts.add_argument("--no-sandbox")
-        opts.add_argument("--disable-dev-shm-usage")
-        opts.add_argument("--disable-gpu")
-        opts.add_argument("--disable-features=VizDisplayCompositor")
-        opts.add_argument("--disable-background-timer-throttling")
-        opts.add_argument("--disable-renderer-backgrounding")
-
-        # Geen password prompts
-        prefs = {
-            "credentials_enable_service": False,
-            "profile.password_manager_enabled": False,
-        }
-        opts.add_experimental_option("prefs", prefs)
-
-        # Heroku buildpacks variabelen (indien aanwezig)
-        chrome_bin = os.environ.get("GOOGLE_CHROME_BIN") or os.environ.get("CHROME_BIN")
-        driver_path = os.environ.get("CHROMEDRIVER_PATH")
-
-        if chrome_bin:
-            opts.binary_location = chrome_bin
-
-        if driver_path and os.path.exists(driver_path):
-            service = ChromeService(executable_path=driver_path)
-        else:
-            # Lokaal of fallback
-            from webdriver_manager.chrome import ChromeDriverManager
-            service = ChromeService(ChromeDriverManager().install())
-
-        self.driver = webdriver.Chrome(service=service, options=opts)
-        self.driver.set_page_load_timeout(60)
+        """Maak een Chrome-driver klaar: eigen browser, of een tab in de gedeelde browser."""
+        if self.driver:
+            # opnieuw opzetten (bv. na herstel) → oude browser niet laten lingeren
+            self.close()
+        self._page_load_timeout = Config.PAGE_LOAD_TIMEOUT
+        self._starting_pid = None
+        if Config.BROWSER_MODE == "shared":
+            self.driver = self.supervisor.call(
+                "tab", shared_browser().open_tab, timeout=Config.COMMAND_TIMEOUT * 2,
+            )
+            if self.driver:
+                return self.driver
+            log.warning("Gedeelde browser zit vol (%d tabs) → eigen browser voor deze run",
+                        Config.SHARED_BROWSER_MAX_TABS)
+        self.driver = self.supervisor.call("start", launch_chrome, self._started, timeout=Config.COMMAND_TIMEOUT * 2)
+        self._starting_pid = None
         return self.driver
 
+    def _started(self, pid: int):
+        self._starting_pid = pid
+
+    def _driver_pid(self) -> Optional[int]:
+        try:
+            return self.driver.service.process.pid
+        except Exception:
+            # nog geen driver: een start die hangt heeft wel al een chromedriver
+            return self._starting_pid
+
     # ---------------- Notifier ----------------
     def set_notifier(self, fn: Callable[[str], None]):
         self.notify_func = fn
 
     def _notify(self, msg: str):
+        if self._muted:
+            return
         try:
             if self.notify_func:
                 self.notify_func(msg)
         except Exception:
             pass
 
+    def set_settings_listener(self, fn: Callable[[dict], None]):
+        """Wordt aangeroepen als de bot zelf de instellingen terugdraait (mislukte stationwissel)."""
+        self.settings_func = fn
+
+    def _settings_changed(self, settings: dict):
+        try:
+            if self.settings_func:
+                self.settings_func(settings)
+        except Exception:
+            pass
+
+    # ---------------- Stop ----------------
+    def request_stop(self):
+        """Vraag deze run om te stoppen; lopende waits breken af bij de volgende poll."""
+        self.stop_event.set()
+
+    @property
+    def stopped(self) -> bool:
+        return Config.STOP_FLAG or self.stop_event.is_set()
+
+    def _check_stop(self):
+        if self.stopped:
+            raise RunCancelled("Run gestopt")
+
+    def _wait(self, timeout, what: Optional[str] = None) -> WebDriverWait:
+        """
+        WebDriverWait die bij elke poll controleert of de run gestopt is.
+        Met `what` wordt de timeout afgeleid uit de gemeten latency van deze wait
+        (`timeout` geldt dan tot er genoeg metingen zijn) en telt de uitkomst mee
+        voor de circuit breaker. Waits die normaal mogen mislukken (cookie-banner,
+        alternatieve locators) geven geen `what` mee.
+        """
+        bot = self
+        key = f"{self.step}:{what}" if what else None
+        if key:
+            timeout = tracker.timeout(key, timeout)
+
+        class _StoppableWait(WebDriverWait):
+            def until(self, method, message=""):
+                def _cond(drv):
+                    bot._check_stop()
+                    return method(drv)
+                if not key:
+                    return super().until(_cond, message)
+                started = time.monotonic()
+                try:
+                    result = super().until(_cond, message)
+                except TimeoutException:
+                    tracker.record(key, time.monotonic() - started)
+                    breaker.record_failure()
+                    raise
+                tracker.record(key, time.monotonic() - started)
+                breaker.record_success()
+                return result
+
+        return _StoppableWait(self.driver, timeout)
+
+    def _load(self, what: str, fn: Callable, *args):
+        """Page load of refresh onder supervisie; duur en uitkomst voeden tracker en breaker."""
+        started = time.monotonic()
+        try:
+            self.supervisor.call(what, fn, *args)
+        except WebDriverException:
+            tracker.record("page_load", time.monotonic() - started)
+            breaker.record_failure()
+            raise
+        tracker.record("page_load", time.monotonic() - started)
+        breaker.record_success()
+        self._adapt_page_load_timeout()
+
+    def _adapt_page_load_timeout(self):
+        # onder de supervisie-deadline blijven, anders killt die de browser eerst
+        new = round(min(tracker.timeout("page_load", Config.PAGE_LOAD_TIMEOUT), Config.COMMAND_TIMEOUT * 0.8))
+        if abs(new - self._page_load_timeout) < max(2, self._page_load_timeout * 0.2):
+            return
+        try:
+            self.driver.set_page_load_timeout(new)
+            log.info("Page-load-timeout aangepast: %ss → %ss", self._page_load_timeout, new)
+            self._page_load_timeout = new
+        except WebDriverException:
+            pass
+
+    def _throttle(self, kind: str):
+        """
+        Haal budget voor één request naar AIBV (page load, refresh of postback).
+        Staat de circuit breaker open, dan wacht de run eerst tot AIBV weer reageert.
+        """
+        paused = breaker.wait(cancelled=lambda: self.stopped)
+        if paused is None:
+            raise RunCancelled("Run gestopt")
+        if paused > 1 and breaker.trips != self._breaker_trips:
+            self._breaker_trips = breaker.trips
+            self._notify(f"⏸️ AIBV reageerde slecht: {paused:.0f}s gepauzeerd (circuit breaker), ik ga verder.")
+        deadline = Config.business_days_end(self.business_days).timestamp()
+        waited = budget.acquire(self.run_id, kind, deadline=deadline, cancelled=lambda: self.stopped)
+        if waited is None:
+            raise RunCancelled("Run gestopt")
+        if waited > 1:
+            log.debug("Request-budget: %.1fs gewacht voor %s (%s)", waited, kind, self.run_id)
+
+    def _sleep(self, seconds: float):
+        """Onderbreekbare sleep: keert meteen terug bij een stopverzoek."""
+        if self.stop_event.wait(max(0.0, seconds)):
+            raise RunCancelled("Run gestopt")
+        self._check_stop()
+
     # ---------------- Helpers ----------------
     def wait_dom_idle(self, timeout=20):
-        WebDriverWait(self.driver, timeout).until(
+        self._wait(timeout, "dom").until(
             lambda d: d.execute_script("return document.readyState") == "complete"
         )
+        self.recorder.maybe_capture(self.driver, self.step)
+        if self.corpus:
+            self.corpus.collect(self.driver, self.step)
+
+    def dump_flight_recorder(self, name: str = "run") -> Optional[str]:
+        """Leg de huidige (fout)toestand vast en schrijf de ring weg; geeft het zip-pad."""
+        try:
+            self.recorder.maybe_capture(self.driver, f"{self.step}-fout", force=True)
+        except Exception:
+            pass
+        return self.recorder.dump(name=name)
 
     def click_by_id(self, element_id, timeout=20):
-        el = WebDriverWait(self.driver, timeout).until(
+        el = self._wait(timeout, element_id).until(
             EC.element_to_be_clickable((By.ID, element_id))
         )
         try:
             self.driver.execute_script("arguments[0].scrollIntoView({block:'center'});", el)
         except Exception:
             pass
-        el.click()
+        self._throttle("postback")
+        self.supervisor.call("click", el.click)
         self.wait_dom_idle()
         return el
 
     def type_by_id(self, element_id, value, timeout=20):
-        el = WebDriverWait(self.driver, timeout).until(
+        el = self._wait(timeout, element_id).until(
             EC.visibility_of_element_located((By.ID, element_id))
         )
         try:
@@ -124,6 +357,15 @@ class AIBVBookingBot:
         el.send_keys(value)
         return el
 
+    def _options(self, select_el) -> List[tuple]:
+        """Alle (value, tekst) van een <select> in één WebDriver-call (i.p.v. twee per optie)."""
+        try:
+            return [tuple(o) for o in self.driver.execute_script(
+                "return Array.from(arguments[0].options).map(o => [o.value, o.text.trim()]);", select_el
+            )]
+        except Exception:
+            return [((o.get_attribute("value") or "").strip(), (o.text or "").strip()) for o in Select(select_el).options]
+
     # ---------------- Error detectie ----------------
     ERROR_XPATHS: List[str] = [
         "//*[@id='MainContent_ErrorLabel']",
@@ -162,7 +404,7 @@ class AIBVBookingBot:
         ]
         for xp in candidates:
             try:
-                el = WebDriverWait(d, 2).until(EC.element_to_be_clickable((By.XPATH, xp)))
+                el = self._wait(2).until(EC.element_to_be_clickable((By.XPATH, xp)))
                 d.execute_script("arguments[0].click();", el)
                 time.sleep(0.2)
                 return True
@@ -172,12 +414,11 @@ class AIBVBookingBot:
 
     # ---------------- Login ----------------
     def fill_login_fields(self, username, password):
-        d = self.driver
         # username
         try:
             self.type_by_id("txtUser", username)
         except Exception:
-            el = WebDriverWait(d, 15).until(
+            el = self._wait(15).until(
                 EC.visibility_of_element_located(
                     (By.XPATH, "//input[@type='text' or @name='txtUser' or contains(@id,'User')][1]")
                 )
@@ -188,7 +429,7 @@ class AIBVBookingBot:
         try:
             self.type_by_id("txtPassWord", password)
         except Exception:
-            el = WebDriverWait(d, 15).until(
+            el = self._wait(15).until(
                 EC.visibility_of_element_located(
                     (By.XPATH, "//input[@type='password' or @name='txtPassWord' or contains(@id,'Pass')][1]")
                 )
@@ -198,8 +439,10 @@ class AIBVBookingBot:
 
     def login(self):
         d = self.driver
+        self.step = "login"
         self._notify("🔐 Inloggen…")
-        d.get(Config.LOGIN_URL)
+        self._throttle("page_load")
+        self._load("get", d.get, Config.LOGIN_URL)
         self.wait_dom_idle()
 
         # cookie banner wegklikken indien aanwezig
@@ -219,8 +462,9 @@ class AIBVBookingBot:
             (By.XPATH, "//input[@type='submit' and (contains(@value,'Login') or contains(@value,'Aanmelden'))]"),
         ]:
             try:
-                btn = WebDriverWait(d, 10).until(EC.element_to_be_clickable(locator))
+                btn = self._wait(10).until(EC.element_to_be_clickable(locator))
                 d.execute_script("arguments[0].scrollIntoView({block:'center'});", btn)
+                self._throttle("postback")
                 d.execute_script("arguments[0].click();", btn)
                 clicked = True
                 break
@@ -231,7 +475,7 @@ class AIBVBookingBot:
 
         # wachten op success/fout
         try:
-            WebDriverWait(d, 20).until(
+            self._wait(20).until(
                 lambda drv: (
                     drv.find_elements(By.ID, "MainContent_btnVoertuigToevoegen")
                     or drv.find_elements(By.XPATH, "//*[contains(.,'Reservatie')]")
@@ -245,17 +489,68 @@ class AIBVBookingBot:
         if err:
             raise RuntimeError(f"Login mislukt: {err}")
 
-        WebDriverWait(d, 20).until(
+        self._wait(20, "MainContent_btnVoertuigToevoegen").until(
             EC.presence_of_element_located((By.ID, "MainContent_btnVoertuigToevoegen"))
         )
+        self.logged_in = True
         self._notify("✅ Ingelogd en klaar om voertuig te selecteren.")
         return True
 
+    def back_to_start(self):
+        """
+        Terug naar de startpagina (voertuig toevoegen) binnen dezelfde sessie, om
+        een volgend voertuig te doen zonder opnieuw in te loggen. Is de sessie
+        verlopen, dan wordt er alsnog ingelogd.
+        """
+        self.step = "login"
+        self.vehicle = None
+        self.station_selected = False
+        self._throttle("page_load")
+        self._load("get", self.driver.get, Config.LOGIN_URL)
+        self.wait_dom_idle()
+        if not self.driver.find_elements(By.ID, "txtUser"):
+            try:
+                self._wait(20).until(
+                    EC.presence_of_element_located((By.ID, "MainContent_btnVoertuigToevoegen"))
+                )
+                return True
+            except TimeoutException:
+                pass
+        self.logged_in = False
+        return self.login()
+
     # ---------------- Flow-stappen ----------------
+    def _click_known_vehicle(self, plate: str, known: dict) -> bool:
+        """Gekend voertuig waarvan de rij al op de pagina staat → meteen aanklikken, zonder zoekopdracht."""
+        plate_xpath = metadata_cache.normalize_plate(plate)
+        rows = self.driver.find_elements(
+            By.XPATH,
+            "//table[@id='MainContent_grdVoertuigen']//tr[td[contains(translate(normalize-space(.), '- .', ''), "
+            f"'{plate_xpath}')]]/td/a",
+        )
+        if not rows:
+            return False
+        hrefs = [(r.get_attribute("href") or "") for r in rows]
+        row = rows[hrefs.index(known["row_id"])] if known["row_id"] in hrefs else rows[0]
+        self._throttle("postback")
+        self.driver.execute_script("arguments[0].click();", row)
+        return True
+
     def select_vehicle(self, plate: str, first_reg_date_str: str):
         self._notify(f"🚗 Voertuig selecteren: {plate} / {first_reg_date_str}")
+        self.step = "voertuig"
         d = self.driver
 
+        # bij opnemen altijd de volledige zoekflow, zodat het corpus die bevat
+        known = None if self.corpus else metadata_cache.cache().vehicle(plate, first_reg_date_str)
+        if self.corpus:
+            self.corpus.add_vehicle(plate, first_reg_date_str)
+        if known and self._click_known_vehicle(plate, known):
+            self.wait_dom_idle()
+            self.vehicle = (plate, first_reg_date_str)
+            self._notify("✅ Voertuig geselecteerd (gekend voertuig, zonder zoeken).")
+            return
+
         self.click_by_id("MainContent_btnVoertuigToevoegen", timeout=30)
         self.wait_dom_idle()
 
@@ -263,61 +558,68 @@ class AIBVBookingBot:
         self.type_by_id("MainContent_txtDatumEersteInschrijving", first_reg_date_str, timeout=30)
         self.click_by_id("MainContent_cmdZoekVoertuig", timeout=30)
 
-        WebDriverWait(d, 30).until(
+        self._wait(30, "MainContent_grdVoertuigen").until(
             EC.presence_of_element_located((By.ID, "MainContent_grdVoertuigen"))
         )
         # Kies eerste resultaat
         try:
-            row = WebDriverWait(d, 10).until(
+            row = self._wait(10).until(
                 EC.element_to_be_clickable((By.XPATH, "//table[@id='MainContent_grdVoertuigen']//tr[td]/td/a"))
             )
+            row_id, label = row.get_attribute("href") or "", (row.text or "").strip()
+            self._throttle("postback")
             d.execute_script("arguments[0].click();", row)
         except TimeoutException:
+            metadata_cache.cache().forget_vehicle(plate, first_reg_date_str)
             raise RuntimeError("Geen voertuigresultaten gevonden voor de ingegeven gegevens.")
+        if row_id:
+            metadata_cache.cache().remember_vehicle(plate, first_reg_date_str, row_id, label)
 
         self.wait_dom_idle()
+        self.vehicle = (plate, first_reg_date_str)
         self._notify("✅ Voertuig geselecteerd.")
 
     def select_station(self):
         self._notify("🏢 Station selecteren…")
+        self.step = "station"
         d = self.driver
 
         # Station dropdown
         try:
-            sel_el = WebDriverWait(d, 30).until(
+            sel_el = self._wait(30, "MainContent_ddlStations").until(
                 EC.presence_of_element_located((By.ID, "MainContent_ddlStations"))
             )
             sel = Select(sel_el)
         except Exception:
             raise RuntimeError("Stationdropdown niet gevonden — pagina kan gewijzigd zijn.")
 
-        # Probeer STATION_ID eerst
-        station_value = (str(Config.STATION_ID).strip()
-                         if getattr(Config, "STATION_ID", None) is not None else "")
-        selected = False
-        if station_value:
-            try:
-                values = [o.get_attribute("value") for o in sel.options]
-                if station_value in values:
-                    sel.select_by_value(station_value)
-                    selected = True
-            except Exception:
-                selected = False
+        # Alle opties één keer lezen: voor de keuze, de foutmelding én de stationcatalogus
+        options = self._options(sel_el)
+        metadata_cache.cache().remember_stations(options)
+
+        # Probeer de stations van deze run (STATION_ID of profiel) in volgorde
+        wanted = [str(s).strip() for s in self.stations if str(s).strip()]
+        station_value = ",".join(wanted)
+        values = [v for v, _ in options]
+        chosen = next((v for v in wanted if v in values), None)
 
         # Fallback: STATION_NAME (env) — match op zichtbare tekst
-        if not selected:
+        if chosen is None:
             station_name = (os.getenv("STATION_NAME") or "").strip()
             if station_name:
-                for opt in sel.options:
-                    if station_name.lower() in (opt.text or "").lower():
-                        opt.click()
-                        selected = True
-                        break
+                chosen = next((v for v, text in options if station_name.lower() in text.lower()), None)
+
+        selected = False
+        if chosen is not None:
+            try:
+                self._throttle("postback")
+                sel.select_by_value(chosen)
+                selected = True
+            except Exception:
+                selected = False
 
         if not selected:
-            available = ", ".join(
-                [f"{(o.get_attribute('value') or '').strip()}:{(o.text or '').strip()}" for o in sel.options[:20]]
-            )
+            available = ", ".join(f"{v}:{text}" for v, text in options[:20])
             raise RuntimeError(
                 f"Stationselectie mislukt — controleer STATION_ID/STATION_NAME. "
                 f"Gezocht value='{station_value}' / name='{os.getenv('STATION_NAME')}'. "
@@ -326,9 +628,13 @@ class AIBVBookingBot:
 
         # Product (bv. B-keuring)
         try:
-            prod_el = WebDriverWait(d, 30).until(
+            prod_el = self._wait(30, "MainContent_ddlProduct").until(
                 EC.presence_of_element_located((By.ID, "MainContent_ddlProduct"))
             )
+            metadata_cache.cache().remember_products(chosen, [v for v, _ in self._options(prod_el)])
+            if self.corpus:
+                self.corpus.add_station(chosen)
+            self._throttle("postback")
             Select(prod_el).select_by_value("B")  # pas aan indien ander product nodig
         except Exception:
             raise RuntimeError("Productselectie mislukt — id 'B' niet gevonden.")
@@ -339,16 +645,18 @@ class AIBVBookingBot:
             (By.XPATH, "//input[@type='submit' and contains(@value,'Reservatie')]"),
         ]:
             try:
-                btn = WebDriverWait(d, 10).until(EC.element_to_be_clickable(locator))
+                btn = self._wait(10).until(EC.element_to_be_clickable(locator))
+                self._throttle("postback")
                 d.execute_script("arguments[0].click();", btn)
                 break
             except Exception:
                 continue
 
         # Wachten tot de volgende pagina geladen is
-        WebDriverWait(d, 20).until(
+        self._wait(20, "kalender").until(
             EC.presence_of_element_located((By.ID, "MainContent_btnVoertuigToevoegen"))
         )
+        self.station_selected = True
         self._notify("✅ Station geselecteerd.")
 
     # ---------------- Monitor & boek ----------------
@@ -375,7 +683,7 @@ class AIBVBookingBot:
         if not label:
             return None
         try:
-            ok = Config.is_within_n_business_days(label, Config.DESIRED_BUSINESS_DAYS)
+            ok = Config.is_within_n_business_days(label, self.business_days)
         except Exception:
             ok = True
         if not ok:
@@ -385,70 +693,222 @@ class AIBVBookingBot:
             self.driver.execute_script("arguments[0].scrollIntoView({block:'center'});", cell)
         except Exception:
             pass
-        cell.click()
+        self._throttle("postback")
+        self.supervisor.call("click", cell.click)
         self.wait_dom_idle()
         return label
 
+    def find_first_slot_in_window(self) -> Optional[str]:
+        """Geef het label van het eerste zichtbare slot binnen het venster (zonder te klikken)."""
+        for cell in self._visible_slots():
+            label = self._slot_label(cell)
+            if not label:
+                continue
+            try:
+                ok = Config.is_within_n_business_days(label, self.business_days)
+            except Exception:
+                ok = True
+            if ok:
+                return label
+        return None
+
+    def keep_alive(self):
+        """
+        Hou een geparkeerde sessie (kalender) warm zodat de ASP.NET-sessie niet
+        verloopt. Is ze toch verlopen (terug op de loginpagina), dan wordt de
+        positie hersteld.
+        """
+        self.step = "standby"
+        self.refresh()
+        if self.driver.find_elements(By.ID, "txtUser"):
+            self.recycle_driver("sessie verlopen")
+
+    def refresh(self):
+        """Herlaad de huidige pagina en wacht tot de DOM klaar is."""
+        self.watchdog.record_refresh()
+        try:
+            self._throttle("refresh")
+            self._load("refresh", self.driver.refresh)
+        except DriverWedged:
+            raise
+        except Exception:
+            self.watchdog.record_error()
+        self.wait_dom_idle()
+
+    def recover(self, reason: str):
+        """Herstel na een vastgelopen driver: procesboom weg, run hervatten vanaf het laatste checkpoint."""
+        if self.supervisor.wedged > Config.DRIVER_MAX_RECOVERIES:
+            raise RuntimeError(
+                f"Driver liep {self.supervisor.wedged}x vast, herstel opgegeven ({reason})"
+            )
+        started = time.monotonic()
+        self.supervisor.kill_browser()
+        self.recycle_driver(f"vastgelopen: {reason}")
+        self.supervisor.record_recovery(started)
+        log.info("Herstel voltooid in %.1fs (%s)", self.supervisor.last_latency, self.supervisor.summary())
+
+    def _soft_refresh(self):
+        """Refresh in de foutpaden van de monitor; een hangende driver wordt hersteld."""
+        try:
+            self.refresh()
+        except DriverWedged as e:
+            self._check_stop()
+            self.supervised(self.recover, str(e))
+
+    def supervised(self, fn: Callable, *args, **kwargs):
+        """Voer een flow-stap uit; loopt de driver vast, herstel dan en probeer de stap opnieuw."""
+        while True:
+            try:
+                return fn(*args, **kwargs)
+            except DriverWedged as e:
+                self._check_stop()
+                self.recover(str(e))
+
+    def recycle_driver(self, reason: str):
+        """
+        Sluit de browser, start een nieuwe en herstel de positie van de run
+        (ingelogd, voertuig en station geselecteerd) zonder tussenkomst van de gebruiker.
+        """
+        log.info("♻️ Browser recyclen: %s", reason)
+        self._notify(f"♻️ Browser wordt herstart ({reason})…")
+        logged_in, vehicle, station_selected = self.logged_in, self.vehicle, self.station_selected
+        self.close()
+        self._muted = True
+        try:
+            self.setup_driver()
+            if logged_in:
+                self.login()
+            if vehicle:
+                self.select_vehicle(*vehicle)
+            if station_selected:
+                self.select_station()
+        finally:
+            self._muted = False
+        self.watchdog.mark_recycled()
+        self._notify(f"✅ Browser herstart, monitoring loopt verder. ({self.watchdog.summary()})")
+
+    def _apply_run_config(self, applied: dict) -> dict:
+        """
+        Pik /set-wijzigingen op aan het begin van een monitor-iteratie. Andere
+        stations → terug naar de stationkeuze binnen dezelfde sessie (geen login);
+        lukt dat niet, dan blijven de vorige stations actief en krijgt de runner
+        de teruggedraaide instellingen te horen.
+        """
+        current = self.run_config.to_dict()
+        if current == applied:
+            return applied
+        if current["stations"] != applied["stations"] and self.vehicle:
+            # back_to_start wist self.vehicle → voertuig vooraf bijhouden
+            vehicle = self.vehicle
+            self._notify(f"🏢 Naar station(s) {','.join(current['stations'])}…")
+            try:
+                self.supervised(self._reselect_station, vehicle)
+            except Exception as e:
+                self._notify(f"❌ Stationwissel mislukt: {e}\nIk ga verder met {','.join(applied['stations'])}.")
+                self.run_config.update(stations=applied["stations"])
+                current = self.run_config.to_dict()
+                self._settings_changed(current)
+                try:
+                    self.supervised(self._reselect_station, vehicle)
+                except Exception as err:
+                    # ook terug lukt niet → browser herstarten op de vorige positie
+                    log.warning("Terug naar station(s) %s mislukt: %s", ",".join(applied["stations"]), err)
+                    self.logged_in, self.vehicle, self.station_selected = True, vehicle, True
+                    self.watchdog.record_error()
+                    self.supervised(self.recycle_driver, "stationwissel mislukt")
+            self.step = "monitor"
+        self._notify(f"⚙️ Nieuwe instellingen actief: {self.run_config.summary()}")
+        return current
+
+    def _reselect_station(self, vehicle: tuple):
+        self.back_to_start()
+        self.select_vehicle(*vehicle)
+        self.select_station()
+
     def monitor_and_book(self):
         d = self.driver
+        self.step = "monitor"
         self._notify("🕑 Monitoren gestart…")
+        applied = self.run_config.to_dict()
 
-        while not Config.STOP_FLAG:
-            try:
-                # 1) Check zichtbare slots
-                for cell in self._visible_slots():
-                    if Config.STOP_FLAG:
-                        return {"success": False, "stopped": True}
-                    label = self._select_slot_if_in_window(cell)
-                    if label:
-                        if not Config.BOOKING_ENABLED:
-                            self._notify(f"🎯 Gevonden binnen venster: {label} — maar BOOKING_ENABLED=false, geen bevestiging.")
-                            return {"success": True, "slot": label, "booking_disabled": True}
-
-                        # Bevestigen
-                        try:
-                            btn = WebDriverWait(d, 20).until(
-                                EC.element_to_be_clickable((By.XPATH, "//input[@type='submit' and contains(@value,'Bevestig')]"))
-                            )
-                            d.execute_script("arguments[0].click();", btn)
-                            self.wait_dom_idle()
-                        except Exception:
-                            raise RuntimeError("Slot kon niet bevestigd worden — knop niet gevonden.")
-
-                        self._notify(f"✅ Bevestigd: {label}")
-                        return {"success": True, "slot": label}
-
-                # 2) Geen slot → refresh + wacht
-                self._notify("⏳ Nog geen slot binnen venster… blijf zoeken")
-                try:
-                    self.driver.refresh()
-                except Exception:
-                    pass
-                self.wait_dom_idle()
-                time.sleep(max(1, int(Config.REFRESH_DELAY)))
+        try:
+            while not self.stopped:
+                # 0) Watchdog: browser te zwaar/te oud/te foutgevoelig → recyclen
+                reason = self.watchdog.check(self.driver)
+                if reason:
+                    self.supervised(self.recycle_driver, reason)
 
-            except TimeoutException:
-                # Soms valt de kalender weg → soft refresh
-                try:
-                    self.driver.refresh()
-                except Exception:
-                    pass
-                self.wait_dom_idle()
-                time.sleep(min(5, max(1, int(Config.REFRESH_DELAY))))
-            except Exception as e:
-                log.warning(f"⚠️ Fout in monitoring: {e}")
                 try:
-                    self.driver.refresh()
-                except Exception:
-                    pass
-                self.wait_dom_idle()
-                time.sleep(min(5, max(1, int(Config.REFRESH_DELAY) * 2)))
+                    # /set: nieuwe instellingen vanaf deze iteratie; faalt de wissel
+                    # helemaal, dan vangen de foutpaden hieronder de run op
+                    applied = self._apply_run_config(applied)
+                    d = self.driver
+
+                    # 1) Check zichtbare slots
+                    for cell in self._visible_slots():
+                        self._check_stop()
+                        label = self._select_slot_if_in_window(cell)
+                        if label:
+                            if not self.run_config.booking:
+                                self._notify(f"🎯 Gevonden binnen venster: {label} — maar boeken staat uit, geen bevestiging.")
+                                return {"success": True, "slot": label, "booking_disabled": True}
+
+                            # Bevestigen
+                            try:
+                                btn = self._wait(20, "bevestig").until(
+                                    EC.element_to_be_clickable((By.XPATH, "//input[@type='submit' and contains(@value,'Bevestig')]"))
+                                )
+                                self._throttle("postback")
+                                d.execute_script("arguments[0].click();", btn)
+                                self.wait_dom_idle()
+                            except Exception:
+                                raise RuntimeError("Slot kon niet bevestigd worden — knop niet gevonden.")
+
+                            self._notify(f"✅ Bevestigd: {label}")
+                            return {"success": True, "slot": label}
+
+                    # 2) Geen slot → refresh + wacht
+                    self._notify("⏳ Nog geen slot binnen venster… blijf zoeken")
+                    self.refresh()
+                    self.watchdog.record_ok()
+                    self._sleep(max(1, self.run_config.interval))
+
+                except DriverWedged as e:
+                    # chromedriver reageerde niet meer → procesboom weg, positie herstellen
+                    self._check_stop()
+                    self.supervised(self.recover, str(e))
+                    d = self.driver
+                except TimeoutException:
+                    # Soms valt de kalender weg → soft refresh
+                    self.watchdog.record_error()
+                    self._soft_refresh()
+                    self._sleep(min(5, max(1, self.run_config.interval)))
+                except Exception as e:
+                    log.warning(f"⚠️ Fout in monitoring: {e}")
+                    self.watchdog.record_error()
+                    self._soft_refresh()
+                    self._sleep(min(5, max(1, self.run_config.interval * 2)))
+        except RunCancelled:
+            pass
 
         return {"success": False, "stopped": True}
 
     def close(self):
+        """Browser afsluiten; hangt quit() dan wordt de procesboom gekild."""
+        pid = self._driver_pid()
+        driver, self.driver = self.driver, None
+        if self.corpus and driver:
+            try:
+                self.corpus.collect(driver, self.step)
+                self.corpus.save()
+            except Exception as e:
+                log.warning("Corpus bewaren mislukt: %s", e)
         try:
-            if self.driver:
-                self.driver.quit()
+            if driver:
+                self.supervisor.call("quit", driver.quit, timeout=15)
+        except DriverWedged:
+            # self.driver is al None → supervisor kent de pid niet meer
+            if pid:
+                proctools.kill_tree(pid)
         except Exception:
             pass
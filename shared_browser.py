@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Eén langlevende Chrome voor meerdere runs (BROWSER_MODE=shared).
+
+Elke run krijgt een eigen browser context via CDP `Target.createBrowserContext`
+(eigen cookies, storage en cache, zoals een incognitovenster) met daarin één
+tab. Een extra run kost zo enkel een tab, geen volledige Chrome-procesboom.
+
+Elke `TabDriver` is een eigen WebDriver-sessie op de chromedriver van de host,
+aangehaakt aan dezelfde Chrome via `debuggerAddress`. Zo heeft elke run zijn
+eigen huidige venster en lopen commando's van verschillende runs naast elkaar;
+een trage page load in de ene tab houdt de andere niet op. De host-sessie
+blijft op een eigen home-tab en doet enkel beheer (tabs openen en sluiten),
+onder een korte lock en met een eigen deadline: hangt een beheercommando, dan
+wordt de host als dood beschouwd (gekild) en start de volgende run hem opnieuw.
+Het aanhaken van een nieuwe sessie gebeurt buiten de lock.
+
+Een tab heeft geen eigen proces: de supervisor kan hem niet killen, en herstel
+sluit enkel de tab en zijn context. De gedeelde browser zelf wordt pas opnieuw
+gestart als hij echt weg is.
+
+Enkel gedeeld binnen één proces, dus niet zinvol met WORKER_MODE=process.
+"""
+
+import logging
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from selenium import webdriver
+from selenium.webdriver.chrome.options import Options as ChromeOptions
+from selenium.webdriver.chromium.remote_connection import ChromiumRemoteConnection
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.remote.webdriver import WebDriver as RemoteWebDriver
+
+from config import Config
+from driver_supervisor import DriverSupervisor, DriverWedged
+import proctools
+
+log = logging.getLogger("AIBV-SharedBrowser")
+
+
+class TabDriver(webdriver.Chrome):
+    """Eigen WebDriver-sessie op de gedeelde Chrome, vast in zijn eigen tab."""
+
+    shared = True
+
+    @classmethod
+    def attach(cls, browser: "SharedBrowser", host: webdriver.Chrome, generation: int,
+               handle: str, target_id: str, context_id: str) -> "TabDriver":
+        # geen Chrome.__init__: die zou een eigen chromedriver en Chrome starten
+        tab = cls.__new__(cls)
+        tab.service = None  # geen eigen proces → niets om te killen bij een hang
+        opts = ChromeOptions()
+        opts.debugger_address = host.capabilities["goog:chromeOptions"]["debuggerAddress"]
+        executor = ChromiumRemoteConnection(
+            remote_server_addr=host.service.service_url, browser_name="chrome",
+            vendor_prefix="goog", keep_alive=True, ignore_proxy=opts._ignore_local_proxy,
+        )
+        RemoteWebDriver.__init__(tab, command_executor=executor, options=opts)
+        tab._browser = browser
+        tab.handle = handle
+        tab.target_id = target_id
+        tab.context_id = context_id
+        tab.generation = generation
+        try:
+            tab.switch_to.window(handle)
+            tab.set_page_load_timeout(Config.PAGE_LOAD_TIMEOUT)
+        except Exception:
+            tab._detach()
+            raise
+        return tab
+
+    def execute(self, driver_command: str, params: dict = None) -> dict:
+        if self.generation != self._browser.generation or not self._browser._alive():
+            # gedeelde browser gekild of herstart → run herstellen in een nieuwe tab
+            raise DriverWedged("Gedeelde browser is herstart")
+        return super().execute(driver_command, params)
+
+    def _detach(self):
+        # een aangehaakte sessie beëindigen laat Chrome zelf draaien
+        try:
+            RemoteWebDriver.quit(self)
+        except Exception:
+            pass
+
+    def close(self):
+        self.quit()
+
+    def quit(self):
+        """Sluit enkel de tab en zijn context; de gedeelde browser blijft draaien."""
+        self._browser.close_tab(self)
+
+
+class SharedBrowser:
+    def __init__(self, launch: Callable[..., webdriver.Chrome], max_tabs: Optional[int] = None):
+        self._launch = launch  # launch_chrome(on_start)
+        self.max_tabs = max_tabs or Config.SHARED_BROWSER_MAX_TABS
+        self.lock = threading.RLock()  # enkel voor beheer via de host-sessie
+        self._host: Optional[webdriver.Chrome] = None
+        self._starting_pid: Optional[int] = None
+        self._supervisor = DriverSupervisor(lambda: self.pid() or self._starting_pid)
+        self.tabs: Dict[str, TabDriver] = {}
+        self._opening = 0  # tabs die buiten de lock nog aangehaakt worden
+        self.generation = 0
+        self.launches = 0
+        self.opened = 0
+
+    # ---------------- Host ----------------
+    def _alive(self) -> bool:
+        try:
+            return self._host is not None and self._host.service.process.poll() is None
+        except Exception:
+            return False
+
+    def _ensure_host(self):
+        if self._alive():
+            return
+        if self._host is not None:
+            # host is weg (gekild na een hang) → alle tabs van die generatie zijn ongeldig
+            log.warning("Gedeelde browser (generatie %d) is weg → opnieuw starten", self.generation)
+            self._discard_host()
+        self._starting_pid = None
+        self._host = self._manage("start", self._launch, self._started, timeout=Config.COMMAND_TIMEOUT * 2)
+        self._starting_pid = None
+        self.generation += 1
+        self.launches += 1
+        log.info("Gedeelde browser gestart (generatie %d, pid %s)", self.generation, self.pid())
+
+    def _discard_host(self):
+        host, self._host = self._host, None
+        self.tabs.clear()
+        try:
+            if host:
+                proctools.kill_tree(host.service.process.pid)
+        except Exception:
+            pass
+
+    def _started(self, pid: int):
+        self._starting_pid = pid
+
+    def _manage(self, what: str, fn: Callable, *args, timeout: Optional[float] = None):
+        """Beheercommando met een eigen deadline; hangt het, dan is de host weg (en de lock vrij)."""
+        try:
+            return self._supervisor.call(what, fn, *args, timeout=timeout)
+        except DriverWedged:
+            log.warning("Beheercommando '%s' op de gedeelde browser hangt → host killen", what)
+            self._discard_host()
+            raise
+
+    def pid(self) -> Optional[int]:
+        try:
+            return self._host.service.process.pid
+        except Exception:
+            return None
+
+    def rss_mb(self) -> int:
+        pid = self.pid()
+        return proctools.tree_rss_bytes(pid) // (1024 * 1024) if pid else 0
+
+    def _cdp(self, cmd: str, params: dict) -> dict:
+        """CDP-beheercommando via de host-sessie (die op zijn eigen home-tab blijft)."""
+        return self._manage("cdp", self._host.execute_cdp_cmd, cmd, params)
+
+    # ---------------- Tabs ----------------
+    def open_tab(self) -> Optional[TabDriver]:
+        """Nieuwe geïsoleerde context + tab, of None als de browser vol zit."""
+        with self.lock:
+            self._ensure_host()
+            if len(self.tabs) + self._opening >= self.max_tabs:
+                return None
+            context_id = self._cdp("Target.createBrowserContext", {"disposeOnDetach": False})["browserContextId"]
+            target_id = self._cdp("Target.createTarget", {
+                "url": "about:blank", "browserContextId": context_id,
+            })["targetId"]
+            try:
+                handle = self._manage("handles", self._find_handle, target_id)
+            except Exception:
+                self._close_target(target_id, context_id)
+                raise
+            host, generation = self._host, self.generation
+            self._opening += 1
+        try:
+            # nieuwe sessie aanmaken is een round-trip naar chromedriver → niet onder de lock
+            tab = TabDriver.attach(self, host, generation, handle, target_id, context_id)
+        except Exception:
+            with self.lock:
+                self._opening -= 1
+                if generation == self.generation and self._alive():
+                    self._close_target(target_id, context_id)
+            raise
+        with self.lock:
+            self._opening -= 1
+            if generation != self.generation or not self._alive():
+                tab._detach()
+                raise DriverWedged("Gedeelde browser is herstart")
+            self.tabs[handle] = tab
+            self.opened += 1
+            log.info("Tab geopend in gedeelde browser (%d/%d tabs)", len(self.tabs), self.max_tabs)
+            return tab
+
+    def _find_handle(self, target_id: str, timeout: float = 5.0) -> str:
+        # chromedriver gebruikt de target-id als window handle, maar ziet hem pas na een poll
+        end = time.monotonic() + timeout
+        while True:
+            for handle in webdriver.Chrome.execute(self._host, Command.W3C_GET_WINDOW_HANDLES)["value"]:
+                if handle == target_id or handle.endswith(target_id):
+                    return handle
+            if time.monotonic() > end:
+                raise RuntimeError(f"Tab {target_id} niet gevonden in de gedeelde browser")
+            time.sleep(0.1)
+
+    def _close_target(self, target_id: str, context_id: str):
+        try:
+            self._cdp("Target.closeTarget", {"targetId": target_id})
+            self._cdp("Target.disposeBrowserContext", {"browserContextId": context_id})
+        except Exception as e:
+            log.debug("Tab sluiten mislukt: %s", e)
+
+    def close_tab(self, tab: TabDriver):
+        with self.lock:
+            if self.tabs.pop(tab.handle, None) is None or tab.generation != self.generation:
+                return  # al gesloten, of de host van deze tab bestaat niet meer
+            if not self._alive():
+                return
+            # eerst de tab weg: een hangend commando in zijn sessie breekt dan af
+            self._close_target(tab.target_id, tab.context_id)
+        tab._detach()
+        with self.lock:
+            if not self.tabs and Config.WATCHDOG_MAX_RSS_MB and self.rss_mb() > Config.WATCHDOG_MAX_RSS_MB:
+                # geen runs meer en te zwaar geworden → vers beginnen bij de volgende tab
+                log.info("Gedeelde browser leeg en %d MB → afsluiten", self.rss_mb())
+                self.shutdown()
+
+    def shutdown(self):
+        with self.lock:
+            host, self._host = self._host, None
+            self.tabs.clear()
+            if host:
+                try:
+                    self._supervisor.call("quit", webdriver.Chrome.quit, host, timeout=15)
+                except Exception:
+                    self._host = host
+                    self._discard_host()
+
+    # ---------------- Rapportage ----------------
+    def summary(self) -> str:
+        if not self._alive():
+            return "niet gestart"
+        return (
+            f"{len(self.tabs)}/{self.max_tabs} tabs, RSS={self.rss_mb()} MB, "
+            f"starts={self.launches} tabs geopend={self.opened}"
+        )
@@ -0,0 +1,176 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Hot-standby sessies voor bewaarde profielen.
+
+Per profiel met standby aan staat er een bot klaar die al ingelogd is, het
+voertuig en station gekozen heeft en op de kalender geparkeerd staat. Elke
+STANDBY_KEEPALIVE_SECONDS volgt een (gebudgetteerde) refresh zodat de
+ASP.NET-sessie niet verloopt; is ze toch verlopen, dan herstelt de bot zijn
+positie. `/book <profiel>` neemt de bot over en begint meteen te monitoren;
+na de run parkeert de runner een nieuwe sessie.
+
+Enkel in WORKER_MODE=thread: de bot moet in dit proces leven om over te nemen.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, Optional, Tuple
+
+from config import Config
+from async_bot import AsyncBookingBot
+from driver_supervisor import RunCancelled
+from run_config import RunConfig
+
+log = logging.getLogger("AIBV-Standby")
+
+Key = Tuple[int, str]
+Notify = Callable[[int, str], Awaitable[None]]
+
+
+class _Parked:
+    def __init__(self, chat_id: int, profile: dict):
+        self.chat_id = chat_id
+        self.profile = profile
+        self.bot: Optional[AsyncBookingBot] = None
+        self.ready = False
+        self.taken = False
+        self.since = 0.0
+        self.keepalives = 0
+        self.failures = 0
+        self.error: Optional[str] = None
+        self.lock = asyncio.Lock()  # keep-alive en overname nooit tegelijk
+        self.task: Optional[asyncio.Task] = None
+
+
+class StandbyPool:
+    def __init__(self, interval: Optional[int] = None, max_sessions: Optional[int] = None):
+        self.interval = interval or Config.STANDBY_KEEPALIVE_SECONDS
+        self.max_sessions = Config.STANDBY_MAX_SESSIONS if max_sessions is None else max_sessions
+        self.parked: Dict[Key, _Parked] = {}
+        self.notify: Optional[Notify] = None
+        self.takeovers = 0
+        self.closed = False
+
+    # ---------------- Parkeren ----------------
+    def park(self, chat_id: int, profile: dict) -> bool:
+        """Zet (op de achtergrond) een sessie klaar voor dit profiel. False als het vol zit."""
+        key = (chat_id, profile["name"])
+        if self.closed:
+            return False
+        if key in self.parked:
+            return True
+        if len(self.parked) >= self.max_sessions:
+            log.warning("Standby vol (%d sessies), %s niet geparkeerd", self.max_sessions, key)
+            return False
+        entry = _Parked(chat_id, profile)
+        self.parked[key] = entry
+        entry.task = asyncio.create_task(self._run(entry))
+        return True
+
+    async def _run(self, entry: _Parked):
+        p = entry.profile
+        while True:
+            try:
+                await self._setup(entry)
+                entry.ready, entry.since, entry.error = True, time.time(), None
+                entry.failures = 0
+                log.info("Standby %s/%s klaar op de kalender", entry.chat_id, p["name"])
+                await self._tell(entry.chat_id, f"🅿️ Standby voor '{p['name']}' staat klaar op de kalender.")
+                while True:
+                    await asyncio.sleep(self.interval)
+                    async with entry.lock:
+                        if entry.taken:
+                            return
+                        await entry.bot.call(entry.bot.bot.supervised, entry.bot.bot.keep_alive)
+                        entry.keepalives += 1
+            except asyncio.CancelledError:
+                raise
+            except RunCancelled:
+                # globale stop → sessie opgeven
+                self.parked.pop((entry.chat_id, p["name"]), None)
+                await self._discard(entry)
+                return
+            except Exception as e:
+                entry.ready, entry.error = False, str(e)
+                entry.failures += 1
+                backoff = min(600, 60 * entry.failures)
+                log.warning("Standby %s/%s mislukt (%s) → opnieuw over %ss", entry.chat_id, p["name"], e, backoff)
+                if entry.failures == 1:
+                    await self._tell(entry.chat_id, f"⚠️ Standby voor '{p['name']}' mislukt: {e}. Ik probeer het opnieuw.")
+                await self._discard(entry)
+                await asyncio.sleep(backoff)
+
+    async def _setup(self, entry: _Parked):
+        p = entry.profile
+        bot = AsyncBookingBot(name=f"aibv-standby-{entry.chat_id}-{p['name']}")
+        bot.bot.run_config = RunConfig(p.get("stations"), p.get("window"))
+        entry.bot = bot
+        await bot.setup_driver()
+        await bot.login()
+        await bot.select_vehicle(p["plate"], p["first_reg_date"])
+        await bot.select_station()
+
+    async def _discard(self, entry: _Parked):
+        bot, entry.bot = entry.bot, None
+        entry.ready = False
+        if bot:
+            await bot.close()
+
+    async def _tell(self, chat_id: int, text: str):
+        if self.notify:
+            try:
+                await self.notify(chat_id, text)
+            except Exception as e:
+                log.warning("Standby-melding mislukt (chat=%s): %s", chat_id, e)
+
+    # ---------------- Overnemen / opruimen ----------------
+    async def take(self, chat_id: int, name: str) -> Optional[AsyncBookingBot]:
+        """Neem een klaarstaande sessie over (uit de pool), of None als er geen klaar is."""
+        entry = self.parked.get((chat_id, name))
+        if not (entry and entry.ready):
+            return None
+        async with entry.lock:
+            if not entry.ready or entry.bot is None:
+                return None
+            entry.taken = True
+            self.parked.pop((chat_id, name), None)
+            # de taak slaapt nu tussen twee keep-alives → veilig annuleren
+            entry.task.cancel()
+        self.takeovers += 1
+        log.info("Standby %s/%s overgenomen (geparkeerd %.0fs, %d keep-alives)",
+                 chat_id, name, time.time() - entry.since, entry.keepalives)
+        return entry.bot
+
+    async def unpark(self, chat_id: int, name: str):
+        entry = self.parked.pop((chat_id, name), None)
+        if not entry:
+            return
+        if entry.task:
+            entry.task.cancel()
+        await self._discard(entry)
+
+    async def shutdown(self):
+        self.closed = True
+        for chat_id, name in list(self.parked):
+            await self.unpark(chat_id, name)
+
+    # ---------------- Rapportage ----------------
+    def status(self, chat_id: int, name: str) -> str:
+        entry = self.parked.get((chat_id, name))
+        if not entry:
+            return "uit"
+        if entry.ready:
+            return f"klaar ({(time.time() - entry.since) / 60:.0f} min, {entry.keepalives} keep-alives)"
+        if entry.error:
+            return f"fout: {entry.error}"
+        return "wordt klaargezet…"
+
+    def summary(self) -> str:
+        ready = sum(1 for e in self.parked.values() if e.ready)
+        return f"{ready}/{len(self.parked)} klaar (max {self.max_sessions}), {self.takeovers} overnames"
+
+
+pool = StandbyPool()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Gedeelde Telegram-front-end voor telegram_runner en telegram_monitor.
+
+TELEGRAM_MODE=polling (standaard) gebruikt long polling. Met
+TELEGRAM_MODE=webhook luistert de ingebouwde async HTTP-server van
+python-telegram-bot (tornado, extra "webhooks") op WEBHOOK_LISTEN:PORT en
+registreert de bot WEBHOOK_URL bij Telegram. Elke POST moet de header
+X-Telegram-Bot-Api-Secret-Token met WEBHOOK_SECRET dragen, anders volgt 403.
+Is WEBHOOK_SECRET leeg, dan wordt er per start een willekeurig geheim gemaakt
+(het wordt bij elke start opnieuw met setWebhook doorgegeven).
+
+Updates worden gelijktijdig verwerkt (CONCURRENT_UPDATES), zodat bv. een
+/stop nooit achter een tragere /status of /book hoeft te wachten. Selenium
+draait sowieso op eigen threads of processen.
+
+TELEGRAM_API_URL laat de bot tegen een andere Bot API praten (bv. fake_botapi.py
+bij lokale tests en de harnassen).
+"""
+
+import logging
+import secrets
+from typing import Optional
+
+from config import Config
+
+log = logging.getLogger("TG-FRONTEND")
+
+_secret: Optional[str] = None
+
+
+def webhook_secret() -> str:
+    global _secret
+    if _secret is None:
+        _secret = Config.WEBHOOK_SECRET or secrets.token_urlsafe(32)
+    return _secret
+
+
+def webhook_url() -> str:
+    return f"{Config.WEBHOOK_URL.rstrip('/')}/{Config.WEBHOOK_PATH.strip('/')}"
+
+
+def mode_label() -> str:
+    return "webhook" if Config.TELEGRAM_MODE == "webhook" else "polling"
+
+
+def build_app(token: Optional[str] = None, post_init=None, post_shutdown=None):
+    """Application met rate limiter, gelijktijdige updates en eventueel een andere Bot API."""
+    from telegram.ext import ApplicationBuilder, AIORateLimiter
+    builder = (
+        ApplicationBuilder()
+        .token(token or Config.TELEGRAM_TOKEN)
+        .rate_limiter(AIORateLimiter())
+        .concurrent_updates(Config.CONCURRENT_UPDATES if Config.CONCURRENT_UPDATES > 1 else False)
+    )
+    if Config.TELEGRAM_API_URL:
+        api = Config.TELEGRAM_API_URL.rstrip("/")
+        builder = builder.base_url(f"{api}/bot").base_file_url(f"{api}/file/bot")
+    # post_init/post_shutdown zijn builder-opties (Application.post_init is enkel een getter)
+    if post_init:
+        builder = builder.post_init(post_init)
+    if post_shutdown:
+        builder = builder.post_shutdown(post_shutdown)
+    return builder.build()
+
+
+def run(app):
+    """Blokkerend serveren in de gekozen modus (zoals `app.run_polling()`)."""
+    if Config.TELEGRAM_MODE != "webhook":
+        app.run_polling(allowed_updates=None)
+        return
+    if not Config.WEBHOOK_URL:
+        raise RuntimeError("TELEGRAM_MODE=webhook vereist WEBHOOK_URL (publieke basis-URL, bv. https://app.herokuapp.com)")
+    log.info("Webhook-modus: luister op %s:%s/%s → %s",
+             Config.WEBHOOK_LISTEN, Config.WEBHOOK_PORT, Config.WEBHOOK_PATH.strip("/"), webhook_url())
+    app.run_webhook(
+        listen=Config.WEBHOOK_LISTEN,
+        port=Config.WEBHOOK_PORT,
+        url_path=Config.WEBHOOK_PATH.strip("/"),
+        webhook_url=webhook_url(),
+        secret_token=webhook_secret(),
+        allowed_updates=None,
+    )
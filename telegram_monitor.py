@@ -3,10 +3,12 @@ import asyncio
 from typing import Dict
 
 from telegram import Update
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, AIORateLimiter
+from telegram.ext import CommandHandler, ContextTypes
 
-from config import Config, TELEGRAM_CHAT_IDS
-from selenium_controller import AIBVBookingBot
+from config import Config, TELEGRAM_CHAT_IDS, config_summary
+from driver_supervisor import RunCancelled
+from async_bot import AsyncBookingBot
+import telegram_frontend
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 log = logging.getLogger("TG-MONITOR")
@@ -20,6 +22,7 @@ HELP = (
 )
 
 active_tasks: Dict[int, asyncio.Task] = {}
+active_bots: Dict[int, AsyncBookingBot] = {}
 Config.STOP_FLAG = False
 
 
@@ -46,9 +49,13 @@ async def whoami_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def stop_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_authorized(update):
         return await update.message.reply_text("🚫 Geen toegang tot deze bot.")
-    Config.STOP_FLAG = True
-    task = active_tasks.get(update.effective_chat.id)
+    chat_id = update.effective_chat.id
+    task = active_tasks.get(chat_id)
     if task and not task.done():
+        bot = active_bots.get(chat_id)
+        if bot:
+            await bot.stop()
+        task.cancel()
         await update.message.reply_text("⏹️ Monitoring wordt gestopt…")
     else:
         await update.message.reply_text("ℹ️ Geen actieve monitoring.")
@@ -66,46 +73,62 @@ async def monitor_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     plate, first_reg_date = [x.strip() for x in raw_arg.split("|", 1)]
 
+    old = active_tasks.get(chat_id)
+    if old and not old.done():
+        return await update.message.reply_text("⏳ Er loopt al een monitoring. Gebruik eerst /stop.")
+
     await update.message.reply_text(f"🔍 Start monitoring voor {plate} ({first_reg_date})…")
 
     async def runner():
-        bot = AIBVBookingBot()
-        bot.notify_func = lambda msg: asyncio.create_task(
-            context.bot.send_message(chat_id=chat_id, text=msg)
-        )
+        loop = asyncio.get_running_loop()
+        bot = AsyncBookingBot(name=f"aibv-monitor-{chat_id}")
+        active_bots[chat_id] = bot
+        # notify wordt vanuit de worker-thread aangeroepen → thread-safe inplannen
+        bot.set_notifier(lambda msg: asyncio.run_coroutine_threadsafe(
+            context.bot.send_message(chat_id=chat_id, text=msg), loop
+        ))
         try:
-            bot.setup_driver()
-            bot.login()
-            bot.select_vehicle(plate, first_reg_date)
-            bot.select_station()
-
-            start = asyncio.get_event_loop().time()
-            while not Config.STOP_FLAG and (asyncio.get_event_loop().time() - start) < Config.MONITOR_MAX_SECONDS:
-                best = bot.find_earliest_within_3_business_days()
-                if best:
-                    dt, _, label = best
+            await bot.setup_driver()
+            await bot.login()
+            await bot.select_vehicle(plate, first_reg_date)
+            await bot.select_station()
+
+            start = loop.time()
+            while (loop.time() - start) < Config.MONITOR_MAX_SECONDS:
+                label = await bot.find_first_slot_in_window()
+                if label:
                     await context.bot.send_message(chat_id=chat_id, text=f"✅ Slot gevonden: {label}")
                     break
-                bot.driver.refresh()
-                bot.wait_dom_idle()
+                await bot.refresh()
                 await asyncio.sleep(Config.REFRESH_DELAY)
+        except asyncio.CancelledError:
+            try:
+                await context.bot.send_message(chat_id=chat_id, text="⏹️ Monitoring gestopt.")
+            except Exception:
+                pass
+            # annulering doorgeven (bv. bij het afsluiten van de applicatie)
+            raise
+        except RunCancelled:
+            await context.bot.send_message(chat_id=chat_id, text="⏹️ Monitoring gestopt.")
         except Exception as e:
             log.exception("Fout in monitor-runner")
             await context.bot.send_message(chat_id=chat_id, text=f"⚠️ Fout: {e}")
         finally:
-            bot.close()
+            await bot.close()
+            active_bots.pop(chat_id, None)
 
     active_tasks[chat_id] = asyncio.create_task(runner())
 
 
 def main():
-    app = ApplicationBuilder().token(Config.TELEGRAM_TOKEN).rate_limiter(AIORateLimiter()).build()
+    log.info(config_summary())
+    app = telegram_frontend.build_app()
     app.add_handler(CommandHandler("start", start_cmd))
     app.add_handler(CommandHandler("help", help_cmd))
     app.add_handler(CommandHandler("whoami", whoami_cmd))
     app.add_handler(CommandHandler("stop", stop_cmd))
     app.add_handler(CommandHandler("monitor", monitor_cmd))
-    app.run_polling()
+    telegram_frontend.run(app)
 
 
 if __name__ == "__main__":
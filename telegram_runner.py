@@ -1,16 +1,45 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
 
-import asyncio
-import logging
-from typing import Dict, Optional, Callable
+from __future__ import annotations
+
+import time
 
-from telegram import Update
-from telegram.constants import ChatAction
-from telegram.ext import ApplicationBuilder, CommandHandler, ContextTypes, AIORateLimiter
+_BOOT = time.perf_counter()
 
-from config import Config, TELEGRAM_CHAT_IDS
-from selenium_controller import AIBVBookingBot
+import asyncio
+import importlib
+import json
+import logging
+import os
+import signal
+import sys
+import threading
+import uuid
+from datetime import datetime
+from typing import TYPE_CHECKING, Dict, Callable, List, Optional
+
+# python-telegram-bot en selenium worden pas in main()/bij de eerste run geladen:
+# zo blijven ook gespawnde worker-processen (die deze module herimporteren) licht.
+if TYPE_CHECKING:
+    from telegram import Bot, Update
+    from telegram.ext import ContextTypes
+
+from config import Config, TELEGRAM_CHAT_IDS, config_summary
+from driver_supervisor import RunCancelled
+from async_bot import AsyncBookingBot
+import telegram_frontend
+import proctools
+import worker_pool
+import run_store
+import standby
+from profiles import ProfileStore, normalize_name
+from run_config import RunConfig, parse_set_args
+import metadata_cache
+from coordinator import Coordinator
+from leases import open_lease_store
+from throttle import budget
+from latency import tracker, breaker
 
 logging.basicConfig(level=logging.INFO, format="%(asctime)s %(levelname)s %(name)s: %(message)s")
 log = logging.getLogger("TG-RUNNER")
@@ -20,15 +49,34 @@ HELP = (
     "/whoami – toon je chat ID\n"
     "/status – status van de huidige run\n"
     "/book <plaat>|<dd/mm/jjjj> – start\n"
+    "/book <profiel> – start met een bewaard profiel\n"
+    "/profile add <naam> <plaat>|<dd/mm/jjjj>[|<stations>][|<werkdagen>] – profiel bewaren\n"
+    "/profile list – bewaarde profielen\n"
+    "/profile del <naam> – profiel verwijderen\n"
+    "/standby <naam> on|off – sessie klaar houden op de kalender\n"
+    "/set [venster <wd>] [refresh <s>] [stations <id,id>] [boeken on|off] – lopende run bijsturen\n"
     "/stop  – stop de huidige run\n"
 )
 
 active_tasks: Dict[int, asyncio.Task] = {}
 active_status: Dict[int, str] = {}
-active_bots: Dict[int, AIBVBookingBot] = {}
+active_bots: Dict[int, AsyncBookingBot] = {}
 notify_locks: Dict[int, asyncio.Lock] = {}
 notify_enabled: Dict[int, bool] = {}
 run_tokens: Dict[int, int] = {}
+active_runs: Dict[int, int] = {}  # chat_id → run_id in de run store
+run_configs: Dict[int, RunConfig] = {}  # chat_id → instellingen van de lopende run (/set)
+# tellers voor de STATS-regel (RUNNER_STATS_SECONDS)
+notify_stats: Dict[str, int] = {"pending": 0, "sent": 0, "dropped": 0, "failed": 0}
+
+# Persistente run store en profielen (worden in main() geopend)
+store: Optional[run_store.RunStore] = None
+profiles: Optional[ProfileStore] = None
+
+# Coördinatie over meerdere workers (enkel met LEASE_STORE_URL)
+coordinator: Optional[Coordinator] = None
+active_keys: Dict[int, str] = {}  # chat_id → sleutel in het werkregister
+submit_locks: Dict[int, asyncio.Lock] = {}
 
 
 def _bump_token(chat_id: int) -> int:
@@ -36,10 +84,47 @@ def _bump_token(chat_id: int) -> int:
     return run_tokens[chat_id]
 
 
-# Globale stop-vlag (gelezen door selenium_controller)
+# Globale stop-vlag (gelezen door selenium_controller); /stop werkt per run via de bot zelf
 Config.STOP_FLAG = False
 
 
+def _set_step(chat_id: int, step: str):
+    active_status[chat_id] = step
+    run_id = active_runs.get(chat_id)
+    if store and run_id:
+        try:
+            store.set_step(run_id, step)
+        except Exception as e:
+            log.warning("Kon stap niet bewaren (run=%s): %s", run_id, e)
+
+
+def _finish_run(chat_id: int, status: str, detail: Optional[str] = None):
+    run_id = active_runs.pop(chat_id, None)
+    if store and run_id:
+        try:
+            store.finish(run_id, status, detail)
+        except Exception as e:
+            log.warning("Kon run niet afsluiten (run=%s): %s", run_id, e)
+
+
+async def _persist_counters(chat_id: int, run_id: int, every: float = 60.0):
+    """Bewaar periodiek de tellers van een lopende run (thread-modus)."""
+    while True:
+        await asyncio.sleep(every)
+        bot = active_bots.get(chat_id)
+        if not (store and bot):
+            continue
+        try:
+            store.set_counters(
+                run_id,
+                refreshes=bot.bot.watchdog.total_refreshes,
+                recycles=bot.bot.watchdog.recycles,
+                recoveries=bot.bot.supervisor.recoveries,
+            )
+        except Exception as e:
+            log.warning("Kon tellers niet bewaren (run=%s): %s", run_id, e)
+
+
 def is_authorized(update: Update) -> bool:
     return str(update.effective_chat.id) in TELEGRAM_CHAT_IDS
 
@@ -48,12 +133,29 @@ def _status_line(chat_id: int) -> str:
     t = active_tasks.get(chat_id)
     running = "🟢 actief" if (t and not t.done()) else "⚪️ niet actief"
     step = active_status.get(chat_id, "idle")
+    worker = worker_pool.pool.get(chat_id)
+    proc = f"Worker: pid={worker.pid} RSS={worker.rss_bytes() // (1024 * 1024)} MB\n" if worker else ""
+    bot = active_bots.get(chat_id)
+    cfg = run_configs.get(chat_id) if (t and not t.done()) else None
+    browser = (
+        f"Browser: {bot.bot.watchdog.summary()}\n"
+        f"Driver: {bot.bot.supervisor.summary()}\n"
+    ) if bot else ""
+    if bot and Config.BROWSER_MODE == "shared":
+        from selenium_controller import shared_browser
+        browser += f"Gedeelde browser: {shared_browser().summary()}\n"
     return (
         f"Status: {running}\n"
         f"Stap: {step}\n"
-        f"STOP_FLAG={Config.STOP_FLAG}\n"
-        f"TEST_MODE={Config.TEST_MODE}  BOOKING_ENABLED={Config.BOOKING_ENABLED}\n"
-        f"STATION_ID={Config.STATION_ID}  DESIRED_BD={Config.DESIRED_BUSINESS_DAYS}"
+        f"{proc}"
+        f"{browser}"
+        f"Budget AIBV: {budget.summary()}\n"
+        f"Metadata: {metadata_cache.cache().summary()}\n"
+        f"Latency AIBV: {tracker.summary()}\n"
+        f"Circuit breaker: {breaker.summary()}\n"
+        f"Standby: {standby.pool.summary()}\n"
+        f"TEST_MODE={Config.TEST_MODE}\n"
+        + (f"Run: {cfg.summary()}" if cfg else f"Standaard: {RunConfig().summary()}")
     )
 
 
@@ -70,11 +172,18 @@ async def whoami_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
 async def status_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_authorized(update):
         return await update.message.reply_text("🚫 Geen toegang tot deze bot.")
-    await update.message.reply_text(_status_line(update.effective_chat.id))
+    chat_id = update.effective_chat.id
+    text = _status_line(chat_id)
+    if coordinator and chat_id not in active_keys:
+        for key, payload in (await coordinator.work()).items():
+            if payload.get("chat_id") == chat_id:
+                owner = await coordinator.owner(key) or "nog niet geclaimd"
+                text += f"\nRun {payload.get('plate')} draait op worker: {owner}"
+    await update.message.reply_text(text)
 
 
 # ------- Notifier (sequentieel & annuleerbaar) -------
-def make_notifier(context: ContextTypes.DEFAULT_TYPE, chat_id: int) -> Callable[[str], None]:
+def make_notifier(tg: Bot, chat_id: int) -> Callable[[str], None]:
     if chat_id not in notify_locks:
         notify_locks[chat_id] = asyncio.Lock()
     notify_enabled[chat_id] = True
@@ -82,51 +191,407 @@ def make_notifier(context: ContextTypes.DEFAULT_TYPE, chat_id: int) -> Callable[
 
     async def send_async(text: str):
         if not notify_enabled.get(chat_id, True):
+            notify_stats["dropped"] += 1
             return
-        async with notify_locks[chat_id]:
-            if token != run_tokens.get(chat_id):
-                return
-            try:
-                await context.bot.send_chat_action(chat_id=chat_id, action=ChatAction.TYPING)
-                await context.bot.send_message(chat_id=chat_id, text=text, disable_web_page_preview=True)
-            except Exception as e:
-                log.error("[notify] Telegram send failed: %s", e)
+        notify_stats["pending"] += 1
+        try:
+            async with notify_locks[chat_id]:
+                if token != run_tokens.get(chat_id):
+                    notify_stats["dropped"] += 1
+                    return
+                try:
+                    await tg.send_chat_action(chat_id=chat_id, action="typing")
+                    await tg.send_message(chat_id=chat_id, text=text, disable_web_page_preview=True)
+                    notify_stats["sent"] += 1
+                except Exception as e:
+                    notify_stats["failed"] += 1
+                    log.error("[notify] Telegram send failed: %s", e)
+        finally:
+            notify_stats["pending"] -= 1
+
+    loop = asyncio.get_running_loop()
 
     def notify(msg: str):
+        # Wordt aangeroepen vanuit de worker-thread van de bot → thread-safe inplannen
         try:
-            context.application.create_task(send_async(msg))
-        except Exception:
-            asyncio.get_event_loop().create_task(send_async(msg))
+            asyncio.run_coroutine_threadsafe(send_async(msg), loop)
+        except RuntimeError:
+            log.warning("[notify] event loop gesloten, melding genegeerd: %s", msg)
 
     return notify
 
 
+async def _stop_local(chat_id: int, handover: bool = False):
+    """
+    Stop de lokale run van deze chat. Bij handover (lease kwijt of shutdown in
+    coördinatie-modus) blijft de run 'running' zodat hij elders hervat wordt.
+    """
+    # 1) direct stoppen & oude meldingen ongeldig (enkel voor deze chat)
+    notify_enabled[chat_id] = False
+    _bump_token(chat_id)
+
+    # 2) stopvlag + browser sluiten (best effort, breekt lopende waits af);
+    #    in process-modus volgt na een korte grace-periode een harde kill
+    bot = active_bots.get(chat_id)
+    if bot:
+        await bot.stop()
+    if worker_pool.pool.get(chat_id):
+        await worker_pool.pool.stop(chat_id)
+
+    # 3) run als gestopt bewaren (niet hervatten na herstart) en taak annuleren
+    if handover:
+        active_runs.pop(chat_id, None)
+    else:
+        _finish_run(chat_id, run_store.STOPPED)
+    task = active_tasks.get(chat_id)
+    if task and not task.done():
+        task.cancel()
+
+
 # ---------------- Commands ----------------
 async def stop_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not is_authorized(update):
         return await update.message.reply_text("🚫 Geen toegang tot deze bot.")
     chat_id = update.effective_chat.id
 
-    # 1) direct stoppen & oude meldingen ongeldig
-    Config.STOP_FLAG = True
-    notify_enabled[chat_id] = False
-    _bump_token(chat_id)
+    if coordinator:
+        # de run kan op een andere worker draaien → stopverzoek via het werkregister
+        for key, payload in (await coordinator.work()).items():
+            if payload.get("chat_id") == chat_id:
+                await coordinator.request_stop(key)
+    await _stop_local(chat_id)
 
-    # 2) browser sluiten (best effort)
-    bot = active_bots.get(chat_id)
-    if bot:
+    # onmiddellijke feedback
+    await update.message.reply_text("⏹️ Stopverzoek ontvangen. Ik rond af…")
+
+
+class WorkerFailed(Exception):
+    """Fout gemeld door een worker-proces (met stap/URL/titel uit de worker)."""
+
+    def __init__(self, payload: dict):
+        super().__init__(payload.get("message") or "onbekende fout in worker")
+        self.step = payload.get("step") or "?"
+        self.url = payload.get("url") or ""
+        self.title = payload.get("title") or ""
+        self.dump = payload.get("dump")  # zip van de flight recorder, indien beschikbaar
+
+
+def _monitor_started_text(cfg: RunConfig) -> str:
+    return (
+        f"🕑 Monitor gestart. Venster: {cfg.window} werkdagen. "
+        f"Refresh elke {cfg.interval}s. "
+        f"{'🧪 TEST_MODE: er wordt niet echt geboekt.' if (Config.TEST_MODE or not cfg.booking) else '🟢 Boeken ingeschakeld.'}\n"
+        "⏱️ Geen tijdslimiet: ik zoek door tot /stop of succes. Bijsturen kan met /set."
+    )
+
+
+async def _report_result(tg: Bot, chat_id: int, result):
+    if isinstance(result, dict) and result.get("blocked"):
+        await tg.send_message(chat_id=chat_id, text=(
+            f"❌ Kan niet verder: {result.get('error')}\n(Er is waarschijnlijk al een reservatie voor dit voertuig.)"
+        ))
+        return
+    ok = bool(result.get("success")) if isinstance(result, dict) else bool(result)
+    if ok:
+        label = result.get("slot") if isinstance(result, dict) else ""
+        extra = " (niet bevestigd: BOOKING_ENABLED=false)" if (isinstance(result, dict) and result.get("booking_disabled")) else ""
+        await tg.send_message(chat_id=chat_id, text=f"🎉 Resultaat: ✅ gelukt {label}{extra}")
+    else:
+        if isinstance(result, dict) and result.get("stopped"):
+            await tg.send_message(chat_id=chat_id, text="⏹️ Gestopt op verzoek.")
+        else:
+            err = (result or {}).get("error") if isinstance(result, dict) else None
+            await tg.send_message(chat_id=chat_id, text=f"❌ Resultaat: niet gelukt. {f'Reden: {err}' if err else ''}")
+
+
+async def _drive_thread(tg: Bot, chat_id: int, plate: str, first_reg_date: str,
+                        cfg: RunConfig, profile: Optional[str] = None):
+    """Run in een worker-thread van dit proces (AsyncBookingBot)."""
+    # klaarstaande standby-sessie voor dit profiel → login/voertuig/station overslaan
+    parked = await standby.pool.take(chat_id, profile) if profile else None
+    if profile and not parked:
+        # nog niet klaar → niet met twee sessies op hetzelfde voertuig
+        await standby.pool.unpark(chat_id, profile)
+    bot = parked or AsyncBookingBot(name=f"aibv-chat-{chat_id}")
+    bot.bot.run_config = cfg  # gedeeld object: /set werkt meteen door in de monitor-lus
+    active_bots[chat_id] = bot
+    try:
+        bot.set_notifier(make_notifier(tg, chat_id))
+        # teruggedraaide stationwissel: cfg is hetzelfde object, enkel nog bewaren
+        loop = asyncio.get_running_loop()
+        bot.set_settings_listener(lambda settings: loop.call_soon_threadsafe(_persist_settings, chat_id, cfg))
+
+        if parked:
+            _set_step(chat_id, "monitor")
+            await tg.send_message(chat_id=chat_id, text=f"⚡ Standby-sessie '{profile}' overgenomen, geen login nodig.")
+            await bot.refresh()
+        else:
+            # --- Selenium op de eigen worker-thread van de bot ---
+            _set_step(chat_id, "driver")
+            await bot.setup_driver()
+
+            _set_step(chat_id, "login")
+            await bot.login()
+
+            _set_step(chat_id, "voertuig")
+            await bot.select_vehicle(plate, first_reg_date)
+
+            _set_step(chat_id, "station")
+            try:
+                await bot.select_station()
+            except RuntimeError as e:
+                return {"success": False, "error": str(e), "blocked": True}
+
+        _set_step(chat_id, "monitor")
+        await tg.send_message(chat_id=chat_id, text=_monitor_started_text(cfg))
+        return await bot.monitor_and_book()
+    except (asyncio.CancelledError, RunCancelled):
+        raise
+    except Exception as e:
+        # Context meegeven zodat we snel weten wáár het is misgegaan
+        url = title = ""
+        dump = None
         try:
-            await asyncio.to_thread(bot.close)
+            if bot.driver:
+                url, title = await asyncio.wait_for(bot.page_info(), timeout=10)
+                dump = await asyncio.wait_for(bot.call(bot.bot.dump_flight_recorder, f"chat{chat_id}"), timeout=30)
         except Exception:
             pass
+        raise WorkerFailed({
+            "step": active_status.get(chat_id, "?"), "message": str(e), "url": url, "title": title, "dump": dump,
+        }) from e
+    finally:
+        active_status[chat_id] = "opruimen"
+        await bot.close()
+        active_bots.pop(chat_id, None)
+        # standby-sessies van deze chat (opnieuw) klaarzetten, ook die tijdens de run aangezet werden
+        _park(chat_id)
+
+
+async def _drive_process(tg: Bot, chat_id: int, plate: str, first_reg_date: str,
+                         cfg: RunConfig, profile: Optional[str] = None):
+    """Run in een eigen subprocess; events komen binnen via IPC."""
+    worker = worker_pool.pool.start(chat_id, plate, first_reg_date, cfg.to_dict())
+    notify = make_notifier(tg, chat_id)
+    try:
+        async for kind, payload in worker.events():
+            if kind == "status":
+                _set_step(chat_id, str(payload))
+                if payload == "monitor":
+                    await tg.send_message(chat_id=chat_id, text=_monitor_started_text(cfg))
+            elif kind == "progress":
+                notify(str(payload))
+            elif kind == "settings":
+                # de worker draaide een /set terug → lokale kopie en store bijwerken
+                cfg.update(**payload)
+                _persist_settings(chat_id, cfg)
+            elif kind == "result":
+                return payload
+            elif kind == "error":
+                raise WorkerFailed(payload)
+            elif kind == "exit":
+                if not notify_enabled.get(chat_id, True):
+                    return {"success": False, "stopped": True}
+                raise WorkerFailed({"step": worker.step, "message": f"worker onverwacht gestopt (exit={payload})"})
+        return {"success": False, "stopped": True}
+    finally:
+        active_status[chat_id] = "opruimen"
+        worker_pool.pool.release(chat_id)
+
+
+# ------- Profielen & standby -------
+def _standby_enabled() -> bool:
+    # standby-bots leven in dit proces en worden niet over workers verdeeld
+    return Config.WORKER_MODE == "thread" and not Config.LEASE_STORE_URL and Config.STANDBY_MAX_SESSIONS > 0
+
+
+def _park(chat_id: int, name: Optional[str] = None):
+    """Parkeer (opnieuw) standby-sessies van deze chat (of van één profiel) die dat vragen."""
+    if not (_standby_enabled() and profiles):
+        return
+    for p in profiles.list(chat_id):
+        if p["standby"] and (name is None or p["name"] == name):
+            standby.pool.park(chat_id, p)
+
+
+def _check_input(plate: Optional[str] = None, first_reg_date: Optional[str] = None,
+                 stations: Optional[List[str]] = None) -> Optional[str]:
+    """Invoer controleren vóór er een browser start; foutmelding of None."""
+    if plate is not None and not metadata_cache.normalize_plate(plate):
+        return "nummerplaat ontbreekt"
+    if first_reg_date is not None:
+        try:
+            datetime.strptime(first_reg_date, "%d/%m/%Y")
+        except ValueError:
+            return f"eerste inschrijving '{first_reg_date}' is geen dd/mm/jjjj"
+    if stations:
+        errors = metadata_cache.cache().check_stations(stations)
+        if errors:
+            return "; ".join(errors)
+    return None
+
+
+def _parse_profile(spec: str):
+    """'<plaat>|<dd/mm/jjjj>[|<stations>][|<werkdagen>]' → (plaat, datum, stations, werkdagen)."""
+    parts = [x.strip() for x in spec.split("|")]
+    if len(parts) < 2 or not parts[0]:
+        raise ValueError("verwacht <plaat>|<dd/mm/jjjj>[|<stations>][|<werkdagen>]")
+    plate, first_reg_date = parts[0], parts[1]
+    datetime.strptime(first_reg_date, "%d/%m/%Y")
+    stations = [x.strip() for x in parts[2].split(",") if x.strip()] if len(parts) > 2 and parts[2] else []
+    window = int(parts[3]) if len(parts) > 3 and parts[3] else Config.DESIRED_BUSINESS_DAYS
+    if window < 1:
+        raise ValueError("werkdagen moet minstens 1 zijn")
+    return plate, first_reg_date, stations or [str(Config.STATION_ID)], window
+
+
+async def profile_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_authorized(update):
+        return await update.message.reply_text("🚫 Geen toegang tot deze bot.")
+    chat_id = update.effective_chat.id
+    args = context.args or []
+    action = args[0].lower() if args else "list"
 
-    # 3) taak annuleren
+    if action == "add" and len(args) >= 3:
+        name = normalize_name(args[1])
+        try:
+            plate, first_reg_date, stations, window = _parse_profile(" ".join(args[2:]))
+        except ValueError as e:
+            return await update.message.reply_text(f"❌ Ongeldig profiel: {e}")
+        error = _check_input(stations=stations)
+        if error:
+            return await update.message.reply_text(f"❌ Ongeldig profiel: {error}")
+        profiles.save(chat_id, name, plate, first_reg_date, stations, window)
+        await standby.pool.unpark(chat_id, name)  # eventueel met de nieuwe gegevens opnieuw parkeren
+        _park(chat_id, name)
+        return await update.message.reply_text(
+            f"💾 Profiel '{name}' bewaard: {plate} | {first_reg_date} | stations {','.join(stations)} | {window} werkdagen"
+        )
+
+    if action == "del" and len(args) == 2:
+        name = normalize_name(args[1])
+        await standby.pool.unpark(chat_id, name)
+        ok = profiles.delete(chat_id, name)
+        return await update.message.reply_text(f"🗑️ Profiel '{name}' verwijderd." if ok else f"Geen profiel '{name}'.")
+
+    if action == "list":
+        rows = profiles.list(chat_id)
+        if not rows:
+            return await update.message.reply_text("Nog geen profielen. /profile add <naam> <plaat>|<dd/mm/jjjj>")
+        lines = [
+            f"• {p['name']}: {p['plate']} | {p['first_reg_date']} | stations {','.join(p['stations'])} | "
+            f"{p['window']} wd | standby: {standby.pool.status(chat_id, p['name']) if p['standby'] else 'uit'}"
+            for p in rows
+        ]
+        return await update.message.reply_text("\n".join(lines))
+
+    await update.message.reply_text(
+        "Gebruik: /profile add <naam> <plaat>|<dd/mm/jjjj>[|<stations>][|<werkdagen>], /profile list, /profile del <naam>"
+    )
+
+
+async def standby_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_authorized(update):
+        return await update.message.reply_text("🚫 Geen toegang tot deze bot.")
+    chat_id = update.effective_chat.id
+    args = context.args or []
+    if len(args) != 2 or args[1].lower() not in ("on", "off"):
+        return await update.message.reply_text("Gebruik: /standby <profiel> on|off")
+    name, on = normalize_name(args[0]), args[1].lower() == "on"
+
+    if not profiles.set_standby(chat_id, name, on):
+        return await update.message.reply_text(f"Geen profiel '{name}'.")
+    if not on:
+        await standby.pool.unpark(chat_id, name)
+        return await update.message.reply_text(f"⏸️ Standby voor '{name}' uit.")
+    if not _standby_enabled():
+        return await update.message.reply_text(
+            "ℹ️ Bewaard, maar standby werkt enkel met WORKER_MODE=thread op één worker (zonder LEASE_STORE_URL)."
+        )
+    old = active_tasks.get(chat_id)
+    if old and not old.done():
+        # na de lopende run wordt de sessie geparkeerd
+        return await update.message.reply_text(f"🅿️ Standby voor '{name}' aan; sessie volgt na de huidige run.")
+    if not standby.pool.park(chat_id, profiles.get(chat_id, name)):
+        return await update.message.reply_text(f"⚠️ Standby zit vol (max {standby.pool.max_sessions} sessies).")
+    await update.message.reply_text(f"🅿️ Standby voor '{name}' wordt klaargezet (login, voertuig, station)…")
+
+
+def _apply_settings(chat_id: int, changes: dict) -> dict:
+    """Wijzig de instellingen van de lokale run; geeft de effectief gewijzigde velden terug."""
+    cfg = run_configs.get(chat_id)
+    if not cfg:
+        return {}
+    try:
+        changed = cfg.update(**changes)
+    except ValueError as e:
+        log.warning("Ongeldige instellingen voor chat %s genegeerd: %s", chat_id, e)
+        return {}
+    if not changed:
+        return changed
+    # process-modus: de RunConfig leeft in de worker → wijziging doorsturen
+    worker = worker_pool.pool.get(chat_id)
+    if worker:
+        worker.send(("config", changed))
+    _persist_settings(chat_id, cfg)
+    return changed
+
+
+def _persist_settings(chat_id: int, cfg: RunConfig):
+    run_id = active_runs.get(chat_id)
+    if store and run_id:
+        try:
+            store.set_settings(run_id, cfg.to_dict())
+        except Exception as e:
+            log.warning("Kon instellingen niet bewaren (run=%s): %s", run_id, e)
+
+
+async def set_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not is_authorized(update):
+        return await update.message.reply_text("🚫 Geen toegang tot deze bot.")
+    chat_id = update.effective_chat.id
     task = active_tasks.get(chat_id)
-    if task and not task.done():
-        task.cancel()
+    cfg = run_configs.get(chat_id) if (task and not task.done()) else None
 
-    # 4) onmiddellijke feedback
-    await update.message.reply_text("⏹️ Stopverzoek ontvangen. Ik rond af…")
+    if not context.args:
+        return await update.message.reply_text(
+            f"⚙️ {cfg.summary()}" if cfg else
+            "Geen lopende run. Gebruik tijdens een run: /set venster 5 refresh 20 stations 8,12 boeken on|off"
+        )
+    try:
+        changes = parse_set_args(context.args)
+    except ValueError as e:
+        return await update.message.reply_text(f"❌ {e}")
+    error = _check_input(stations=changes.get("stations"))
+    if error:
+        return await update.message.reply_text(f"❌ {error}")
+    if changes.get("booking") and Config.TEST_MODE:
+        return await update.message.reply_text("🧪 TEST_MODE staat aan: boeken kan niet aangezet worden.")
+
+    if cfg:
+        changed = _apply_settings(chat_id, changes)
+        if coordinator and chat_id in active_keys:
+            # ook in het werkregister, zodat een overname met dezelfde instellingen verdergaat
+            await coordinator.update_settings(active_keys[chat_id], cfg.to_dict())
+        return await update.message.reply_text(
+            f"⚙️ Aangepast, actief vanaf de volgende refresh: {cfg.summary()}" if changed
+            else f"⚙️ Niets gewijzigd: {cfg.summary()}"
+        )
+
+    if coordinator:
+        # run draait op een andere worker → via het werkregister, toegepast bij de volgende heartbeat
+        for key, payload in (await coordinator.work()).items():
+            if payload.get("chat_id") == chat_id and not payload.get("stop"):
+                current = RunConfig.from_dict({
+                    "stations": payload.get("stations"), "window": payload.get("window"),
+                    **(payload.get("settings") or {}),
+                })
+                current.update(**changes)
+                await coordinator.update_settings(key, current.to_dict())
+                return await update.message.reply_text(
+                    f"⚙️ Doorgegeven aan de worker van deze run: {current.summary()}"
+                )
+    await update.message.reply_text("Geen lopende run. /set past een lopende run aan; start er een met /book.")
 
 
 async def book_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -135,147 +600,358 @@ async def book_cmd(update: Update, context: ContextTypes.DEFAULT_TYPE):
     chat_id = update.effective_chat.id
 
     if not context.args:
-        return await update.message.reply_text("Gebruik: /book <nummerplaat>|<dd/mm/jjjj>")
+        return await update.message.reply_text("Gebruik: /book <nummerplaat>|<dd/mm/jjjj> of /book <profiel>")
 
     raw_arg = " ".join(context.args).strip()
-    if "|" not in raw_arg:
-        return await update.message.reply_text("Gebruik: /book <nummerplaat>|<dd/mm/jjjj>")
-
-    plate, first_reg_date = [x.strip() for x in raw_arg.split("|", 1)]
+    stations: List[str] = [str(Config.STATION_ID)]
+    window = Config.DESIRED_BUSINESS_DAYS
+    profile = None
+    if "|" in raw_arg:
+        plate, first_reg_date = [x.strip() for x in raw_arg.split("|", 1)]
+    else:
+        p = profiles.get(chat_id, raw_arg) if profiles else None
+        if not p:
+            return await update.message.reply_text(
+                f"Geen profiel '{raw_arg}'. Gebruik: /book <nummerplaat>|<dd/mm/jjjj> of /profile list"
+            )
+        profile = p["name"]
+        plate, first_reg_date = p["plate"], p["first_reg_date"]
+        stations, window = p["stations"] or stations, p["window"]
 
-    # Reset flags voor nieuwe run
-    Config.STOP_FLAG = False
-    notify_enabled[chat_id] = True
-    _bump_token(chat_id)
+    # tikfouten falen hier in milliseconden, niet pas na driver + login
+    error = _check_input(plate, first_reg_date, stations)
+    if error:
+        return await update.message.reply_text(f"❌ {error}")
 
     # Eén run tegelijk per chat
     old = active_tasks.get(chat_id)
     if old and not old.done():
         return await update.message.reply_text("⏳ Er draait al een run. Gebruik /stop of wacht tot deze klaar is.")
 
-    async def run_flow():
-        bot: Optional[AIBVBookingBot] = None
-        try:
-            active_status[chat_id] = "driver"
-            bot = AIBVBookingBot()
-            active_bots[chat_id] = bot
-
-            notify = make_notifier(context, chat_id)
-            bot.set_notifier(notify)
-
-            # --- Selenium in thread ---
-            await asyncio.to_thread(bot.setup_driver)
-
-            active_status[chat_id] = "login"
-            if Config.STOP_FLAG:
-                return
-            await asyncio.to_thread(bot.login)
-
-            active_status[chat_id] = "voertuig"
-            if Config.STOP_FLAG:
-                return
-            await asyncio.to_thread(bot.select_vehicle, plate, first_reg_date)
-
-            active_status[chat_id] = "station"
-            if Config.STOP_FLAG:
-                return
-            try:
-                await asyncio.to_thread(bot.select_station)
-            except RuntimeError as e:
-                await context.bot.send_message(chat_id=chat_id, text=(
-                    f"❌ Kan niet verder: {e}\n(Er is waarschijnlijk al een reservatie voor dit voertuig.)"
-                ))
-                return
-
-            active_status[chat_id] = "monitor"
-            await context.bot.send_message(
-                chat_id=chat_id,
-                text=(
-                    f"🕑 Monitor gestart. Venster: {Config.DESIRED_BUSINESS_DAYS} werkdagen. "
-                    f"Refresh elke {Config.REFRESH_DELAY}s. "
-                    f"{'🧪 TEST_MODE: er wordt niet echt geboekt.' if (Config.TEST_MODE or not Config.BOOKING_ENABLED) else '🟢 Boeken ingeschakeld.'}\n"
-                    "⏱️ Geen tijdslimiet: ik zoek door tot /stop of succes."
-                )
-            )
+    if coordinator:
+        # updates lopen gelijktijdig → check en submit per chat niet laten overlappen
+        async with submit_locks.setdefault(chat_id, asyncio.Lock()):
+            work = await coordinator.work()
+            if any(p.get("chat_id") == chat_id and not p.get("stop") for p in work.values()):
+                return await update.message.reply_text("⏳ Er draait al een run. Gebruik /stop of wacht tot deze klaar is.")
+            # naar het werkregister; de eerste worker met capaciteit claimt hem
+            await coordinator.submit(f"run:{chat_id}:{uuid.uuid4().hex[:8]}", {
+                "chat_id": chat_id, "plate": plate, "first_reg_date": first_reg_date,
+                "stations": stations, "window": window,
+            })
+        if chat_id not in active_keys:
+            await update.message.reply_text("📨 Run ingepland; een vrije worker neemt hem op.")
+        return
+
+    start_run(context.bot, chat_id, plate, first_reg_date, stations=stations, window=window, profile=profile)
+
+
+def start_run(tg: Bot, chat_id: int, plate: str, first_reg_date: str,
+              run_id: Optional[int] = None, work_key: Optional[str] = None,
+              stations: Optional[List[str]] = None, window: Optional[int] = None,
+              profile: Optional[str] = None, settings: Optional[dict] = None) -> asyncio.Task:
+    """Start (of hervat, met bestaande run_id) een run voor deze chat."""
+    # Reset flags voor nieuwe run
+    notify_enabled[chat_id] = True
+    _bump_token(chat_id)
 
-            result = await asyncio.to_thread(bot.monitor_and_book)
+    # eigen instellingen voor deze run: defaults, profiel en eerdere /set's (hervatten/overname)
+    settings = settings or {}
+    cfg = RunConfig(settings.get("stations") or stations, settings.get("window") or window,
+                    settings.get("interval"), settings.get("booking"))
+    run_configs[chat_id] = cfg
+    # gecoördineerd: het werkregister is de bron (overname, stop); een lokale rij zou
+    # bij een handover op 'running' blijven staan en later onterecht hervat worden
+    if store and run_id is None and not coordinator:
+        run_id = store.create(chat_id, plate, first_reg_date, stations=cfg.stations, window=cfg.window,
+                              settings=cfg.to_dict())
+    if run_id:
+        active_runs[chat_id] = run_id
+
+    drive = _drive_process if Config.WORKER_MODE == "process" else _drive_thread
 
+    async def run_flow():
+        counters = asyncio.create_task(_persist_counters(chat_id, run_id)) if (store and run_id) else None
+        try:
+            result = await drive(tg, chat_id, plate, first_reg_date, cfg, profile)
             ok = bool(result.get("success")) if isinstance(result, dict) else bool(result)
-            if ok:
-                label = result.get("slot") if isinstance(result, dict) else ""
-                extra = " (niet bevestigd: BOOKING_ENABLED=false)" if (isinstance(result, dict) and result.get("booking_disabled")) else ""
-                await context.bot.send_message(chat_id=chat_id, text=f"🎉 Resultaat: ✅ gelukt {label}{extra}")
-            else:
-                if isinstance(result, dict) and result.get("stopped"):
-                    await context.bot.send_message(chat_id=chat_id, text="⏹️ Gestopt op verzoek.")
-                else:
-                    err = (result or {}).get("error") if isinstance(result, dict) else None
-                    await context.bot.send_message(chat_id=chat_id, text=f"❌ Resultaat: niet gelukt. {f'Reden: {err}' if err else ''}")
-
+            stopped = isinstance(result, dict) and result.get("stopped")
+            _finish_run(chat_id, run_store.STOPPED if stopped else (run_store.FINISHED if ok else run_store.FAILED))
+            await _report_result(tg, chat_id, result)
         except asyncio.CancelledError:
+            # /stop heeft de run al afgesloten; bij shutdown blijft ze 'running' → hervat na herstart
             raise
+        except RunCancelled:
+            _finish_run(chat_id, run_store.STOPPED)
+            log.info("Run gestopt (chat=%s, stap=%s)", chat_id, active_status.get(chat_id, "?"))
         except Exception as e:
-            # Context meegeven zodat we snel weten wáár het is misgegaan
-            step = active_status.get(chat_id, "?")
-            url = title = ""
-            try:
-                if bot and bot.driver:
-                    url = bot.driver.current_url or ""
-                    title = bot.driver.title or ""
-            except Exception:
-                pass
+            step = getattr(e, "step", None) or active_status.get(chat_id, "?")
+            url = getattr(e, "url", "")
+            title = getattr(e, "title", "")
+            _finish_run(chat_id, run_store.FAILED, f"{step}: {e}")
 
             log.exception("Fout in booking runner (stap=%s)", step)
             msg = f"⚠️ Fout in stap **{step}**: {e}\n"
             if url or title:
                 msg += f"URL: {url}\nTitel: {title}"
             try:
-                await context.bot.send_message(chat_id=chat_id, text=msg, disable_web_page_preview=True)
+                await tg.send_message(chat_id=chat_id, text=msg, disable_web_page_preview=True)
             except Exception:
                 pass
+            dump = getattr(e, "dump", None)
+            if dump:
+                try:
+                    with open(dump, "rb") as fh:
+                        await tg.send_document(
+                            chat_id=chat_id, document=fh, filename=dump.rsplit("/", 1)[-1],
+                            caption="🧾 Laatste paginatoestanden (flight recorder)",
+                        )
+                except Exception as send_err:
+                    log.warning("Kon flight recorder niet versturen (%s): %s", dump, send_err)
         finally:
-            active_status[chat_id] = "opruimen"
-            try:
-                if bot:
-                    await asyncio.to_thread(bot.close)
-            except Exception:
-                pass
-            active_bots.pop(chat_id, None)
+            if counters:
+                counters.cancel()
             active_status[chat_id] = "idle"
+            if run_configs.get(chat_id) is cfg:
+                run_configs.pop(chat_id, None)
+            if coordinator and work_key:
+                if active_keys.get(chat_id) == work_key:
+                    active_keys.pop(chat_id, None)
+                await coordinator.finished(work_key)
 
     task = asyncio.create_task(run_flow())
     active_tasks[chat_id] = task
+    return task
+
+
+async def resume_runs(tg: Bot):
+    """Hervat na een herstart alle niet-afgeronde runs, gespreid in de tijd."""
+    if not store:
+        return
+    runs = store.unfinished()
+    if runs:
+        log.info("%d run(s) te hervatten (spreiding %ss)", len(runs), Config.RESUME_STAGGER_SECONDS)
+    for i, run in enumerate(runs):
+        if i:
+            await asyncio.sleep(Config.RESUME_STAGGER_SECONDS)
+        chat_id = int(run["chat_id"])
+        old = active_tasks.get(chat_id)
+        if old and not old.done():
+            # intussen al een nieuwe run gestart → de oude niet meer hervatten
+            store.finish(run["id"], run_store.STOPPED, "vervangen door nieuwe run")
+            continue
+        store.mark_resumed(run["id"])
+        start_run(tg, chat_id, run["plate"], run["first_reg_date"], run_id=run["id"],
+                  stations=run["stations"], window=run["window"], settings=run.get("settings"))
+        try:
+            await tg.send_message(chat_id=chat_id, text=(
+                f"♻️ Je run voor {run['plate']} is hervat na een herstart "
+                f"(laatste stap: {run['step']})."
+            ))
+        except Exception as e:
+            log.warning("Kon hervat-melding niet sturen (chat=%s): %s", chat_id, e)
+
+
+def _make_coordinator(app) -> Coordinator:
+    def start(key: str, payload: dict):
+        chat_id = int(payload["chat_id"])
+        active_keys[chat_id] = key
+        start_run(app.bot, chat_id, payload["plate"], payload["first_reg_date"], work_key=key,
+                  stations=payload.get("stations"), window=payload.get("window"),
+                  settings=payload.get("settings"))
+        if int(payload.get("claims", 1)) > 1:
+            app.create_task(app.bot.send_message(chat_id=chat_id, text=(
+                f"♻️ Je run voor {payload['plate']} is overgenomen door een andere worker en loopt verder."
+            )))
+
+    async def stop(key: str, handover: bool):
+        for chat_id, k in list(active_keys.items()):
+            if k == key:
+                await _stop_local(chat_id, handover=handover)
+
+    async def frontend(active: bool):
+        if active and not app.updater.running:
+            await app.updater.start_polling(allowed_updates=None)
+            log.info("Telegram-polling gestart op deze worker")
+        elif not active and app.updater.running:
+            await app.updater.stop()
+            log.info("Telegram-polling gestopt op deze worker")
+
+    def settings(key: str, changes: dict):
+        # /set op een andere worker voor een run die hier draait
+        for chat_id, k in list(active_keys.items()):
+            if k == key:
+                _apply_settings(chat_id, changes)
+
+    return Coordinator(open_lease_store(Config.LEASE_STORE_URL), start_run=start, stop_run=stop,
+                       on_frontend=frontend, on_settings=settings)
+
+
+async def _run_coordinated(app):
+    """Meerdere workers: leases bepalen wie pollt en welke runs hier draaien."""
+    global coordinator
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    async with app:
+        await app.start()
+        log.info("Boot-to-ready: %.2fs", time.perf_counter() - _BOOT)
+        loop.run_in_executor(None, _warm_up)
+        if Config.RUNNER_STATS_SECONDS > 0:
+            asyncio.create_task(_stats_loop(Config.RUNNER_STATS_SECONDS))
+        coordinator = _make_coordinator(app)
+        try:
+            await coordinator.run(stop)
+        finally:
+            if app.updater.running:
+                await app.updater.stop()
+            await app.stop()
+            coordinator.store.close()
+
+
+def _warm_up():
+    """Na het opstarten op de achtergrond: selenium laden en chromedriver resolven."""
+    if Config.BOT_FACTORY:
+        return  # andere controller (bv. loadtest) → geen selenium nodig
+    started = time.perf_counter()
+    try:
+        importlib.import_module("selenium_controller")
+        driver_path = os.environ.get("CHROMEDRIVER_PATH")
+        if not (driver_path and os.path.exists(driver_path)):
+            from driver_cache import resolve_chromedriver
+            resolve_chromedriver()
+    except Exception as e:
+        log.warning("Warm-up mislukt (eerste run doet het alsnog): %s", e)
+        return
+    log.info("Warm-up klaar in %.2fs (selenium + chromedriver)", time.perf_counter() - started)
+
+
+async def _stats_loop(every: float, tick: float = 0.1):
+    """Elke `every` seconden een STATS-regel (JSON) in de log, o.a. voor load_harness.py."""
+    lag_max = 0.0
+    next_report = time.monotonic() + every
+    while True:
+        before = time.monotonic()
+        await asyncio.sleep(tick)
+        lag_max = max(lag_max, time.monotonic() - before - tick)
+        if time.monotonic() < next_report:
+            continue
+        next_report += every
+        log.info("STATS %s", json.dumps({
+            "loop_lag_ms": round(lag_max * 1000, 1),
+            "notify_pending": notify_stats["pending"],
+            "notify_sent": notify_stats["sent"],
+            "notify_dropped": notify_stats["dropped"],
+            "notify_failed": notify_stats["failed"],
+            "runs": sum(1 for t in active_tasks.values() if not t.done()),
+            "notify_locks": len(notify_locks),
+            "run_tokens": len(run_tokens),
+            "tasks": len(asyncio.all_tasks()),
+            "threads": threading.active_count(),
+            "rss_mb": proctools.rss_bytes(os.getpid()) // (1024 * 1024),
+        }))
+        lag_max = 0.0
+
+
+def startup_profile() -> int:
+    """`--startup-profile`: meet import- en initialisatietijden en stop."""
+    rows = []
+
+    def measure(label: str, fn):
+        t = time.perf_counter()
+        try:
+            fn()
+            rows.append((label, time.perf_counter() - t, "ok"))
+        except Exception as e:
+            rows.append((label, time.perf_counter() - t, f"fout: {e}"))
+
+    rows.append(("boot → runner geladen", time.perf_counter() - _BOOT, "ok"))
+    measure("import telegram (PTB)", lambda: __import__("telegram.ext"))
+    measure("import selenium_controller", lambda: __import__("selenium_controller"))
+    measure("chromedriver resolven", lambda: __import__("driver_cache").resolve_chromedriver())
+    measure("chromedriver resolven (2e keer)", lambda: __import__("driver_cache").resolve_chromedriver())
+    measure("run store openen", lambda: run_store.RunStore().close())
+    measure("Telegram Application bouwen", lambda: _build_app())
+    rows.append(("totaal boot-to-ready", time.perf_counter() - _BOOT, "ok"))
+
+    width = max(len(r[0]) for r in rows)
+    print("⏱️ Startup-profiel")
+    for label, dt, status in rows:
+        print(f"  {label:<{width}}  {dt * 1000:8.1f} ms  {status}")
+    return 0
+
+
+def _build_app(post_init=None, post_shutdown=None):
+    # profiel werkt ook zonder echte token
+    return telegram_frontend.build_app(Config.TELEGRAM_TOKEN or "0:profile", post_init, post_shutdown)
 
 
 def main():
+    if "--startup-profile" in sys.argv[1:]:
+        sys.exit(startup_profile())
+
     # Reset stop-flag bij opstart
     Config.STOP_FLAG = False
-    log.info(
-        "[CONFIG] TEST_MODE=%s BOOKING_ENABLED=%s STATION_ID=%s TELEGRAM_CHAT_IDS=%s DESIRED_BD=%s",
-        Config.TEST_MODE, Config.BOOKING_ENABLED, Config.STATION_ID, TELEGRAM_CHAT_IDS, Config.DESIRED_BUSINESS_DAYS
-    )
+    log.info(config_summary())
 
-    app = ApplicationBuilder().token(Config.TELEGRAM_TOKEN).rate_limiter(AIORateLimiter()).build()
+    global store, profiles
+    store = run_store.RunStore()
+    profiles = ProfileStore()
 
-    # (optioneel) ping bij opstart naar eerste admin-id
-    try:
-        admin_id = int(TELEGRAM_CHAT_IDS[0])
-        async def _ping(_app):
-            try:
-                await _app.bot.send_message(chat_id=admin_id, text="✅ Bot online (polling actief).")
-            except Exception as e:
-                log.warning("Kon start-ping niet sturen: %s", e)
-        app.post_init(_ping)
-    except Exception:
-        pass
+    from telegram.ext import CommandHandler
+
+    async def _post_init(_app):
+        log.info("Boot-to-ready: %.2fs", time.perf_counter() - _BOOT)
+        # selenium + chromedriver alvast klaarzetten, zodat de eerste /book niet wacht
+        asyncio.get_running_loop().run_in_executor(None, _warm_up)
+        if Config.RUNNER_STATS_SECONDS > 0:
+            asyncio.create_task(_stats_loop(Config.RUNNER_STATS_SECONDS))
+        # (optioneel) ping bij opstart naar eerste admin-id
+        try:
+            admin_id = int(TELEGRAM_CHAT_IDS[0])
+            await _app.bot.send_message(chat_id=admin_id, text=f"✅ Bot online ({telegram_frontend.mode_label()} actief).")
+        except Exception as e:
+            log.warning("Kon start-ping niet sturen: %s", e)
+        # niet-afgeronde runs van vóór de herstart gespreid hervatten
+        asyncio.create_task(resume_runs(_app.bot))
+        # standby-sessies van bewaarde profielen opnieuw klaarzetten
+        if _standby_enabled():
+            standby.pool.notify = lambda chat_id, text: _app.bot.send_message(chat_id=chat_id, text=text)
+            for p in profiles.standby():
+                standby.pool.park(int(p["chat_id"]), p)
+
+    async def _post_shutdown(_app):
+        await standby.pool.shutdown()
+
+    app = _build_app(_post_init, _post_shutdown)
 
     app.add_handler(CommandHandler("help", help_cmd))
     app.add_handler(CommandHandler("whoami", whoami_cmd))
     app.add_handler(CommandHandler("status", status_cmd))
     app.add_handler(CommandHandler("stop", stop_cmd))
     app.add_handler(CommandHandler("book", book_cmd))
+    app.add_handler(CommandHandler("profile", profile_cmd))
+    app.add_handler(CommandHandler("standby", standby_cmd))
+    app.add_handler(CommandHandler("set", set_cmd))
 
-    app.run_polling(allowed_updates=None)
+    try:
+        if Config.LEASE_STORE_URL:
+            # runs komen uit het gedeelde werkregister, niet uit de lokale resume;
+            # de frontend-lease wisselt van worker, dus hier altijd polling
+            if Config.TELEGRAM_MODE == "webhook":
+                log.warning("TELEGRAM_MODE=webhook wordt genegeerd met LEASE_STORE_URL (frontend-lease pollt)")
+            asyncio.run(_run_coordinated(app))
+        else:
+            telegram_frontend.run(app)
+    finally:
+        worker_pool.pool.shutdown()
+        store.close()
+        profiles.close()
 
 
 if __name__ == "__main__":
@@ -2,27 +2,55 @@
 # -*- coding: utf-8 -*-
 
 """
-Eenvoudige end-to-end test voor de AIBVBookingBot.
+End-to-end test en batch-runner voor de AIBVBookingBot.
 
 Gebruik:
   python test_booking.py
   python test_booking.py --plate 1PFE128 --first-reg 17/02/2016
+  python test_booking.py --batch vloot.csv --workers 4 --max-minutes 15
+
+Batch:
+  - CSV (kolommen plate, first_reg_date, stations, window) of JSON (lijst van
+    objecten met dezelfde sleutels). stations: "8,12" of een lijst; window en
+    stations zijn optioneel (STATION_ID / DESIRED_BUSINESS_DAYS).
+  - Hoogstens --workers bots tegelijk. Elke worker logt één keer in en doet
+    daarna voertuig na voertuig in dezelfde sessie.
+  - Per voertuig één JSON-regel op stdout (status, slot, timings per stap);
+    voortgang en samenvatting op stderr. Als laatste een JSON-regel met de
+    batch-samenvatting en throughput.
+  - Exit status: 0 = alles gelukt, 1 = deels mislukt, 3 = niets gelukt
+    (2 = ongeldige invoer).
 
 Tip:
   - In TEST_MODE (aanbevolen lokaal) wordt nooit definitief geboekt.
   - Zet BOOKING_ENABLED=false in je .env voor veilige tests.
+  - Met BROWSER_MODE=shared delen de workers één Chrome (één tab per worker).
 """
 
 import os
 import sys
+import csv
+import json
+import time
+import queue
 import argparse
-from selenium_controller import AIBVBookingBot
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from selenium_controller import AIBVBookingBot, RunCancelled
 from config import Config
+import metadata_cache
+
+EXIT_OK = 0
+EXIT_PARTIAL = 1
+EXIT_INPUT = 2
+EXIT_ALL_FAILED = 3
 
 
 def parse_args():
     parser = argparse.ArgumentParser(
-        description="Lokale test voor AIBVBookingBot (Selenium)."
+        description="Lokale test en batch-runner voor AIBVBookingBot (Selenium)."
     )
     parser.add_argument(
         "--plate",
@@ -41,6 +69,23 @@ def parse_args():
         default=int(os.getenv("STATION_ID", getattr(Config, "STATION_ID", 8))),
         help="Station ID (numeric). Valt terug op Config.STATION_ID of 8.",
     )
+    parser.add_argument(
+        "--batch",
+        metavar="BESTAND",
+        help="CSV- of JSON-bestand met voertuigen; zonder deze optie één voertuig.",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=2,
+        help="Aantal bots tegelijk in batch-modus (standaard 2).",
+    )
+    parser.add_argument(
+        "--max-minutes",
+        type=float,
+        default=10.0,
+        help="Maximale monitortijd per voertuig in batch-modus (standaard 10).",
+    )
     return parser.parse_args()
 
 
@@ -57,14 +102,235 @@ def pretty_print_result(result: dict):
             print(f"{key}: {result[key]}")
 
 
+# ---------------- Batch: invoer ----------------
+def _stations(value: Any) -> List[str]:
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = str(value or "").replace(";", ",").split(",")
+    return [str(s).strip() for s in items if str(s).strip()] or [str(Config.STATION_ID)]
+
+
+def load_vehicles(path: str) -> List[Dict[str, Any]]:
+    """Lees en valideer de voertuigen uit een CSV- of JSON-bestand."""
+    with open(path, encoding="utf-8-sig") as fh:
+        if path.lower().endswith(".json"):
+            rows = json.load(fh)
+            if isinstance(rows, dict):
+                rows = rows.get("vehicles") or []
+        else:
+            rows = list(csv.DictReader(fh))
+
+    vehicles = []
+    for i, row in enumerate(rows, 1):
+        row = {str(k).strip().lower(): v for k, v in row.items() if k}
+        plate = str(row.get("plate") or "").strip()
+        first_reg = str(row.get("first_reg_date") or row.get("first_reg") or "").strip()
+        if not plate or not first_reg:
+            raise ValueError(f"rij {i}: plate en first_reg_date zijn verplicht")
+        try:
+            datetime.strptime(first_reg, "%d/%m/%Y")
+        except ValueError:
+            raise ValueError(f"rij {i}: first_reg_date '{first_reg}' is geen dd/mm/jjjj")
+        window = row.get("window")
+        try:
+            window = int(window) if str(window or "").strip() else Config.DESIRED_BUSINESS_DAYS
+        except ValueError:
+            raise ValueError(f"rij {i}: window '{window}' is geen getal")
+        stations = _stations(row.get("stations"))
+        errors = metadata_cache.cache().check_stations(stations)
+        if errors:
+            raise ValueError(f"rij {i}: {'; '.join(errors)}")
+        vehicles.append({
+            "plate": plate, "first_reg_date": first_reg, "stations": stations, "window": window,
+        })
+    return vehicles
+
+
+# ---------------- Batch: uitvoering ----------------
+class _Timed:
+    """Meet de duur van een stap in timings[naam]."""
+
+    def __init__(self, timings: Dict[str, float], name: str):
+        self.timings, self.name = timings, name
+
+    def __enter__(self):
+        self.t = time.monotonic()
+
+    def __exit__(self, *exc):
+        self.timings[self.name] = round(time.monotonic() - self.t, 2)
+        return False
+
+
+def run_vehicle(bot: Optional[AIBVBookingBot], vehicle: Dict[str, Any], max_seconds: float):
+    """
+    Verwerk één voertuig. Geeft (resultaat, bot) terug; de bot blijft ingelogd
+    voor het volgende voertuig, of is None als hij na een fout gesloten werd.
+    """
+    started = time.monotonic()
+    timings: Dict[str, float] = {}
+    out = dict(vehicle, status="error", slot=None, error=None, login_reused=False)
+    timer = None
+    try:
+        if bot is not None and bot.logged_in:
+            out["login_reused"] = True
+            with _Timed(timings, "login"):
+                bot.supervised(bot.back_to_start)
+        else:
+            bot = bot or AIBVBookingBot()
+            with _Timed(timings, "driver"):
+                bot.supervised(bot.setup_driver)
+            with _Timed(timings, "login"):
+                bot.supervised(bot.login)
+        bot.stations = vehicle["stations"]
+        bot.business_days = vehicle["window"]
+
+        with _Timed(timings, "vehicle"):
+            bot.supervised(bot.select_vehicle, vehicle["plate"], vehicle["first_reg_date"])
+        try:
+            with _Timed(timings, "station"):
+                bot.supervised(bot.select_station)
+        except RuntimeError as e:
+            out.update(status="blocked", error=str(e))
+            return out, bot
+
+        # per voertuig een tijdslimiet; daarna stopvlag weer wissen voor het volgende voertuig
+        timer = threading.Timer(max_seconds, bot.request_stop)
+        timer.daemon = True
+        timer.start()
+        with _Timed(timings, "monitor"):
+            result = bot.monitor_and_book()
+        if result.get("success"):
+            out.update(status="found" if result.get("booking_disabled") else "booked", slot=result.get("slot"))
+        elif result.get("stopped"):
+            out["status"] = "stopped" if Config.STOP_FLAG else "timeout"
+        else:
+            out["error"] = result.get("error")
+    except RunCancelled:
+        out["status"] = "stopped" if Config.STOP_FLAG else "timeout"
+    except Exception as e:
+        out["error"] = f"{bot.step if bot else 'driver'}: {e}"
+        if bot:
+            # onbekende toestand → volgende voertuig met een verse browser
+            bot.close()
+            bot.recorder.close()
+            bot = None
+    finally:
+        if timer:
+            timer.cancel()
+        if bot and not Config.STOP_FLAG:
+            bot.stop_event.clear()
+        timings["total"] = round(time.monotonic() - started, 2)
+        out["timings"] = timings
+    return out, bot
+
+
+def _worker(no: int, jobs: "queue.Queue[Dict[str, Any]]", emit: Callable[[Dict[str, Any]], None],
+            bots: Dict[int, AIBVBookingBot], max_seconds: float):
+    bot = None
+    try:
+        while not Config.STOP_FLAG:
+            try:
+                vehicle = jobs.get_nowait()
+            except queue.Empty:
+                return
+            result, bot = run_vehicle(bot, vehicle, max_seconds)
+            if bot:
+                bots[no] = bot
+            else:
+                bots.pop(no, None)
+            emit(dict(result, worker=no))
+    finally:
+        bots.pop(no, None)
+        if bot:
+            bot.close()
+            bot.recorder.close()
+
+
+def run_batch(vehicles: List[Dict[str, Any]], workers: int, max_minutes: float) -> int:
+    jobs: "queue.Queue[Dict[str, Any]]" = queue.Queue()
+    for v in vehicles:
+        jobs.put(v)
+    results: List[Dict[str, Any]] = []
+    out_lock = threading.Lock()
+    bots: Dict[int, AIBVBookingBot] = {}
+
+    def emit(result: Dict[str, Any]):
+        with out_lock:
+            results.append(result)
+            print(json.dumps(result, ensure_ascii=False), flush=True)
+            print(f"[{len(results)}/{len(vehicles)}] {result['plate']}: {result['status']} "
+                  f"({result['timings']['total']:.0f}s)", file=sys.stderr, flush=True)
+
+    workers = max(1, min(workers, len(vehicles)))
+    print(f"🚗 Batch: {len(vehicles)} voertuigen, {workers} workers, max {max_minutes:g} min per voertuig",
+          file=sys.stderr, flush=True)
+    started = time.monotonic()
+    threads = [
+        threading.Thread(target=_worker, args=(i, jobs, emit, bots, max_minutes * 60), name=f"batch-{i}", daemon=True)
+        for i in range(1, workers + 1)
+    ]
+    for t in threads:
+        t.start()
+    try:
+        for t in threads:
+            while t.is_alive():
+                t.join(0.5)
+    except KeyboardInterrupt:
+        print("⏹️ Onderbroken → lopende voertuigen stoppen…", file=sys.stderr, flush=True)
+        Config.STOP_FLAG = True
+        for bot in list(bots.values()):
+            bot.request_stop()
+        for t in threads:
+            t.join(30)
+
+    # niet meer aan de beurt gekomen
+    while not jobs.empty():
+        emit(dict(jobs.get_nowait(), status="skipped", slot=None, error=None, worker=None,
+                  login_reused=False, timings={"total": 0.0}))
+
+    elapsed = time.monotonic() - started
+    ok = sum(1 for r in results if r["status"] in ("booked", "found"))
+    failed = len(results) - ok
+    by_status: Dict[str, int] = {}
+    for r in results:
+        by_status[r["status"]] = by_status.get(r["status"], 0) + 1
+    summary = {
+        "summary": True, "vehicles": len(vehicles), "succeeded": ok, "failed": failed,
+        "by_status": by_status, "workers": workers,
+        "logins_reused": sum(1 for r in results if r.get("login_reused")),
+        "elapsed_s": round(elapsed, 1),
+        "throughput_per_hour": round(len(results) / elapsed * 3600, 1) if elapsed > 0 else 0.0,
+    }
+    print(json.dumps(summary, ensure_ascii=False), flush=True)
+    print(f"— Batch klaar: {ok} gelukt, {failed} niet, {elapsed:.0f}s "
+          f"({summary['throughput_per_hour']} voertuigen/uur)", file=sys.stderr, flush=True)
+
+    if failed == 0:
+        return EXIT_OK
+    return EXIT_ALL_FAILED if ok == 0 else EXIT_PARTIAL
+
+
 def main():
     args = parse_args()
 
+    if args.batch:
+        try:
+            vehicles = load_vehicles(args.batch)
+        except (OSError, ValueError) as e:
+            print(f"❌ Ongeldige batch: {e}", file=sys.stderr)
+            sys.exit(EXIT_INPUT)
+        if not vehicles:
+            print("❌ Geen voertuigen in de batch.", file=sys.stderr)
+            sys.exit(EXIT_INPUT)
+        sys.exit(run_batch(vehicles, args.workers, args.max_minutes))
+
     print("🤖 AIBV Jaarlijkse BOOKING TEST (lokaal)")
     print(f"TEST_MODE={os.getenv('TEST_MODE', 'true')}  BOOKING_ENABLED={os.getenv('BOOKING_ENABLED', 'false')}")
     print(f"Gebruikte gegevens: plate={args.plate}  first_reg={args.first_reg}  station_id={args.station_id}")
 
     bot = AIBVBookingBot()
+    bot.stations = [str(args.station_id)]
 
     try:
         bot.setup_driver()
@@ -72,14 +338,8 @@ def main():
         # Nieuwe correcte call (bestaat in selenium_controller):
         bot.select_vehicle(args.plate, args.first_reg)
 
-        # Indien jouw implementatie een aparte stationselectie vereist:
-        # Sommige versies gebruiken Config.STATION_ID intern; we geven het hier
-        # expliciet mee als jouw select_station signature dit ondersteunt.
-        try:
-            bot.select_station(args.station_id)
-        except TypeError:
-            # Backwards compat: oudere signature zonder argumenten
-            bot.select_station()
+        # Het station komt uit bot.stations (hierboven op --station-id gezet)
+        bot.select_station()
 
         result = bot.monitor_and_book()
         if not isinstance(result, dict):
@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Globaal request-budget tegenover planning.aibv.be.
+
+Alle page loads, refreshes en postbacks van alle runs in dit proces halen eerst
+een token uit één gedeelde token bucket (THROTTLE_RATE per seconde, burst
+THROTTLE_BURST). Wachten er meerdere runs, dan krijgt de run met het laagste
+gewogen verbruik van de laatste minuut voorrang; runs waarvan het venster het
+dichtst bij zijn deadline ligt wegen zwaarder. Optioneel geldt het budget voor
+de hele cluster via een Redis-teller per seconde (THROTTLE_CLUSTER_URL).
+"""
+
+import itertools
+import logging
+import math
+import threading
+import time
+from collections import defaultdict, deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from config import Config
+
+log = logging.getLogger("AIBV-Throttle")
+
+_DAY = 86400.0
+_WINDOW = 60.0          # fair share wordt over de laatste minuut berekend
+_HORIZON_DAYS = 7.0     # deadlines verder dan dit krijgen geen extra gewicht
+
+
+class _Waiter:
+    __slots__ = ("run_id", "deadline", "seq")
+
+    def __init__(self, run_id: str, deadline: Optional[float], seq: int):
+        self.run_id = run_id
+        self.deadline = deadline
+        self.seq = seq
+
+
+class RequestBudget:
+    def __init__(self, rate: Optional[float] = None, burst: Optional[int] = None,
+                 cluster_url: Optional[str] = None):
+        self.rate = float(rate if rate is not None else Config.THROTTLE_RATE)
+        self.burst = float(burst if burst is not None else Config.THROTTLE_BURST)
+        self._tokens = self.burst
+        self._last = time.monotonic()
+        self._cond = threading.Condition()
+        self._waiters: List[_Waiter] = []
+        self._seq = itertools.count()
+        self._recent: Dict[str, Deque[float]] = defaultdict(deque)
+        self._cluster = _ClusterCounter(cluster_url) if cluster_url else None
+
+        # statistiek
+        self.granted: Dict[str, int] = defaultdict(int)
+        self.throttled = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    # ---------------- Intern ----------------
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+        self._last = now
+
+    def _share(self, w: _Waiter, now: float) -> float:
+        """Gewogen verbruik: lager = eerder aan de beurt."""
+        recent = self._recent[w.run_id]
+        while recent and now - recent[0] > _WINDOW:
+            recent.popleft()
+        weight = 1.0
+        if w.deadline is not None:
+            days_left = max(0.0, (w.deadline - time.time()) / _DAY)
+            weight += max(0.0, _HORIZON_DAYS - days_left)
+        return len(recent) / weight
+
+    def _prune(self):
+        """Runs zonder request in het laatste venster vergeten (lopen ze nog, dan komen ze gewoon terug)."""
+        if len(self._recent) <= len(self._waiters) + 8:
+            return
+        now = time.monotonic()
+        waiting = {w.run_id for w in self._waiters}
+        for run_id in [r for r, q in self._recent.items() if r not in waiting and (not q or now - q[-1] > _WINDOW)]:
+            del self._recent[run_id]
+
+    def _next(self) -> Optional[_Waiter]:
+        if not self._waiters:
+            return None
+        now = time.monotonic()
+        return min(self._waiters, key=lambda w: (self._share(w, now), w.seq))
+
+    # ---------------- API ----------------
+    def acquire(self, run_id: str, kind: str = "request", deadline: Optional[float] = None,
+                cancelled: Optional[Callable[[], bool]] = None) -> Optional[float]:
+        """
+        Blokkeer tot er budget is voor één request. Geeft de wachttijd in seconden
+        terug, of None als `cancelled()` intussen True werd.
+        """
+        start = time.monotonic()
+        w = _Waiter(run_id, deadline, next(self._seq))
+        with self._cond:
+            self._waiters.append(w)
+            try:
+                while True:
+                    if cancelled and cancelled():
+                        return None
+                    self._refill()
+                    if self._tokens >= 1 and self._next() is w:
+                        self._tokens -= 1
+                        self._recent[run_id].append(time.monotonic())
+                        self._prune()
+                        break
+                    wait = (1 - self._tokens) / self.rate if self._tokens < 1 else 0.05
+                    self._cond.wait(timeout=min(max(wait, 0.01), 0.5))
+            finally:
+                self._waiters.remove(w)
+                self._cond.notify_all()
+
+        if self._cluster:
+            while not self._cluster.try_take(self.rate):
+                if cancelled and cancelled():
+                    return None
+                time.sleep(self._cluster.until_next(self.rate))
+
+        waited = time.monotonic() - start
+        with self._cond:
+            self.granted[kind] += 1
+            if waited > 0.01:
+                self.throttled += 1
+                self.wait_total += waited
+                self.wait_max = max(self.wait_max, waited)
+        return waited
+
+    def forget(self, run_id: str):
+        """Run afgelopen: zijn verbruik telt niet meer mee."""
+        with self._cond:
+            self._recent.pop(run_id, None)
+
+    def stats(self) -> Dict[str, object]:
+        with self._cond:
+            self._refill()
+            total = sum(self.granted.values())
+            return {
+                "requests": total,
+                "per_kind": dict(self.granted),
+                "throttled": self.throttled,
+                "wait_total_s": round(self.wait_total, 1),
+                "wait_avg_s": round(self.wait_total / self.throttled, 2) if self.throttled else 0.0,
+                "wait_max_s": round(self.wait_max, 2),
+                "tokens": round(self._tokens, 2),
+                "waiting": len(self._waiters),
+            }
+
+    def summary(self) -> str:
+        s = self.stats()
+        return (
+            f"{s['requests']} requests ({self.rate:g}/s, burst {self.burst:g}), "
+            f"{s['throttled']} afgeremd, wacht gem {s['wait_avg_s']}s max {s['wait_max_s']}s, "
+            f"{s['waiting']} wachtend"
+        )
+
+
+class _ClusterCounter:
+    """Vast venster per seconde in Redis, gedeeld door alle workers."""
+
+    def __init__(self, url: str, prefix: str = "aibv:budget:"):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError("THROTTLE_CLUSTER_URL vereist het pakket 'redis' (pip install redis)")
+        self._r = redis.Redis.from_url(url)
+        self._prefix = prefix
+
+    @staticmethod
+    def _window(rate: float) -> int:
+        # onder 1/s een langer venster met 1 request, zodat 0.5/s ook echt 0.5/s blijft
+        return max(1, math.ceil(1.0 / rate)) if rate > 0 else 1
+
+    def until_next(self, rate: float) -> float:
+        window = self._window(rate)
+        return window - (time.time() % window)
+
+    def try_take(self, rate: float) -> bool:
+        window = self._window(rate)
+        key = f"{self._prefix}{window}:{int(time.time() // window)}"
+        try:
+            pipe = self._r.pipeline()
+            pipe.incr(key)
+            pipe.expire(key, window + 5)
+            count = pipe.execute()[0]
+        except Exception as e:
+            # Redis onbereikbaar → enkel het lokale budget telt
+            log.warning("Cluster-budget onbeschikbaar: %s", e)
+            return True
+        # afronden naar beneden: het clusterbudget mag nooit boven `rate` uitkomen
+        return count <= max(1, int(rate * window))
+
+
+budget = RequestBudget(cluster_url=Config.THROTTLE_CLUSTER_URL or None)
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Lokaal harnas: latency van commando → eerste antwoord, polling vs webhook.
+
+Start fake_botapi.py in-process, draait telegram_runner.py (of met --script
+telegram_monitor.py) als subprocess tegen die nep-API en stuurt synthetische
+/whoami-updates: in polling-modus via getUpdates, in webhook-modus als POST op
+de webhook (met het geheim in X-Telegram-Bot-Api-Secret-Token). Gemeten wordt
+de tijd tot de bot sendMessage naar die chat doet. In webhook-modus wordt ook
+gecontroleerd dat een fout geheim een 403 krijgt.
+
+    python webhook_harness.py --samples 30 --burst 20 --rtt 0.05
+
+Geen Chrome of echte Telegram nodig.
+"""
+
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+import httpx
+
+from fake_botapi import FakeBotAPI
+
+TOKEN = "123:fake"
+SECRET = "harness-secret"
+ADMIN_CHAT = 1  # krijgt de opstartmelding; metingen gebruiken andere chats
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def _pct(values: List[float], p: float) -> float:
+    if not values:
+        return float("nan")
+    values = sorted(values)
+    return values[min(len(values) - 1, int(round(p / 100.0 * (len(values) - 1))))]
+
+
+class BotProcess:
+    """De bot als subprocess tegen de nep-API, in polling- of webhook-modus (ook gebruikt door load_harness.py)."""
+
+    def __init__(self, mode: str, script: str, api: FakeBotAPI, workdir: str, env: Optional[Dict[str, str]] = None):
+        self.mode = mode
+        self.script = script
+        self.api = api
+        self.port = _free_port()
+        self.workdir = workdir
+        self.extra_env = env or {}
+        self.log_path = os.path.join(workdir, f"{mode}.log")
+        self.proc: Optional[subprocess.Popen] = None
+        self.client = httpx.AsyncClient(timeout=10)
+        self._chat = 1000
+
+    @property
+    def hook(self) -> str:
+        return f"http://127.0.0.1:{self.port}/telegram"
+
+    def start(self):
+        env = dict(os.environ)
+        env.update({
+            "TELEGRAM_TOKEN": TOKEN,
+            "TELEGRAM_CHAT_IDS": str(ADMIN_CHAT),
+            "TELEGRAM_API_URL": self.api.url,
+            "TELEGRAM_MODE": self.mode,
+            "WEBHOOK_URL": f"http://127.0.0.1:{self.port}",
+            "WEBHOOK_PATH": "telegram",
+            "WEBHOOK_LISTEN": "127.0.0.1",
+            "PORT": str(self.port),
+            "WEBHOOK_SECRET": SECRET,
+            "RUN_STORE_PATH": os.path.join(self.workdir, f"runs-{self.mode}.db"),
+            "LEASE_STORE_URL": "",
+            "PYTHONUNBUFFERED": "1",
+        })
+        env.update(self.extra_env)
+        log = open(self.log_path, "w")
+        self.proc = subprocess.Popen([sys.executable, self.script], env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    async def ready(self, timeout: float = 60) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if self.proc.poll() is not None:
+                return False
+            if self.mode == "polling" and self.api.calls["getUpdates"]:
+                return True
+            if self.mode == "webhook" and self.api.webhook_url:
+                try:
+                    await self.client.post(self.hook, json={})
+                    return True
+                except httpx.HTTPError:
+                    pass
+            await asyncio.sleep(0.05)
+        return False
+
+    async def deliver(self, update: Dict, secret: str = SECRET) -> int:
+        if self.mode == "polling":
+            self.api.inject(update)
+            return 200
+        r = await self.client.post(self.hook, json=update, headers={"X-Telegram-Bot-Api-Secret-Token": secret})
+        return r.status_code
+
+    async def one(self, text: str = "/whoami") -> Optional[float]:
+        self._chat += 1
+        chat = self._chat
+        t0 = time.monotonic()
+        await self.deliver(self.api.command(chat, text))
+        at = await self.api.wait_message(chat, t0, timeout=15)
+        return None if at is None else at - t0
+
+    async def stop(self):
+        await self.client.aclose()
+        if self.proc and self.proc.poll() is None:
+            self.proc.send_signal(signal.SIGINT)
+            # de nep-API draait op deze loop → niet blokkerend wachten
+            deadline = time.monotonic() + 15
+            while self.proc.poll() is None and time.monotonic() < deadline:
+                await asyncio.sleep(0.05)
+            if self.proc.poll() is None:
+                self.proc.kill()
+
+
+async def measure(mode: str, args, workdir: str) -> Dict:
+    api = FakeBotAPI(rtt=args.rtt)
+    await api.start()
+    m = BotProcess(mode, args.script, api, workdir)
+    m.start()
+    result: Dict = {"mode": mode}
+    try:
+        if not await m.ready():
+            result["error"] = f"bot niet gestart (zie {workdir}/{mode}.log)"
+            return result
+        await asyncio.sleep(1.0)  # opstartmelding en warm-up laten passeren
+
+        if mode == "webhook":
+            bad = await m.deliver(api.command(999, "/whoami"), secret="fout")
+            result["wrong_secret_status"] = bad
+
+        lat, lost = [], 0
+        for _ in range(args.samples):
+            d = await m.one()
+            if d is None:
+                lost += 1
+            else:
+                lat.append(d)
+        result.update(n=len(lat), lost=lost, p50=_pct(lat, 50), p95=_pct(lat, 95), max=max(lat or [float("nan")]))
+
+        if args.burst:
+            t0 = time.monotonic()
+            done = await asyncio.gather(*(m.one() for _ in range(args.burst)))
+            ok = [d for d in done if d is not None]
+            result.update(burst=len(ok), burst_total=time.monotonic() - t0, burst_p95=_pct(ok, 95))
+    finally:
+        await m.stop()
+        await api.stop()
+    return result
+
+
+def _print(results: List[Dict]):
+    print(f"{'modus':<8} {'n':>4} {'kwijt':>5} {'p50':>8} {'p95':>8} {'max':>8} {'burst':>6} {'burst p95':>10}  403?")
+    for r in results:
+        if "error" in r:
+            print(f"{r['mode']:<8} FOUT: {r['error']}")
+            continue
+        burst = f"{r.get('burst', 0):>6} {r.get('burst_p95', float('nan')) * 1000:>8.1f}ms"
+        secret = {403: "ja", None: "-"}.get(r.get("wrong_secret_status"), f"NEE ({r.get('wrong_secret_status')})")
+        print(
+            f"{r['mode']:<8} {r['n']:>4} {r['lost']:>5} {r['p50'] * 1000:>6.1f}ms {r['p95'] * 1000:>6.1f}ms "
+            f"{r['max'] * 1000:>6.1f}ms {burst}  {secret}"
+        )
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Latency polling vs webhook tegen een nep-Bot-API")
+    ap.add_argument("--mode", choices=["polling", "webhook", "both"], default="both")
+    ap.add_argument("--samples", type=int, default=30, help="opeenvolgende /whoami-metingen per modus")
+    ap.add_argument("--burst", type=int, default=20, help="gelijktijdige /whoami's (0 = geen burst)")
+    ap.add_argument("--rtt", type=float, default=0.0, help="gesimuleerde round-trip per Bot API-call (s)")
+    ap.add_argument("--script", default="telegram_runner.py", help="telegram_runner.py of telegram_monitor.py")
+    args = ap.parse_args()
+
+    modes = ["polling", "webhook"] if args.mode == "both" else [args.mode]
+    with tempfile.TemporaryDirectory(prefix="aibv-harness-") as workdir:
+        results = [asyncio.run(measure(mode, args, workdir)) for mode in modes]
+        _print(results)
+        failed = any("error" in r or r.get("lost") for r in results)
+        failed |= any(r.get("wrong_secret_status") not in (None, 403) for r in results)
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,303 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+Proces-geïsoleerde bot-workers.
+
+Elke run draait in een eigen subprocess (spawn) met een eigen procesgroep, zodat
+Chrome, chromedriver en de Selenium-client het Telegram-proces niet kunnen
+blokkeren of opblazen. Communicatie loopt over een multiprocessing Pipe:
+
+  parent → worker : "stop", "status", ("config", gewijzigde velden)
+  worker → parent : ("status", stap), ("progress", tekst), ("result", dict),
+                    ("settings", RunConfig-dict na een teruggedraaide /set),
+                    ("error", {"step", "message", "url", "title", "dump"})
+
+Limieten: CPU via RLIMIT_CPU in de worker, RSS (som over de hele procesboom,
+dus inclusief Chrome) wordt door de parent bewaakt. /stop stuurt eerst "stop" en
+killt na een korte grace-periode de volledige procesboom.
+"""
+
+import asyncio
+import logging
+import multiprocessing as mp
+import os
+import signal
+import threading
+import time
+from typing import Any, AsyncIterator, Dict, Optional, Tuple
+
+from config import Config
+import proctools
+
+log = logging.getLogger("AIBV-Workers")
+
+Event = Tuple[str, object]
+
+
+# ---------------- Worker-kant (subprocess) ----------------
+def _child_main(conn, plate: str, first_reg_date: str, settings: Dict[str, Any],
+                max_cpu_seconds: int):
+    # Eigen procesgroep: Chrome/chromedriver erven die, zodat kill() ze met killpg
+    # ook vindt als de worker zelf al dood is
+    try:
+        os.setsid()
+    except OSError:
+        pass
+    if max_cpu_seconds:
+        try:
+            import resource
+            resource.setrlimit(resource.RLIMIT_CPU, (max_cpu_seconds, max_cpu_seconds))
+        except (ImportError, ValueError, OSError):
+            pass
+
+    # Zware imports enkel in de worker
+    from async_bot import make_bot
+    from driver_supervisor import RunCancelled
+    from run_config import RunConfig
+
+    send_lock = threading.Lock()
+
+    def send(kind: str, payload=None):
+        with send_lock:
+            try:
+                conn.send((kind, payload))
+            except (OSError, EOFError, BrokenPipeError):
+                pass
+
+    bot = make_bot()
+    bot.run_config = RunConfig.from_dict(settings)
+    bot.set_notifier(lambda msg: send("progress", msg))
+    bot.set_settings_listener(lambda settings: send("settings", settings))
+    state = {"step": "driver"}
+
+    def step(name: str):
+        state["step"] = name
+        send("status", name)
+
+    def listen():
+        while True:
+            try:
+                cmd = conn.recv()
+            except (EOFError, OSError):
+                # parent is weg → zo snel mogelijk stoppen
+                bot.request_stop()
+                return
+            if cmd == "stop":
+                bot.request_stop()
+                threading.Thread(target=bot.close, daemon=True).start()
+            elif cmd == "status":
+                send("status", state["step"])
+            elif isinstance(cmd, tuple) and cmd[0] == "config":
+                # /set → de monitor pikt het op bij zijn volgende iteratie
+                bot.run_config.update(**cmd[1])
+
+    threading.Thread(target=listen, name="aibv-worker-ipc", daemon=True).start()
+
+    try:
+        step("driver")
+        bot.supervised(bot.setup_driver)
+        step("login")
+        bot.supervised(bot.login)
+        step("voertuig")
+        bot.supervised(bot.select_vehicle, plate, first_reg_date)
+        step("station")
+        try:
+            bot.supervised(bot.select_station)
+        except RuntimeError as e:
+            send("result", {"success": False, "error": str(e), "blocked": True})
+            return
+        step("monitor")
+        send("result", bot.monitor_and_book())
+    except RunCancelled:
+        send("result", {"success": False, "stopped": True})
+    except Exception as e:
+        url = title = ""
+        dump = None
+        try:
+            if bot.driver:
+                url = bot.driver.current_url or ""
+                title = bot.driver.title or ""
+                dump = bot.dump_flight_recorder(f"worker-{plate}")
+        except Exception:
+            pass
+        send("error", {"step": state["step"], "message": str(e), "url": url, "title": title, "dump": dump})
+    finally:
+        bot.recorder.close()
+        bot.close()
+        try:
+            conn.close()
+        except OSError:
+            pass
+
+
+# ---------------- Parent-kant ----------------
+class BotWorker:
+    """Eén run in een eigen subprocess, aangestuurd vanuit de event loop."""
+
+    def __init__(self, plate: str, first_reg_date: str, settings: Optional[Dict[str, Any]] = None,
+                 max_rss_mb: Optional[int] = None, max_cpu_seconds: Optional[int] = None,
+                 check_interval: float = 2.0):
+        self.plate = plate
+        self.first_reg_date = first_reg_date
+        self.settings = dict(settings or {})  # RunConfig.to_dict()
+        self.max_rss_mb = Config.WORKER_MAX_RSS_MB if max_rss_mb is None else max_rss_mb
+        self.max_cpu_seconds = Config.WORKER_MAX_CPU_SECONDS if max_cpu_seconds is None else max_cpu_seconds
+        self.check_interval = check_interval
+        self.process: Optional[mp.Process] = None
+        self.step = "driver"
+        self.peak_rss = 0
+        self._conn = None
+
+    @property
+    def pid(self) -> Optional[int]:
+        return self.process.pid if self.process else None
+
+    def is_alive(self) -> bool:
+        return bool(self.process and self.process.is_alive())
+
+    def rss_bytes(self) -> int:
+        return proctools.tree_rss_bytes(self.pid) if self.is_alive() else 0
+
+    def start(self):
+        ctx = mp.get_context("spawn")
+        self._conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(
+            target=_child_main,
+            args=(child_conn, self.plate, self.first_reg_date, self.settings, self.max_cpu_seconds),
+            name=f"aibv-worker-{self.plate}",
+            daemon=True,
+        )
+        self.process.start()
+        child_conn.close()
+        log.info("Worker gestart pid=%s plate=%s", self.pid, self.plate)
+
+    def send(self, cmd: Any):
+        try:
+            self._conn.send(cmd)
+        except (OSError, EOFError, BrokenPipeError, AttributeError):
+            pass
+
+    def kill(self):
+        """Harde kill van de worker en zijn volledige procesboom (Chrome incl.)."""
+        if not self.process:
+            return
+        pid = self.process.pid
+        if not pid:
+            return
+        if self.process.exitcode is None:
+            # pid is nog van de worker (niet gereaped) → boom en worker zelf
+            proctools.kill_tree(pid)
+            try:
+                self.process.kill()
+            except Exception:
+                pass
+        # ook na de dood van de worker: Chrome hangt dan onder init, maar zit nog in
+        # zijn groep, en zolang er leden leven kan geen ander proces die pgid krijgen
+        try:
+            os.killpg(pid, signal.SIGKILL)
+        except (ProcessLookupError, PermissionError, AttributeError):
+            pass
+        self.process.join(timeout=1)
+
+    async def stop(self, grace: float = 3.0):
+        """Vriendelijk stoppen; na `grace` seconden volgt een harde kill."""
+        self.send("stop")
+        deadline = time.monotonic() + grace
+        while self.is_alive() and time.monotonic() < deadline:
+            await asyncio.sleep(0.1)
+        if self.is_alive():
+            log.warning("Worker pid=%s reageert niet op stop → kill", self.pid)
+        self.kill()
+
+    def _over_limit(self) -> Optional[str]:
+        if not self.is_alive():
+            return None
+        rss = self.rss_bytes()
+        self.peak_rss = max(self.peak_rss, rss)
+        if self.max_rss_mb and rss > self.max_rss_mb * 1024 * 1024:
+            return f"RSS-limiet overschreden ({rss // (1024 * 1024)} MB > {self.max_rss_mb} MB)"
+        return None
+
+    async def events(self) -> AsyncIterator[Event]:
+        """Async stroom van worker-events; eindigt na 'result', 'error' of 'exit'."""
+        loop = asyncio.get_running_loop()
+        queue: "asyncio.Queue[Event]" = asyncio.Queue()
+        fd = self._conn.fileno()
+
+        def _readable():
+            try:
+                while self._conn.poll():
+                    queue.put_nowait(self._conn.recv())
+            except (EOFError, OSError):
+                loop.remove_reader(fd)
+                queue.put_nowait(("exit", None))
+
+        loop.add_reader(fd, _readable)
+        try:
+            while True:
+                try:
+                    kind, payload = await asyncio.wait_for(queue.get(), timeout=self.check_interval)
+                except asyncio.TimeoutError:
+                    reason = self._over_limit()
+                    if reason:
+                        log.warning("Worker pid=%s: %s", self.pid, reason)
+                        self.kill()
+                        yield "error", {"step": self.step, "message": reason, "url": "", "title": ""}
+                        return
+                    if not self.is_alive() and queue.empty():
+                        yield "exit", self.process.exitcode if self.process else None
+                        return
+                    continue
+                if kind == "status":
+                    self.step = str(payload)
+                yield kind, payload
+                if kind in ("result", "error", "exit"):
+                    return
+        finally:
+            loop.remove_reader(fd)
+
+
+class WorkerPool:
+    """Houdt per sleutel (chat) hoogstens één actieve worker bij."""
+
+    def __init__(self):
+        self.workers: Dict[int, BotWorker] = {}
+
+    def get(self, key: int) -> Optional[BotWorker]:
+        w = self.workers.get(key)
+        return w if (w and w.is_alive()) else None
+
+    def start(self, key: int, plate: str, first_reg_date: str,
+              settings: Optional[Dict[str, Any]] = None) -> BotWorker:
+        if self.get(key):
+            raise RuntimeError("Er draait al een worker voor deze run")
+        worker = BotWorker(plate, first_reg_date, settings)
+        worker.start()
+        self.workers[key] = worker
+        return worker
+
+    async def stop(self, key: int):
+        worker = self.workers.get(key)
+        if worker:
+            await worker.stop()
+
+    def release(self, key: int):
+        worker = self.workers.pop(key, None)
+        if worker:
+            # ook een zelf gestorven worker (RLIMIT_CPU, crash) kan Chrome achterlaten
+            worker.kill()
+
+    def stats(self) -> Dict[str, int]:
+        alive = [w for w in self.workers.values() if w.is_alive()]
+        return {
+            "workers": len(alive),
+            "rss_mb": sum(w.rss_bytes() for w in alive) // (1024 * 1024),
+        }
+
+    def shutdown(self):
+        for key in list(self.workers):
+            self.release(key)
+
+
+pool = WorkerPool()